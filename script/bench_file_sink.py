@@ -0,0 +1,108 @@
+"""native file sinks: records/s, sink write time, write syscalls & page faults per record of the basic (fwrite) vs
+the mmap file sink
+
+records go through loggers of libtcomplex::log::get_logger called from native threads (_log.bench_logging), file only.
+sink ns is the time spent in the file sink (get_log_metrics), syscalls are the write syscalls of the whole process
+(/proc/self/io, linux), faults the minor page faults.
+
+usage: python script/bench_file_sink.py [-n 500000] [--sink basic --sink mmap] [--msg-size 16 --msg-size 256]
+                                        [--thread-count 1] [--flush-every 1000]
+"""
+import argparse
+import os
+import resource
+import tempfile
+
+from tcomplex import _if
+from tcomplex.util.upkeep import log
+from tcomplex.util.upkeep import _log
+
+SINK_LIST = ["basic", "mmap"]
+
+
+def read_syscw():
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "syscw":
+                    return int(value)
+    except OSError:
+        pass
+    return None
+
+
+def sink_write_stat():
+    # meters are kept per sink key across sink re-creation
+    return log.get_log_metrics()["sinks"].get("file", {}).get("write", {"count": 0, "sum_ns": 0})
+
+
+def run_once(sink, n_record, msg_size, thread_count, flush_every, log_filename):
+    log.reset_logging(
+        log_type=log.log_type.file_only,
+        log_filename=log_filename,
+        file_sink_type=getattr(log.file_sink_type, sink),
+    )
+    write_beg = sink_write_stat()
+    syscw_beg = read_syscw()
+    minflt_beg = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+
+    num_record = 0
+    elapsed = 0.0
+    chunk = flush_every or n_record
+    while num_record < n_record:
+        stat = _log.bench_logging("bench", min(chunk, n_record - num_record), msg_size, thread_count)
+        if flush_every:
+            log.flush_logging()
+        num_record += stat.num_record
+        elapsed += stat.elapsed
+
+    syscw_end = read_syscw()
+    minflt_end = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    write_end = sink_write_stat()
+    log.reset_logging(log_type=log.log_type.disabled)
+    return {
+        "records_per_sec": num_record / elapsed,
+        "sink_ns": (write_end["sum_ns"] - write_beg["sum_ns"]) / max(write_end["count"] - write_beg["count"], 1),
+        "syscw": None if syscw_beg is None else syscw_end - syscw_beg,
+        "minflt": minflt_end - minflt_beg,
+        "num_record": num_record,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-record", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=3, help="best records/s of repeated runs is kept")
+    parser.add_argument("--sink", action="append", choices=SINK_LIST)
+    parser.add_argument("--msg-size", type=int, action="append")
+    parser.add_argument("--thread-count", type=int, default=1)
+    parser.add_argument("--flush-every", type=int, default=0, help="flush_logging every n records, 0: never")
+    arg = parser.parse_args()
+    arg.sink = arg.sink or SINK_LIST
+    arg.msg_size = arg.msg_size or [16, 256]
+
+    _if.init()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for msg_size in arg.msg_size:
+            for sink in arg.sink:
+                # a new file name per case, the previous file sink is closed
+                log_filename = os.path.join(tmpdir, f"bench_{sink}_{msg_size}.txt")
+                res = max(
+                    (
+                        run_once(sink, arg.num_record, msg_size, arg.thread_count, arg.flush_every, log_filename)
+                        for _ in range(arg.repeat)
+                    ),
+                    key=lambda x: x["records_per_sec"],
+                )
+                syscw = "-" if res["syscw"] is None else f"{res['syscw'] / res['num_record']:.4f}"
+                print(
+                    f"{sink:<6} {msg_size:>6}B: {res['records_per_sec']:>10.0f} records/s  "
+                    f"sink {res['sink_ns']:>6.0f} ns  write syscalls/record {syscw:>8}  "
+                    f"faults/record {res['minflt'] / res['num_record']:.4f}"
+                )
+    _if.deinit()
+
+
+if __name__ == "__main__":
+    main()
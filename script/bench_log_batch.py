@@ -0,0 +1,59 @@
+"""records/sec of ExtHandler: per-record path vs batched submission, eager vs lazy formatting
+
+usage: python script/bench_log_batch.py [-n 200000] [--batch-size 256] [--lazy]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from tcomplex import _if
+from tcomplex.util.upkeep import log
+from tcomplex.util.upkeep import _log
+
+
+def run_once(n_record, batch_size, lazy_format, log_filename):
+    _log.reset_logging(_log.log_param_t(_log.log_type_t.file_only, log_filename))
+
+    logger = logging.getLogger(f"bench_log_batch.{batch_size}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = log.ExtHandler(batch_size=batch_size, lazy_format=lazy_format)
+    logger.addHandler(handler)
+
+    t_beg = time.perf_counter()
+    for i in range(n_record):
+        logger.debug("record %d of %s: %.3f", i, "bench", i * 0.5)
+    handler.flush()
+    t_end = time.perf_counter()
+
+    logger.removeHandler(handler)
+    handler.close()
+    return n_record / (t_end - t_beg)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-record", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, action="append")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lazy", action="store_true", help="also run with lazy formatting")
+    arg = parser.parse_args()
+    batch_size_list = arg.batch_size if arg.batch_size is not None else [64, 256, 1024]
+
+    _if.init()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_filename = os.path.join(tmpdir, "bench.txt")
+        for lazy_format in [False, True] if arg.lazy else [False]:
+            for batch_size in [None] + batch_size_list:
+                res = max(run_once(arg.num_record, batch_size, lazy_format, log_filename) for _ in range(arg.repeat))
+                mode = "per-record" if batch_size is None else f"batch={batch_size}"
+                mode += ",lazy" if lazy_format else ""
+                print(f"{mode:<20}: {res:>12.0f} records/s")
+        _log.reset_logging(_log.log_param_t(_log.log_type_t.disabled))
+    _if.deinit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""records/sec from worker processes into the native log device: QueueHandler/QueueListener vs shared memory ring
+
+usage: python script/bench_log_mp.py [-n 50000] [--num-worker 4] [--start-method spawn]
+"""
+import argparse
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import tempfile
+import time
+
+from tcomplex import _if
+from tcomplex.util.upkeep import log
+from tcomplex.util.upkeep import _log
+
+
+def init_queue_worker(queue):
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(logging.DEBUG)
+    root.addHandler(logging.handlers.QueueHandler(queue))
+
+
+def init_ring_worker(ring_name, batch_size, lazy_format):
+    log.configure_mp_worker(ring_name, batch_size=batch_size, lazy_format=lazy_format)
+
+
+def work(n_record):
+    logger = logging.getLogger("bench_log_mp")
+    for i in range(n_record):
+        logger.debug("record %d of %s: %.3f", i, "bench", i * 0.5)
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+
+def run_queue(ctx, n_worker, n_record):
+    queue = ctx.Queue()
+    handler = log.ExtHandler(batch_size=256)
+    listener = logging.handlers.QueueListener(queue, handler)
+    listener.start()
+    with ctx.Pool(n_worker, initializer=init_queue_worker, initargs=(queue,)) as pool:
+        pool.map(abs, range(n_worker))  # workers up
+        t_beg = time.perf_counter()
+        pool.map(work, [n_record] * n_worker)
+        listener.stop()  # until the queue is empty
+        handler.flush()
+        t_end = time.perf_counter()
+    handler.close()
+    return n_worker * n_record / (t_end - t_beg)
+
+
+def run_ring(ctx, n_worker, n_record, batch_size, lazy_format):
+    ring_name = log.configure_mp_main()
+    with ctx.Pool(n_worker, initializer=init_ring_worker, initargs=(ring_name, batch_size, lazy_format)) as pool:
+        pool.map(abs, range(n_worker))
+        t_beg = time.perf_counter()
+        pool.map(work, [n_record] * n_worker)
+        log.flush_logging()
+        t_end = time.perf_counter()
+    stat = log._mp_host.stat()
+    log.deconfigure_mp_main()
+    assert stat.num_dropped == 0
+    return n_worker * n_record / (t_end - t_beg)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-record", type=int, default=50000, help="records per worker")
+    parser.add_argument("--num-worker", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--start-method", default="spawn", choices=multiprocessing.get_all_start_methods())
+    arg = parser.parse_args()
+    ctx = multiprocessing.get_context(arg.start_method)
+
+    _if.init()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _log.reset_logging(_log.log_param_t(_log.log_type_t.file_only, os.path.join(tmpdir, "bench.txt")))
+        cases = [
+            ("queue-listener", lambda: run_queue(ctx, arg.num_worker, arg.num_record)),
+            ("ring", lambda: run_ring(ctx, arg.num_worker, arg.num_record, None, False)),
+            ("ring,batch=256", lambda: run_ring(ctx, arg.num_worker, arg.num_record, 256, False)),
+            ("ring,batch=256,lazy", lambda: run_ring(ctx, arg.num_worker, arg.num_record, 256, True)),
+        ]
+        for mode, fn in cases:
+            res = max(fn() for _ in range(arg.repeat))
+            print(f"{mode:<20}: {res:>12.0f} records/s")
+        _log.reset_logging(_log.log_param_t(_log.log_type_t.disabled))
+    _if.deinit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""logging pipeline suite: records/s and p50/p99 call latency per path, sink set, message size, thread count and
+overflow policy, written as json to track regressions between releases
+
+paths:
+    python     plain logging with ConsoleFormatter / FileFormatter handlers, no native device
+    ext        ExtHandler into LogCtx, one native call per record
+    ext-batch  ExtHandler with batch_size=256 and lazy formatting
+    native     loggers of libtcomplex::log::get_logger called from native threads (_log.bench_logging)
+
+records/s counts until every record is written by the sinks; latency is the logging call on the calling thread.
+console output goes to /dev/null while measuring.
+
+usage: python script/bench_log_suite.py [-n 50000] [--path native --path ext] [--msg-size 16 --msg-size 1024]
+                                        [--thread-count 1 --thread-count 4] [--sinks file --sinks both]
+                                        [--overflow block --overflow discard_new] [-o result.json] [--baseline old.json]
+"""
+import argparse
+import contextlib
+import datetime
+import importlib.metadata
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+from tcomplex import _if
+from tcomplex.util.upkeep import log
+from tcomplex.util.upkeep import _log
+
+PATH_LIST = ["python", "ext", "ext-batch", "native"]
+SINKS_LOG_TYPE = {
+    "console": log.log_type.console_only,
+    "file": log.log_type.file_only,
+    "both": log.log_type.console_file,
+}
+OVERFLOW_LIST = ["block", "overrun_oldest", "discard_new"]
+RESULT_VERSION = 1
+# identifies a case across result files
+CASE_KEY = ("path", "sinks", "msg_size", "thread_count", "overflow")
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    sys.stdout.flush()
+    saved_fd = os.dup(1)
+    devnull_fd = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull_fd, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        log.flush_logging()
+        os.dup2(saved_fd, 1)
+        os.close(saved_fd)
+        os.close(devnull_fd)
+
+
+def percentile(sorted_value, q):
+    if not sorted_value:
+        return None
+    return sorted_value[min(int(q * len(sorted_value)), len(sorted_value) - 1)]
+
+
+def run_threads(logger, n_record, thread_count, payload):
+    n_per_thread = n_record // thread_count
+    latency_list = [[] for _ in range(thread_count)]
+    barrier = threading.Barrier(thread_count + 1)
+
+    def work(latency):
+        perf_ns = time.perf_counter_ns
+        append = latency.append
+        barrier.wait()
+        for i in range(n_per_thread):
+            t_call = perf_ns()
+            logger.info("record %d of %s", i, payload)
+            append(perf_ns() - t_call)
+
+    thread_list = [threading.Thread(target=work, args=(latency,)) for latency in latency_list]
+    for thread in thread_list:
+        thread.start()
+    barrier.wait()
+    t_beg = time.perf_counter()
+    for thread in thread_list:
+        thread.join()
+    for handler in logger.handlers:
+        handler.flush()  # ExtHandler.flush also drains the native queue
+    elapsed = time.perf_counter() - t_beg
+    return n_per_thread * thread_count, elapsed, list(itertools.chain.from_iterable(latency_list))
+
+
+def run_python(case, n_record, log_filename):
+    logger = logging.getLogger("bench_log_suite.python")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler_list = []
+    if case["sinks"] in ("console", "both"):
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(log.ConsoleFormatter())
+        handler_list.append(handler)
+    if case["sinks"] in ("file", "both"):
+        handler = logging.FileHandler(log_filename, mode="w")
+        handler.setFormatter(log.FileFormatter())
+        handler_list.append(handler)
+    for handler in handler_list:
+        logger.addHandler(handler)
+
+    try:
+        return run_threads(logger, n_record, case["thread_count"], "x" * case["msg_size"])
+    finally:
+        for handler in handler_list:
+            logger.removeHandler(handler)
+            handler.close()
+
+
+def run_ext(case, n_record, batch_size, lazy_format):
+    logger = logging.getLogger(f"bench_log_suite.{case['path']}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = log.ExtHandler(batch_size=batch_size, lazy_format=lazy_format)
+    logger.addHandler(handler)
+    try:
+        return run_threads(logger, n_record, case["thread_count"], "x" * case["msg_size"])
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def run_native(case, n_record):
+    stat = _log.bench_logging("bench", n_record, case["msg_size"], case["thread_count"])
+    return stat.num_record, stat.elapsed, stat.latency_ns
+
+
+def run_case(case, n_record, log_filename):
+    if case["path"] != "python":
+        log.reset_logging(
+            log_type=SINKS_LOG_TYPE[case["sinks"]],
+            log_filename=log_filename,
+            async_overflow=getattr(log.async_overflow, case["overflow"]),
+        )
+    stat_beg = log.get_async_stat()
+
+    with quiet_stdout():
+        if case["path"] == "python":
+            num_record, elapsed, latency = run_python(case, n_record, log_filename)
+        elif case["path"] == "ext":
+            num_record, elapsed, latency = run_ext(case, n_record, None, False)
+        elif case["path"] == "ext-batch":
+            num_record, elapsed, latency = run_ext(case, n_record, 256, True)
+        else:
+            num_record, elapsed, latency = run_native(case, n_record)
+
+    stat_end = log.get_async_stat()
+    latency.sort()
+    return {
+        **case,
+        "num_record": num_record,
+        "elapsed": elapsed,
+        "records_per_sec": num_record / elapsed,
+        "latency_p50_ns": percentile(latency, 0.50),
+        "latency_p99_ns": percentile(latency, 0.99),
+        "latency_max_ns": latency[-1] if latency else None,
+        "num_dropped": stat_end.num_dropped - stat_beg.num_dropped,
+        "num_overrun": stat_end.num_overrun - stat_beg.num_overrun,
+    }
+
+
+def case_list(arg):
+    res = []
+    for path, sinks, msg_size, thread_count in itertools.product(arg.path, arg.sinks, arg.msg_size, arg.thread_count):
+        # the python path has no queue
+        overflow_list = [None] if path == "python" else arg.overflow
+        for overflow in overflow_list:
+            res.append(
+                {"path": path, "sinks": sinks, "msg_size": msg_size, "thread_count": thread_count, "overflow": overflow}
+            )
+    return res
+
+
+def meta(arg):
+    try:
+        package_version = importlib.metadata.version("tcomplex")
+    except importlib.metadata.PackageNotFoundError:
+        package_version = None
+    return {
+        "version": RESULT_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "package_version": package_version,
+        "python": sys.version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "num_record": arg.num_record,
+        "repeat": arg.repeat,
+    }
+
+
+def print_result(res, baseline, out):
+    line = (
+        f"{res['path']:<10} {res['sinks']:<8} {res['msg_size']:>6}B {res['thread_count']:>2}t "
+        f"{res['overflow'] or '-':<15}: {res['records_per_sec']:>10.0f} records/s  "
+        f"p50 {res['latency_p50_ns']:>8} ns  p99 {res['latency_p99_ns']:>9} ns"
+    )
+    if res["num_dropped"] or res["num_overrun"]:
+        line += f"  dropped {res['num_dropped']} overrun {res['num_overrun']}"
+    base = baseline.get(tuple(res[k] for k in CASE_KEY))
+    if base is not None:
+        line += (
+            f"  | vs baseline: x{res['records_per_sec'] / base['records_per_sec']:.2f} records/s,"
+            f" x{res['latency_p99_ns'] / max(base['latency_p99_ns'], 1):.2f} p99"
+        )
+    print(line, file=out, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-record", type=int, default=50000, help="records per case, split over threads")
+    parser.add_argument("--repeat", type=int, default=3, help="best records/s of repeated runs is kept")
+    parser.add_argument("--path", action="append", choices=PATH_LIST)
+    parser.add_argument("--sinks", action="append", choices=list(SINKS_LOG_TYPE))
+    parser.add_argument("--msg-size", type=int, action="append")
+    parser.add_argument("--thread-count", type=int, action="append")
+    parser.add_argument("--overflow", action="append", choices=OVERFLOW_LIST)
+    parser.add_argument("-o", "--output", help="json result file, stdout if not set")
+    parser.add_argument("--baseline", help="json result file of an earlier run to compare with")
+    arg = parser.parse_args()
+    arg.path = arg.path or PATH_LIST
+    arg.sinks = arg.sinks or ["file", "both"]
+    arg.msg_size = arg.msg_size or [16, 1024]
+    arg.thread_count = arg.thread_count or [1, 4]
+    arg.overflow = arg.overflow or ["block"]
+
+    baseline = {}
+    if arg.baseline is not None:
+        with open(arg.baseline, "r", encoding="utf-8") as f:
+            baseline = {tuple(res[k] for k in CASE_KEY): res for res in json.load(f)["results"]}
+
+    # the json takes stdout if no output file is set
+    out = sys.stdout if arg.output is not None else sys.stderr
+    _if.init()
+    result_list = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_filename = os.path.join(tmpdir, "bench.txt")
+        for case in case_list(arg):
+            res = max(
+                (run_case(case, arg.num_record, log_filename) for _ in range(arg.repeat)),
+                key=lambda x: x["records_per_sec"],
+            )
+            result_list.append(res)
+            print_result(res, baseline, out)
+        log.reset_logging(log_type=log.log_type.disabled)
+    _if.deinit()
+
+    doc = {"meta": meta(arg), "results": result_list}
+    if arg.output is None:
+        json.dump(doc, sys.stdout, indent=1)
+        print()
+    else:
+        with open(arg.output, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""OptRegistry.parse on a synthetic registry: register time, parse plan build and parse time by keys present
+
+options are spread over nested prefixes (group_i.sub_j.opt_k) with mixed sources & categories; the config files split
+a share of the config only options between them, the command line sets a few options. with --cache, the first parse
+fills the parsed config cache and the kept time is of cache hits.
+
+usage: python script/bench_opt_parse.py [-n 10000] [--present 0.01 --present 0.5] [--cfg-count 2] [--repeat 5]
+                                        [--cache] [--load-workers 2]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import yaml
+
+from tcomplex.util.opt import OptRegistry, OptEntrySource, OptEntryCommandlineSeqPattern
+
+SOURCE_CYCLE = [
+    OptEntrySource.CONFIG_ONLY,
+    OptEntrySource.COMMANDLINE_OVER_CONFIG,
+    OptEntrySource.BUILTIN,
+    OptEntrySource.COMMANDLINE_ONLY,
+]
+
+
+def option_key(i):
+    return f"group_{i % 50}.sub_{i // 50 % 20}.opt_{i}"
+
+
+def build_registry(num_option, cache_dir=None, load_workers=1):
+    reg = OptRegistry(prog="bench", cache_dir=cache_dir, load_workers=load_workers)
+    for i in range(num_option):
+        source = SOURCE_CYCLE[i % len(SOURCE_CYCLE)]
+        if i % 3 == 0:
+            reg.register(option_key(i), category=int, source=source, default=i)
+        elif i % 3 == 1 and source != OptEntrySource.COMMANDLINE_ONLY:
+            cmdpattern = OptEntryCommandlineSeqPattern.COMMA_SEP if source != OptEntrySource.CONFIG_ONLY else None
+            reg.register(option_key(i), category=list, source=source, default=[i], cmdpattern=cmdpattern)
+        else:
+            reg.register(option_key(i), category=str, source=source, default=str(i))
+    return reg
+
+
+def config_value(default):
+    # differs from the default, so applied keys can be counted
+    if isinstance(default, list):
+        return [x + 1 for x in default]
+    if isinstance(default, int):
+        return default + 1
+    return default + "_cfg"
+
+
+def write_cfg(reg, present, cfg_count, tmpdir):
+    # config only options, the files split them: a key is set by one file
+    config_key = [key for key, meta in reg.meta_info.items() if meta.source == OptEntrySource.CONFIG_ONLY]
+    config_key = config_key[: int(len(config_key) * present)]
+    filename_list = []
+    for cfg_id in range(cfg_count):
+        blob = {}
+        for key in config_key[cfg_id::cfg_count]:
+            handle = blob
+            key_path = key.split(".")
+            for key_part in key_path[:-1]:
+                handle = handle.setdefault(key_part, {})
+            handle[key_path[-1]] = config_value(reg.meta_info[key].default)
+        filename = os.path.join(tmpdir, f"cfg_{cfg_id}.yml")
+        with open(filename, "w", encoding="utf-8") as f:
+            yaml.safe_dump(blob, f)
+        filename_list.append(filename)
+    return filename_list, config_key
+
+
+def cmdline_arg(reg, count):
+    res = []
+    for key, meta in reg.meta_info.items():
+        if len(res) >= 2 * count:
+            break
+        if meta.source in (OptEntrySource.COMMANDLINE_ONLY, OptEntrySource.COMMANDLINE_OVER_CONFIG):
+            value = ",".join(str(x) for x in meta.default) if isinstance(meta.default, list) else str(meta.default)
+            res.extend([f"--{key}", value])
+    return res
+
+
+def count_applied(reg, config_key):
+    res = 0
+    for key in config_key:
+        handle = reg.config
+        for key_part in key.split("."):
+            handle = handle[key_part]
+        res += handle == config_value(reg.meta_info[key].default)
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-option", type=int, default=10000)
+    parser.add_argument("--present", type=float, action="append", help="share of config only options set by files")
+    parser.add_argument("--cfg-count", type=int, default=2, help="config files, passed with -c")
+    parser.add_argument("--cmdline-count", type=int, default=10, help="command line options set")
+    parser.add_argument("--repeat", type=int, default=5, help="best parse time of repeated runs is kept")
+    parser.add_argument("--cache", action="store_true", help="cache parsed config files")
+    parser.add_argument("--load-workers", type=int, default=1, help="processes loading config files")
+    arg = parser.parse_args()
+    arg.present = arg.present or [0.0, 0.01, 0.1, 1.0]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = os.path.join(tmpdir, "cache") if arg.cache else None
+        t_beg = time.perf_counter()
+        reg = build_registry(arg.num_option, cache_dir, arg.load_workers)
+        t_register = time.perf_counter() - t_beg
+
+        t_beg = time.perf_counter()
+        reg.parse_plan()
+        t_plan = time.perf_counter() - t_beg
+
+        cmd_parser = argparse.ArgumentParser(prog="bench")
+        reg.hook(cmd_parser)
+        arg_src = cmdline_arg(reg, arg.cmdline_count)
+
+        print(f"{arg.num_option} options: register {t_register:.3f} s, parse plan {t_plan * 1e3:.1f} ms")
+        for present in arg.present:
+            cfg_list, config_key = write_cfg(reg, present, arg.cfg_count, tmpdir)
+            elapsed = []
+            for _ in range(arg.repeat + arg.cache):
+                reg.bind_config_list = []
+                t_beg = time.perf_counter()
+                reg.parse(cmd_parser, arg_src + [x for cfg in cfg_list for x in ("-c", cfg)])
+                elapsed.append(time.perf_counter() - t_beg)
+            line = (
+                f"present {present:>5.2f} ({len(config_key):>5} keys in {arg.cfg_count} files): "
+                f"parse {min(elapsed[arg.cache :]) * 1e3:>8.2f} ms, applied {count_applied(reg, config_key):>5} keys"
+            )
+            if arg.cache:
+                line += f"  (cache miss {elapsed[0] * 1e3:.2f} ms)"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 #ifndef LIBTCOMPLEX_INTERFACE_LOG_IF_H
 #define LIBTCOMPLEX_INTERFACE_LOG_IF_H
 
+#include <cstdint>
+#include <functional>
 #include <memory>
+#include <optional>
 #include <string>
 #include <string_view>
+#include <tuple>
+#include <variant>
+#include <vector>
 
 #include "../log_def.h"
 
@@ -11,6 +17,11 @@ namespace spdlog {
 class logger;
 }; // namespace spdlog
 
+namespace libtcomplex::log::mp {
+class shm_ring;
+class ring_host;
+}; // namespace libtcomplex::log::mp
+
 namespace libtcomplex::interface::log {
 
 using libtcomplex::log::log_param_default;
@@ -18,21 +29,116 @@ using libtcomplex::log::log_param_t;
 using libtcomplex::log::log_type_t;
 using libtcomplex::log::reset_logging;
 using libtcomplex::log::flush_logging;
+using libtcomplex::log::flush_stat_t;
+using libtcomplex::log::reset_logging_async;
+using libtcomplex::log::flush_logging_async;
+using libtcomplex::log::wait_logging_async;
+using libtcomplex::log::async_overflow_t;
+using libtcomplex::log::file_sink_type_t;
+using libtcomplex::log::FILE_MAX_ROTATE;
+using libtcomplex::log::async_stat_t;
+using libtcomplex::log::get_async_stat;
+using libtcomplex::log::mp_stat_t;
+using libtcomplex::log::latency_stat_t;
+using libtcomplex::log::logger_metrics_t;
+using libtcomplex::log::sink_metrics_t;
+using libtcomplex::log::log_metrics_t;
+using libtcomplex::log::get_log_metrics;
+using libtcomplex::log::LATENCY_BUCKET_COUNT;
+using libtcomplex::log::log_bench_stat_t;
+using libtcomplex::log::bench_logging;
+using libtcomplex::log::dump_ring;
+using libtcomplex::log::limit_param_t;
+using libtcomplex::log::set_logger_limit;
+using libtcomplex::log::RING_SLOT_SIZE;
 
 bool check_init();
 
+// id of a python call site, -1 if the table is full; ids are process wide and survive fork
+int reg_call_site(const std::string &filename, const std::string &funcname, const int lineno);
+
+// level registry shared with python logging, in python level numbers; NOTSET (0) clears the explicit level, the
+// logger then follows its dotted parent. changes made here are not reported to the level listener
+void set_logger_level(const std::string &name, const int lvl);
+int get_logger_level(const std::string &name); // effective
+bool is_enabled_for(const std::string &name, const int lvl);
+std::vector<std::tuple<std::string, int>> get_level_table(); // explicit levels
+// called on level changes made natively, from the thread making the change
+using level_listener_t = std::function<void(const std::string &name, const int lvl)>;
+void set_level_listener(level_listener_t listener);
+
+// args captured for lazy formatting (int, float, str)
+using log_arg_t = std::variant<int64_t, double, std::string>;
+// call site id from reg_call_site, or (filename, funcname, lineno) when the call site table is full
+using log_site_t = std::variant<int, std::tuple<std::string, std::string, int>>;
+// (levelno, msg, args, created_ns, site), same order as LogCtx::log_lazy_site
+// empty args: msg is already formatted
+using log_record_t = std::tuple<int, std::string, std::vector<log_arg_t>, int64_t, log_site_t>;
+
 struct LogCtx {
 public:
     LogCtx(const std::string key = "python");
     void set_level();
     void set_format();
-    void log(const int lvl, const char *msg, double created, const char *filename, const char *funcname, int lineno);
+    // msg is taken with its length, an embedded NUL does not cut it
+    void log(const int lvl, const std::string_view msg, int64_t created_ns, const char *filename, const char *funcname,
+             int lineno);
+    void log_lazy(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args, int64_t created_ns,
+                  const char *filename, const char *funcname, int lineno);
+    // site from reg_call_site
+    void log_site(const int lvl, const std::string_view msg, int64_t created_ns, int site);
+    void log_lazy_site(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args,
+                       int64_t created_ns, int site);
+    void log_batch(const std::vector<log_record_t> &records);
+    // never wait for room in the queue: false if the record is refused (block policy, queue full), it is not logged
+    bool try_log_site(const int lvl, const std::string_view msg, int64_t created_ns, int site);
+    bool try_log_lazy_site(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args,
+                           int64_t created_ns, int site);
+    // records logged from the front, up to the first refused one
+    size_t try_log_batch(const std::vector<log_record_t> &records);
 
 private:
     std::string key;
     std::shared_ptr<spdlog::logger> logger;
 };
 
+// main process: owns the shared memory ring of worker processes, drains it into the native loggers
+struct LogMpHost {
+public:
+    LogMpHost(const std::string name, const size_t slot_count, const size_t slot_size);
+    ~LogMpHost();
+    std::string name() const;
+    bool drain(const std::optional<double> timeout = std::nullopt);
+    void close();
+    mp_stat_t stat() const;
+
+private:
+    std::unique_ptr<libtcomplex::log::mp::ring_host> host;
+};
+
+// worker process: same calls as LogCtx, records are written into the ring of the main process
+struct LogMpCtx {
+public:
+    LogMpCtx(const std::string name, const std::string key = "python", const bool block = true);
+    ~LogMpCtx();
+    void log(const int lvl, const std::string_view msg, int64_t created_ns, const char *filename, const char *funcname,
+             int lineno);
+    void log_lazy(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args, int64_t created_ns,
+                  const char *filename, const char *funcname, int lineno);
+    void log_site(const int lvl, const std::string_view msg, int64_t created_ns, int site);
+    void log_lazy_site(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args,
+                       int64_t created_ns, int site);
+    void log_batch(const std::vector<log_record_t> &records);
+
+private:
+    void push(const int lvl, const std::string_view msg, int64_t created_ns, const std::string_view filename,
+              const std::string_view funcname, int lineno);
+
+    std::string key;
+    bool block;
+    std::unique_ptr<libtcomplex::log::mp::shm_ring> ring;
+};
+
 } // namespace libtcomplex::interface::log
 
 #endif
\ No newline at end of file
@@ -1,9 +1,12 @@
 #ifndef LIBTCOMPLEX_LOG_DEF_H
 #define LIBTCOMPLEX_LOG_DEF_H
 
+#include <cstdint>
+#include <functional>
 #include <optional>
 #include <string>
 #include <string_view>
+#include <vector>
 
 namespace libtcomplex::log {
 enum struct log_type_t {
@@ -13,15 +16,144 @@ enum struct log_type_t {
     console_file,
 };
 
+enum struct async_overflow_t {
+    block,          // caller waits for room
+    overrun_oldest, // oldest queued message is dropped
+    discard_new,    // incoming message is dropped
+};
+
+enum struct file_sink_type_t {
+    basic,    // one file, truncated on open
+    rotating, // rotated by size and/or time, kept as file.01 ... file.NN
+    binary,   // compact binary records, truncated on open, read back by util.upkeep.log_decode
+    mmap,     // as basic, written through a memory mapping of the file preallocated in chunks
+};
+
+// two digit suffix of the rotating file sink
+constexpr size_t FILE_MAX_ROTATE = 99;
+
+// flight recorder ring: bytes kept per record, longer messages are cut
+constexpr size_t RING_SLOT_SIZE = 512;
+
+// producer side limits of a logger, checked before a record takes a slot of the async queue; 0 turns a limit off.
+// suppressed records of a call site are reported by a note record before its next record, or on flush
+struct limit_param_t {
+    double logger_rate;   // token bucket of the logger: records/s
+    double logger_burst;  // records let through at once, at least 1
+    double site_rate;     // token bucket of each call site of the logger
+    double site_burst;    // records let through at once
+    double repeat_window; // seconds a repeat of the last message of a call site is counted instead of logged
+
+    bool operator==(const limit_param_t &other) const = default;
+};
+
 struct log_param_t {
     std::optional<log_type_t> log_type;
     std::optional<std::string> log_filename;
+    // async queue, size & thread count changes take effect on a new thread pool
+    std::optional<size_t> async_queue_size;
+    std::optional<size_t> async_thread_count;
+    std::optional<async_overflow_t> async_overflow;
+    std::optional<size_t> async_queue_max_bytes; // 0: no byte cap
+    // file sink, changes re-create the file sink
+    std::optional<file_sink_type_t> file_sink_type;
+    std::optional<size_t> file_max_size;        // rotating: bytes, 0: no size based rotation
+    std::optional<double> file_rotate_interval; // rotating: seconds, 0: no timed rotation
+    std::optional<size_t> file_max_rotate;      // rotating: rotated files kept
+    std::optional<int> file_level;              // spdlog level number (0: trace .. 5: critical, 6: off), applied live
+    // flight recorder ring sink, changes re-create it (kept records are lost)
+    std::optional<size_t> ring_size;          // records kept, 0: no ring sink
+    std::optional<std::string> ring_filename; // dumps are appended to it, empty: log_filename + ".ring"
+    std::optional<int> ring_dump_level;       // spdlog level number dumping the ring, 6 (off): dump_ring only
+    std::optional<limit_param_t> limit;       // of loggers without their own, see set_logger_limit; applied live
+};
+
+static const log_param_t log_param_default{std::nullopt, std::nullopt, std::nullopt, std::nullopt, std::nullopt,
+                                           std::nullopt, std::nullopt, std::nullopt, std::nullopt, std::nullopt,
+                                           std::nullopt, std::nullopt, std::nullopt, std::nullopt, std::nullopt};
+
+struct flush_stat_t {
+    bool drained;       // false if timeout hit before the queue is drained
+    size_t num_drained; // queued messages when the drain started
+    double elapsed;     // in seconds
+};
+
+struct async_stat_t {
+    size_t queue_size;         // queued messages
+    size_t queue_capacity;     // max queued messages
+    size_t queue_bytes;        // queued payload bytes
+    size_t queue_max_bytes;    // 0: no byte cap
+    size_t thread_count;       // worker threads, 0 if the thread pool is not inited
+    async_overflow_t overflow; // overflow policy
+    size_t num_enqueued;       // messages accepted since start
+    size_t num_dropped;        // discarded on arrival (discard_new)
+    size_t num_overrun;        // evicted from the queue (overrun_oldest)
+    size_t queue_high_water;   // max queued messages since the thread pool was created
+    size_t queue_bytes_high_water;
 };
 
-static const log_param_t log_param_default{std::nullopt, std::nullopt};
+// log2 buckets: bucket i counts latencies of bit width i in ns, i.e. [2^(i-1), 2^i) ns, bucket 0 for 0 ns
+constexpr size_t LATENCY_BUCKET_COUNT = 40;
+
+struct latency_stat_t {
+    uint64_t count;
+    uint64_t sum_ns;
+    uint64_t max_ns;
+    std::vector<uint64_t> bucket;
+};
+
+struct logger_metrics_t {
+    std::string name;
+    std::vector<uint64_t> level_count; // messages passed to the queue, indexed by spdlog level (trace .. critical)
+    uint64_t num_rate_limited;         // suppressed by a token bucket
+    uint64_t num_collapsed;            // counted as a repeat of the last message of the call site
+};
+
+struct sink_metrics_t {
+    std::string key; // sink key in the sink registry
+    latency_stat_t write;
+    latency_stat_t flush;
+};
+
+struct log_metrics_t {
+    async_stat_t async;
+    std::vector<logger_metrics_t> loggers;
+    std::vector<sink_metrics_t> sinks; // installed sinks
+};
+
+struct mp_stat_t {
+    size_t slot_count;
+    size_t slot_size;   // bytes per slot, slot header included
+    size_t num_pending; // claimed by worker processes, not drained yet
+    size_t num_pushed;  // records accepted since the ring was created
+    size_t num_dropped; // ring full on a non-blocking write
+};
+
+void reset_logging(const log_param_t log_param = log_param_default);            // impl in log.cpp
+flush_stat_t flush_logging(const std::optional<double> timeout = std::nullopt); // impl in log.cpp
+async_stat_t get_async_stat();                                                  // impl in log_async.cpp
+log_metrics_t get_log_metrics();
+// limit of logger name (exact, not inherited by dotted children), nullopt: the limit of log_param_t. impl in
+// log_limit.cpp
+void set_logger_limit(const std::string &name, const std::optional<limit_param_t> limit);
+// write the records kept by the ring sink to its file and empty it, after a flush; records written
+size_t dump_ring();
+
+// for callers that must not wait, e.g. an event loop: run on the control thread of the log device in call order,
+// done is called on that thread when the call returns. impl in log.cpp
+void reset_logging_async(const log_param_t log_param, std::function<void()> done);
+void flush_logging_async(const std::optional<double> timeout, std::function<void(flush_stat_t)> done);
+void wait_logging_async(); // until the calls posted so far are done
+
+struct log_bench_stat_t {
+    size_t num_record;
+    double elapsed;                   // seconds, until the sinks have written every record
+    std::vector<uint64_t> latency_ns; // of each logging call, on the calling thread
+};
 
-void reset_logging(const log_param_t log_param = log_param_default); // impl in log.cpp
-void flush_logging(); //impl in log.cpp
+// num_record records of msg_size bytes through the native logger key, split over thread_count threads
+log_bench_stat_t bench_logging(const std::string &key, const size_t num_record, const size_t msg_size,
+                               const size_t thread_count); // impl in log.cpp
 
 } // namespace libtcomplex::log
 
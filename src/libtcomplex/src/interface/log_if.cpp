@@ -1,11 +1,17 @@
 #include "../log.h"
+#include "../log_async.h"
+#include "../log_lazy.h"
+#include "../log_mp.h"
+#include <algorithm>
+#include <array>
 #include <chrono>
 #include <libtcomplex/interface/log_if.h>
 
-#include <fmt/chrono.h>
 #include <fmt/core.h>
 #include <fmt/format.h>
 
+#include <tsl/robin_map.h>
+
 namespace libtcomplex::interface::log {
 
 using namespace libtcomplex::log;
@@ -17,12 +23,8 @@ bool check_init() {
 
 LogCtx::LogCtx(const std::string key) : key{key} {
     SPDLOG_INFO("x");
-    auto f_console = std::make_unique<formatter::group_color_formatter>(3);
-    auto f_file = std::make_unique<spdlog::pattern_formatter>("%v");
-    sink_formatter_map fmap;
-    fmap.insert({std::string{console_sink_key}, std::move(f_console)});
-    fmap.insert({std::string{file_sink_key}, std::move(f_file)});
-    this->logger = get_logger(this->key, std::move(fmap));
+    // records carry their own time & source location, rendered by the sink formatters as native records are
+    this->logger = get_logger(this->key);
     SPDLOG_INFO("y");
 }
 
@@ -51,23 +53,276 @@ spdlog::level::level_enum get_level_from_py(const int lvl) {
     return res;
 }
 
-void LogCtx::log(const int lvl, const char *msg, double created, const char *filename, const char *funcname,
-                 const int lineno) {
-    using spdlog::level::to_string_view;
+// python level of a native level threshold: trace maps to 5 as python has none, off to above CRITICAL
+static int get_level_to_py(const spdlog::level::level_enum level) {
+    constexpr std::array<int, spdlog::level::n_levels> py_level{5, 10, 20, 30, 40, 50, 60};
+    return py_level[level];
+}
+
+// native level threshold of a python level, rounded down so nothing python lets through is dropped natively
+static spdlog::level::level_enum get_threshold_from_py(const int lvl) {
+    if (lvl > 50) {
+        return spdlog::level::off;
+    }
+    return get_level_from_py(lvl / 10 * 10);
+}
+
+// native level of a python record level, rounded down as the threshold: a custom level (e.g. 25) passing a python
+// threshold passes the native one
+static spdlog::level::level_enum get_record_level_from_py(const int lvl) {
+    return get_level_from_py(std::clamp(lvl, 0, 50) / 10 * 10);
+}
+
+void set_logger_level(const std::string &name, const int lvl) {
+    const auto level = (lvl > 0) ? std::optional{get_threshold_from_py(lvl)} : std::nullopt;
+    libtcomplex::log::set_logger_level(name, level, false);
+}
+
+int get_logger_level(const std::string &name) { return get_level_to_py(libtcomplex::log::get_logger_level(name)); }
+
+bool is_enabled_for(const std::string &name, const int lvl) {
+    const auto level = get_record_level_from_py(lvl);
+    return level >= libtcomplex::log::get_logger_level(name);
+}
+
+std::vector<std::tuple<std::string, int>> get_level_table() {
+    std::vector<std::tuple<std::string, int>> res;
+    for (const auto &[name, level] : libtcomplex::log::get_level_table()) {
+        res.emplace_back(name, get_level_to_py(level));
+    }
+    return res;
+}
+
+void set_level_listener(level_listener_t listener) {
+    if (!listener) {
+        libtcomplex::log::set_level_listener(nullptr);
+        return;
+    }
+    libtcomplex::log::set_level_listener(
+        [listener = std::move(listener)](const std::string &name, std::optional<spdlog::level::level_enum> level) {
+            listener(name, level.has_value() ? get_level_to_py(level.value()) : 0);
+        });
+}
+
+static spdlog::log_clock::time_point get_time_from_py(const int64_t created_ns) {
+    using time_point = spdlog::log_clock::time_point;
+    return time_point{std::chrono::duration_cast<time_point::duration>(std::chrono::nanoseconds{created_ns})};
+}
+
+static spdlog::source_loc get_source_from_py(const char *filename, const char *funcname, const int lineno) {
+    // source_loc is not copied into the async queue, point it to interned strings
+    return spdlog::source_loc{intern_string(filename), lineno, intern_string(funcname)};
+}
+
+int reg_call_site(const std::string &filename, const std::string &funcname, const int lineno) {
+    return libtcomplex::log::reg_call_site(filename, funcname, lineno);
+}
+
+static_assert(std::is_same_v<log_arg_t, lazy::arg_t>);
+
+static spdlog::source_loc get_record_loc(const log_site_t &site) {
+    if (const int *site_id = std::get_if<int>(&site)) {
+        return get_call_site(*site_id);
+    }
+    const auto &[filename, funcname, lineno] = std::get<1>(site);
+    return get_source_from_py(filename.c_str(), funcname.c_str(), lineno);
+}
+
+// the source location is resolved only for records passing the level check
+template <typename loc_fn>
+static void log_to(spdlog::logger &logger, const int lvl, const std::string_view msg, const int64_t created_ns,
+                   loc_fn &&get_loc) {
+    const spdlog::level::level_enum loglvl = get_record_level_from_py(lvl);
+    if (!logger.should_log(loglvl)) {
+        return;
+    }
+
+    logger.log(get_time_from_py(created_ns), get_loc(), loglvl, spdlog::string_view_t{msg.data(), msg.size()});
+}
+
+template <typename loc_fn>
+static void log_lazy_to(spdlog::logger &logger, const int lvl, const std::string_view msg,
+                        const std::vector<log_arg_t> &args, const int64_t created_ns, loc_fn &&get_loc) {
+    const spdlog::level::level_enum loglvl = get_record_level_from_py(lvl);
+    if (!logger.should_log(loglvl)) {
+        return;
+    }
 
-    const spdlog::level::level_enum loglvl = get_level_from_py(lvl);
+    // only pack here, the message is rendered by the sink formatter on the worker thread
+    spdlog::memory_buf_t buf;
+    lazy::pack(buf, msg, args);
+    logger.log(get_time_from_py(created_ns), get_loc(), loglvl, spdlog::string_view_t{buf.data(), buf.size()});
+}
 
-    using time_point = std::chrono::system_clock::time_point;
-    const std::chrono::duration<double> _ct{created};
-    const auto _ct_ns = std::chrono::duration_cast<time_point::duration>(_ct);
-    const time_point ct{_ct_ns};
-    const auto second_part = std::chrono::time_point_cast<std::chrono::seconds>(ct);
-    const auto fraction = ct - second_part;
-    const auto millisecond_part = std::chrono::duration_cast<std::chrono::milliseconds>(fraction);
+void LogCtx::log(const int lvl, const std::string_view msg, const int64_t created_ns, const char *filename,
+                 const char *funcname, const int lineno) {
+    log_to(*this->logger, lvl, msg, created_ns, [&] { return get_source_from_py(filename, funcname, lineno); });
+}
 
-    this->logger->log(loglvl,                                                  //
-                      "[{:%Y-%m-%d %H:%M:%S}.{:0>3}] [{}] [{}] [{}:{}:{}] {}", //
-                      ct, millisecond_part.count(), this->key, to_string_view(loglvl), filename, lineno, funcname, msg);
+void LogCtx::log_lazy(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args,
+                      const int64_t created_ns, const char *filename, const char *funcname, const int lineno) {
+    log_lazy_to(*this->logger, lvl, msg, args, created_ns,
+                [&] { return get_source_from_py(filename, funcname, lineno); });
+}
+
+void LogCtx::log_site(const int lvl, const std::string_view msg, const int64_t created_ns, const int site) {
+    log_to(*this->logger, lvl, msg, created_ns, [site] { return get_call_site(site); });
+}
+
+void LogCtx::log_lazy_site(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args,
+                           const int64_t created_ns, const int site) {
+    log_lazy_to(*this->logger, lvl, msg, args, created_ns, [site] { return get_call_site(site); });
+}
+
+void LogCtx::log_batch(const std::vector<log_record_t> &records) {
+    // records are converted by the binding while holding the gil, only the enqueue happens here
+    for (const auto &[lvl, msg, args, created, site] : records) {
+        if (std::size(args) == 0) {
+            log_to(*this->logger, lvl, msg, created, [&site] { return get_record_loc(site); });
+        } else {
+            log_lazy_to(*this->logger, lvl, msg, args, created, [&site] { return get_record_loc(site); });
+        }
+    }
+}
+
+bool LogCtx::try_log_site(const int lvl, const std::string_view msg, const int64_t created_ns, const int site) {
+    nowait_scope nowait;
+    this->log_site(lvl, msg, created_ns, site);
+    return !nowait.refused();
+}
+
+bool LogCtx::try_log_lazy_site(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args,
+                               const int64_t created_ns, const int site) {
+    nowait_scope nowait;
+    this->log_lazy_site(lvl, msg, args, created_ns, site);
+    return !nowait.refused();
+}
+
+size_t LogCtx::try_log_batch(const std::vector<log_record_t> &records) {
+    nowait_scope nowait;
+    size_t res = 0;
+    for (const auto &[lvl, msg, args, created, site] : records) {
+        if (std::size(args) == 0) {
+            log_to(*this->logger, lvl, msg, created, [&site] { return get_record_loc(site); });
+        } else {
+            log_lazy_to(*this->logger, lvl, msg, args, created, [&site] { return get_record_loc(site); });
+        }
+        if (nowait.refused()) {
+            break;
+        }
+        res += 1;
+    }
+    return res;
+}
+
+// multiprocess
+LogMpHost::LogMpHost(const std::string name, const size_t slot_count, const size_t slot_size) {
+    using logger_map =
+        tsl::robin_map<std::string, std::shared_ptr<spdlog::logger>, std::hash<std::string_view>, std::equal_to<>>;
+    // runs on the drain thread only
+    auto consume = [loggers = logger_map{}](const std::string_view raw) mutable {
+        const auto rec = mp::decode_record(raw);
+        if (!rec.has_value()) {
+            return;
+        }
+        auto it = loggers.find(rec->key);
+        if (it == loggers.end()) {
+            auto logger = get_logger(rec->key);
+            if (logger == nullptr) {
+                return; // logging not initialized
+            }
+            it = loggers.insert({std::string{rec->key}, logger}).first;
+        }
+        const auto &logger = it->second;
+        const spdlog::level::level_enum loglvl = get_record_level_from_py(rec->lvl);
+        if (!logger->should_log(loglvl)) {
+            return;
+        }
+        const spdlog::source_loc loc{intern_string(rec->filename), rec->lineno, intern_string(rec->funcname)};
+        logger->log(get_time_from_py(rec->created_ns), loc, loglvl,
+                    spdlog::string_view_t{rec->msg.data(), rec->msg.size()});
+    };
+    this->host = std::make_unique<mp::ring_host>(mp::shm_ring::create(name, slot_count, slot_size), std::move(consume));
+}
+
+LogMpHost::~LogMpHost() = default;
+
+std::string LogMpHost::name() const { return this->host->name(); }
+
+bool LogMpHost::drain(const std::optional<double> timeout) {
+    using clock = std::chrono::steady_clock;
+    std::optional<clock::time_point> deadline;
+    if (timeout.has_value()) {
+        deadline =
+            clock::now() + std::chrono::duration_cast<clock::duration>(std::chrono::duration<double>{timeout.value()});
+    }
+    return this->host->drain(deadline);
+}
+
+void LogMpHost::close() { this->host->stop(); }
+
+mp_stat_t LogMpHost::stat() const { return this->host->stat(); }
+
+LogMpCtx::LogMpCtx(const std::string name, const std::string key, const bool block)
+    : key{key}, block{block}, ring{mp::shm_ring::attach(name)} {}
+
+LogMpCtx::~LogMpCtx() = default;
+
+void LogMpCtx::push(const int lvl, const std::string_view msg, const int64_t created_ns,
+                    const std::string_view filename, const std::string_view funcname, const int lineno) {
+    uint64_t pos;
+    char *dest = this->ring->claim(pos, this->block);
+    if (dest == nullptr) {
+        return; // counted as dropped
+    }
+    const mp::record_view_t rec{lvl, created_ns, this->key, filename, funcname, lineno, msg};
+    this->ring->commit(pos, mp::encode_record(dest, this->ring->capacity(), rec));
+}
+
+void LogMpCtx::log(const int lvl, const std::string_view msg, const int64_t created_ns, const char *filename,
+                   const char *funcname, const int lineno) {
+    this->push(lvl, msg, created_ns, filename, funcname, lineno);
+}
+
+void LogMpCtx::log_lazy(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args,
+                        const int64_t created_ns, const char *filename, const char *funcname, const int lineno) {
+    spdlog::memory_buf_t buf;
+    lazy::pack(buf, msg, args);
+    const std::string_view packed{buf.data(), buf.size()};
+    const mp::record_view_t rec{lvl, created_ns, this->key, filename, funcname, lineno, packed};
+    if (mp::record_size(rec) <= this->ring->capacity()) {
+        this->push(lvl, packed, created_ns, filename, funcname, lineno);
+        return;
+    }
+    // a cut packed payload can not be rendered: render here, the text is cut to the slot
+    spdlog::memory_buf_t rendered;
+    lazy::render(spdlog::string_view_t{buf.data(), buf.size()}, rendered);
+    this->push(lvl, std::string_view{rendered.data(), rendered.size()}, created_ns, filename, funcname, lineno);
+}
+
+static const char *c_str_or_empty(const char *str) { return (str == nullptr) ? "" : str; }
+
+void LogMpCtx::log_site(const int lvl, const std::string_view msg, const int64_t created_ns, const int site) {
+    const auto loc = get_call_site(site);
+    this->log(lvl, msg, created_ns, c_str_or_empty(loc.filename), c_str_or_empty(loc.funcname), loc.line);
+}
+
+void LogMpCtx::log_lazy_site(const int lvl, const std::string_view msg, const std::vector<log_arg_t> &args,
+                             const int64_t created_ns, const int site) {
+    const auto loc = get_call_site(site);
+    this->log_lazy(lvl, msg, args, created_ns, c_str_or_empty(loc.filename), c_str_or_empty(loc.funcname), loc.line);
+}
+
+void LogMpCtx::log_batch(const std::vector<log_record_t> &records) {
+    for (const auto &[lvl, msg, args, created, site] : records) {
+        const auto loc = get_record_loc(site);
+        if (std::size(args) == 0) {
+            this->log(lvl, msg, created, c_str_or_empty(loc.filename), c_str_or_empty(loc.funcname), loc.line);
+        } else {
+            this->log_lazy(lvl, msg, args, created, c_str_or_empty(loc.filename), c_str_or_empty(loc.funcname),
+                           loc.line);
+        }
+    }
 }
 
 } // namespace libtcomplex::interface::log
@@ -1,11 +1,22 @@
 #include "log.h"
+#include "log_async.h"
+#include "log_lazy.h"
+#include "log_limit.h"
+#include "log_sink.h"
 
-#include <spdlog/async.h>
 #include <spdlog/details/fmt_helper.h>
 #include <spdlog/sinks/basic_file_sink.h>
 #include <spdlog/sinks/stdout_color_sinks.h>
 
+#include <algorithm>
+#include <array>
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <cstdlib>
+#include <deque>
 #include <mutex>
+#include <ranges>
 #include <thread>
 
 #include <range/v3/range/conversion.hpp>
@@ -31,9 +42,19 @@ formatter::condition_pattern_formatter *ptr_log_formatter() { // todo: support d
 
 // reset_logging, core of logging device
 void reset_logging(const log_param_t log_param) {
-    static bool thread_pool_inited = false;
     static log_type_t log_type = log_type_t::disabled;
     static std::string log_filename;
+    static file_sink_type_t file_sink_type = file_sink_type_t::basic;
+    static rotate_param_t rotate_param{0, 0.0, FILE_MAX_ROTATE};
+    static spdlog::level::level_enum file_level = spdlog::level::trace;
+    static std::string ring_filename; // as set, empty: follows log_filename
+    static ring_param_t ring_param{0, "", spdlog::level::off};
+    static async_param_t async_param{ASYNC_QUEUE_SIZE, ASYNC_THREAD_COUNT, async_overflow_t::block, 0};
+    static std::shared_ptr<const sink_set_t> sink_set_curr;
+
+    // before the lock: setting a level takes it
+    static std::once_flag env_level_flag;
+    std::call_once(env_level_flag, load_env_levels);
 
     // lock
     std::scoped_lock lock(reset_mutex);
@@ -45,108 +66,290 @@ void reset_logging(const log_param_t log_param) {
     if (log_param.log_type.has_value()) {
         log_type = log_param.log_type.value();
     }
-    if (log_param.log_filename.has_value()) {
+    const auto file_sink_type_prev = file_sink_type;
+    const auto rotate_param_prev = rotate_param;
+    if (log_param.file_sink_type.has_value()) {
+        file_sink_type = log_param.file_sink_type.value();
+    }
+    if (log_param.file_max_size.has_value()) {
+        rotate_param.max_size = log_param.file_max_size.value();
+    }
+    if (log_param.file_rotate_interval.has_value()) {
+        rotate_param.interval = log_param.file_rotate_interval.value();
+    }
+    if (log_param.file_max_rotate.has_value()) {
+        rotate_param.max_rotate = log_param.file_max_rotate.value();
+    }
+    if (log_param.log_filename.has_value() || file_sink_type != file_sink_type_prev ||
+        rotate_param != rotate_param_prev) {
         // uninstall sink
         sink_registry_.wipe_sink(file_sink_key);
         // update tmp_filename
-        auto tmp_filename = log_param.log_filename.value();
-        log_filename = std::string{tmp_filename.cbegin(), tmp_filename.cend()};
+        if (log_param.log_filename.has_value()) {
+            auto tmp_filename = log_param.log_filename.value();
+            log_filename = std::string{tmp_filename.cbegin(), tmp_filename.cend()};
+        }
         // unreg sink
         sink_registry_.unreg_sink(file_sink_key);
     }
-
-    // force all loggers to flush
-    flush_logging();
-
-    // clear all loggers sinks
-    try {
-        spdlog::apply_all([](const std::shared_ptr<spdlog::logger> l) { l->sinks().clear(); });
-    } catch (const spdlog::spdlog_ex &ex) {
-        fprintf(stderr, "error! %s\n", ex.what());
+    if (log_param.file_level.has_value()) {
+        file_level = static_cast<spdlog::level::level_enum>(std::clamp(log_param.file_level.value(), 0, 6));
+    }
+    const auto ring_param_prev = ring_param;
+    if (log_param.ring_size.has_value()) {
+        ring_param.size = log_param.ring_size.value();
+    }
+    if (log_param.ring_filename.has_value()) {
+        ring_filename = log_param.ring_filename.value();
+    }
+    if (log_param.ring_dump_level.has_value()) {
+        ring_param.dump_level =
+            static_cast<spdlog::level::level_enum>(std::clamp(log_param.ring_dump_level.value(), 0, 6));
+    }
+    ring_param.filename = (std::size(ring_filename) > 0 || std::size(log_filename) == 0)
+                              ? ring_filename
+                              : fmt::format("{}.ring", log_filename);
+    if (ring_param != ring_param_prev) {
+        sink_registry_.wipe_sink(ring_sink_key);
+        sink_registry_.unreg_sink(ring_sink_key);
+    }
+    if (log_param.async_queue_size.has_value()) {
+        async_param.queue_size = log_param.async_queue_size.value();
+    }
+    if (log_param.async_thread_count.has_value()) {
+        async_param.thread_count = log_param.async_thread_count.value();
+    }
+    if (log_param.async_overflow.has_value()) {
+        async_param.overflow = log_param.async_overflow.value();
+    }
+    if (log_param.async_queue_max_bytes.has_value()) {
+        async_param.queue_max_bytes = log_param.async_queue_max_bytes.value();
+    }
+    if (log_param.limit.has_value()) {
+        set_limit_default(log_param.limit.value());
     }
 
-    // remove default logger
+    // setup logging!
     try {
-        spdlog::set_default_logger(nullptr);
+        sink_registry_.reg_default(log_filename, file_sink_type, rotate_param, ring_param);
     } catch (const spdlog::spdlog_ex &ex) {
         fprintf(stderr, "error! %s\n", ex.what());
     }
 
-    // get existing registered logger
-    std::vector<std::shared_ptr<spdlog::logger>> logger_vec;
+    // hot reconfiguration: loggers stay registered, the new sink set is handed to the workers through the queue
     try {
-        spdlog::apply_all([&](const std::shared_ptr<spdlog::logger> l) { logger_vec.push_back(l); });
+        sink_registry_.upkeep_default(log_type);
+        if (auto file_sink = sink_registry_.get_buf_sink(file_sink_key); file_sink != nullptr) {
+            file_sink->set_level(file_level);
+        }
+
+        sink_set_t sink_vec;
+        for (const auto &[sink_key, sink] : sink_registry_.sink_items()) {
+            sink_vec.push_back({sink, sink_registry_.ref_sink_meter(sink_key)});
+        }
+        // keep the installed order stable, so an unchanged sink set is detected
+        std::ranges::sort(sink_vec, {}, &sink_entry_t::sink);
+        const bool sink_changed = sink_set_curr == nullptr || *sink_set_curr != sink_vec;
+        if (sink_changed) {
+            sink_set_curr = std::make_shared<const sink_set_t>(std::move(sink_vec));
+        }
+
+        // a new thread pool only when its shape changes, the policy is applied live
+        auto pool = ref_async_pool();
+        if (pool == nullptr || pool->param().queue_size != async_param.queue_size ||
+            pool->param().thread_count != async_param.thread_count) {
+            if (pool != nullptr) {
+                // keep order: what is queued in the old pool goes out first
+                size_t num_drained = 0;
+                pool->drain(std::nullopt, num_drained);
+            }
+            set_async_pool(std::make_shared<async_pool>(async_param, sink_set_curr));
+        } else {
+            pool->set_overflow(async_param.overflow, async_param.queue_max_bytes);
+            if (sink_changed) {
+                pool->post_sink_set(sink_set_curr);
+            }
+        }
+
+        if (spdlog::get(std::string{ROOT_LOGGER_NAME}) == nullptr) {
+            auto root_logger = std::make_shared<async_logger>(std::string{ROOT_LOGGER_NAME});
+            root_logger->set_level(get_logger_level(ROOT_LOGGER_NAME));
+            spdlog::set_default_logger(root_logger);
+        }
     } catch (const spdlog::spdlog_ex &ex) {
         fprintf(stderr, "error! %s\n", ex.what());
     }
+}
 
-    // drop existing log device
-    try {
-        spdlog::drop_all();
-    } catch (const spdlog::spdlog_ex &ex) {
-        fprintf(stderr, "error! %s\n", ex.what());
+// flush logging
+flush_stat_t flush_logging(const std::optional<double> timeout) {
+    using clock = std::chrono::steady_clock;
+    const auto t_begin = clock::now();
+    std::optional<clock::time_point> deadline;
+    if (timeout.has_value()) {
+        deadline =
+            t_begin + std::chrono::duration_cast<clock::duration>(std::chrono::duration<double>{timeout.value()});
     }
+    flush_stat_t res{true, 0, 0.0};
 
-    // setup logging!
+    // force all loggers to flush
     try {
-        sink_registry_.reg_default(log_filename);
+        spdlog::apply_all([](const std::shared_ptr<spdlog::logger> l) { l->flush(); });
     } catch (const spdlog::spdlog_ex &ex) {
         fprintf(stderr, "error! %s\n", ex.what());
     }
 
-    //
-    std::vector<spdlog::sink_ptr> sink_vec;
+    // wait until every message enqueued so far is processed
     try {
-        if (!thread_pool_inited) {
-            spdlog::init_thread_pool(ASYNC_QUEUE_SIZE, ASYNC_THREAD_COUNT);
-            thread_pool_inited = true;
+        auto pool = ref_async_pool();
+        if (pool != nullptr) {
+            res.drained = pool->drain(deadline, res.num_drained);
         }
+    } catch (const std::exception &ex) {
+        fprintf(stderr, "error! %s\n", ex.what());
+    }
 
-        sink_registry_.upkeep_default(log_type);
+    res.elapsed = std::chrono::duration<double>(clock::now() - t_begin).count();
+    return res;
+}
 
-        sink_vec = sink_registry_.sink_items() | ranges::views::values | ranges::to<std::vector>;
+// region ====== control thread >>>
+namespace {
+// runs posted calls one at a time in post order, started on first use
+class control_thread {
+public:
+    ~control_thread() {
+        {
+            std::scoped_lock lock(mutex_);
+            if (!thread_.joinable()) {
+                return;
+            }
+            stop_ = true;
+        }
+        cv_.notify_all();
+        thread_.join();
+    }
 
-        auto root_logger =
-            std::make_shared<spdlog::async_logger>(std::string{ROOT_LOGGER_NAME}, sink_vec.cbegin(), sink_vec.cend(),
-                                                   spdlog::thread_pool(), spdlog::async_overflow_policy::block);
-        root_logger->set_level(spdlog::level::trace);
-        spdlog::set_default_logger(root_logger);
+    void post(std::function<void()> &&call) {
+        {
+            std::scoped_lock lock(mutex_);
+            if (!thread_.joinable()) {
+                thread_ = std::thread([this]() { this->loop_(); });
+            }
+            calls_.push_back(std::move(call));
+            num_posted_ += 1;
+        }
+        cv_.notify_all();
+    }
 
-    } catch (const spdlog::spdlog_ex &ex) {
-        fprintf(stderr, "error! %s\n", ex.what());
+    void wait() {
+        std::unique_lock lock(mutex_);
+        const size_t target = num_posted_;
+        cv_.wait(lock, [&]() { return num_done_ >= target; });
     }
 
-    // for each logger: use new sinks & re-register
-    try {
-        for (const auto l : logger_vec) {
-            l->sinks() = sink_vec;
-            spdlog::register_logger(l);
+private:
+    void loop_() {
+        std::unique_lock lock(mutex_);
+        while (true) {
+            cv_.wait(lock, [this]() { return stop_ || !calls_.empty(); });
+            if (calls_.empty()) {
+                return; // stop, after the queued calls
+            }
+            auto call = std::move(calls_.front());
+            calls_.pop_front();
+            lock.unlock();
+            try {
+                call();
+            } catch (const std::exception &ex) {
+                fprintf(stderr, "error! %s\n", ex.what());
+            }
+            call = nullptr; // release what the call holds before it is reported done
+            lock.lock();
+            num_done_ += 1;
+            cv_.notify_all();
         }
-    } catch (const spdlog::spdlog_ex &ex) {
-        fprintf(stderr, "error! %s\n", ex.what());
     }
+
+    std::mutex mutex_;
+    std::condition_variable cv_;
+    std::deque<std::function<void()>> calls_;
+    size_t num_posted_{0};
+    size_t num_done_{0};
+    bool stop_{false};
+    std::thread thread_;
+};
+
+control_thread &ref_control_thread() {
+    static control_thread thread;
+    return thread;
 }
+} // namespace
 
-// flush logging
-void flush_logging() {
-    // force all loggers to flush
+void reset_logging_async(const log_param_t log_param, std::function<void()> done) {
+    ref_control_thread().post([log_param, done = std::move(done)]() {
+        reset_logging(log_param);
+        if (done) {
+            done();
+        }
+    });
+}
+
+void flush_logging_async(const std::optional<double> timeout, std::function<void(flush_stat_t)> done) {
+    ref_control_thread().post([timeout, done = std::move(done)]() {
+        const auto res = flush_logging(timeout);
+        if (done) {
+            done(res);
+        }
+    });
+}
+
+void wait_logging_async() { ref_control_thread().wait(); }
+// endregion === control thread <<<
+
+// flight recorder
+size_t dump_ring() {
+    // what is queued so far reaches the ring first
+    flush_logging(std::nullopt);
+
+    std::shared_ptr<ring_sink> sink;
+    {
+        std::scoped_lock lock(reset_mutex);
+        sink = std::dynamic_pointer_cast<ring_sink>(ref_sink_registry().get_buf_sink(ring_sink_key));
+    }
+    if (sink == nullptr) {
+        return 0;
+    }
     try {
-        spdlog::apply_all([](const std::shared_ptr<spdlog::logger> l) { l->flush(); });
+        return sink->dump();
     } catch (const spdlog::spdlog_ex &ex) {
         fprintf(stderr, "error! %s\n", ex.what());
+        return 0;
     }
+}
+
+// metrics
+log_metrics_t get_log_metrics() {
+    log_metrics_t res{get_async_stat(), {}, {}};
 
-    // wait until threadpool is empty
     try {
-        auto spdlog_tp = spdlog::thread_pool();
-        if (spdlog_tp != nullptr) {
-            while (spdlog_tp->queue_size() != 0) {
-                std::this_thread::sleep_for(std::chrono::milliseconds(FLUSH_WAIT_SLICE));
+        spdlog::apply_all([&](const std::shared_ptr<spdlog::logger> l) {
+            if (const auto logger = std::dynamic_pointer_cast<async_logger>(l); logger != nullptr) {
+                res.loggers.push_back({logger->name(), logger->level_count(), logger->limiter().num_rate_limited(),
+                                       logger->limiter().num_collapsed()});
             }
-        }
+        });
     } catch (const spdlog::spdlog_ex &ex) {
         fprintf(stderr, "error! %s\n", ex.what());
     }
+
+    std::scoped_lock lock(reset_mutex);
+    sink_registry &sink_registry_ = ref_sink_registry();
+    for (const auto &sink_key : sink_registry_.sink_items() | ranges::views::keys) {
+        const auto meter = sink_registry_.ref_sink_meter(sink_key);
+        res.sinks.push_back({sink_key, meter->write.snapshot(), meter->flush.snapshot()});
+    }
+    return res;
 }
 
 // sink registry
@@ -171,11 +374,10 @@ void sink_registry::enable_sink(const std::string_view sink_key) {
         // set formatter
         if (!this->check_sink_formatter(sink_key)) {
             this->sink_formatter_map_.insert({std::string{sink_key}, this->default_formatter->exact_clone()});
-            sink_curr->set_formatter(this->default_formatter->clone());
-        } else {
-            auto formatter_curr = this->sink_formatter_map_.at(sink_key).get();
-            sink_curr->set_formatter(formatter_curr->clone());
         }
+        auto formatter_live = this->sink_formatter_map_.at(sink_key)->exact_clone();
+        this->sink_live_formatter_map_.insert_or_assign(std::string{sink_key}, formatter_live.get());
+        sink_curr->set_formatter(std::move(formatter_live));
 
         // store in buf
         this->sink_buf_map_.insert({std::string{sink_key}, sink_curr});
@@ -186,6 +388,14 @@ void sink_registry::enable_sink(const std::string_view sink_key) {
     }
 }
 
+std::shared_ptr<sink_meter_t> sink_registry::ref_sink_meter(const std::string_view sink_key) {
+    auto it = this->sink_meter_map_.find(sink_key);
+    if (it == this->sink_meter_map_.end()) {
+        it = this->sink_meter_map_.insert({std::string{sink_key}, std::make_shared<sink_meter_t>()}).first;
+    }
+    return it->second;
+}
+
 void sink_registry::disable_sink(const std::string_view sink_key) {
     if (this->check_sink_install(sink_key)) {
         this->sink_map_.erase(sink_key);
@@ -197,11 +407,13 @@ void sink_registry::wipe_sink(const std::string_view sink_key) {
 
     if (this->check_sink_buf(sink_key)) {
         this->sink_buf_map_.erase(sink_key);
+        this->sink_live_formatter_map_.erase(sink_key);
     }
 }
 
 // default logging managed by registry
-void sink_registry::reg_default(const std::string_view log_filename) {
+void sink_registry::reg_default(const std::string_view log_filename, const file_sink_type_t file_sink_type,
+                                const rotate_param_t &rotate_param, const ring_param_t &ring_param) {
     // reg default sink if not regged
     if (!this->check_sink_reg(console_sink_key)) {
         this->reg_sink(console_sink_key, []() {
@@ -213,10 +425,19 @@ void sink_registry::reg_default(const std::string_view log_filename) {
 
     if (!this->check_sink_reg(file_sink_key)) {
         const std::string log_filename_curr{log_filename};
-        this->reg_sink(file_sink_key, [log_filename_curr]() -> spdlog::sink_ptr {
+        this->reg_sink(file_sink_key, [log_filename_curr, file_sink_type, rotate_param]() -> spdlog::sink_ptr {
             try {
                 if (std::size(log_filename_curr) > 0) {
-                    auto file_sink = std::make_shared<spdlog::sinks::basic_file_sink_mt>(log_filename_curr, true);
+                    spdlog::sink_ptr file_sink;
+                    if (file_sink_type == file_sink_type_t::rotating) {
+                        file_sink = std::make_shared<rotating_file_sink>(log_filename_curr, rotate_param);
+                    } else if (file_sink_type == file_sink_type_t::binary) {
+                        file_sink = std::make_shared<binary_file_sink>(log_filename_curr);
+                    } else if (file_sink_type == file_sink_type_t::mmap) {
+                        file_sink = std::make_shared<mmap_file_sink>(log_filename_curr);
+                    } else {
+                        file_sink = std::make_shared<spdlog::sinks::basic_file_sink_mt>(log_filename_curr, true);
+                    }
                     file_sink->set_level(spdlog::level::trace);
                     return file_sink;
                 } else {
@@ -228,6 +449,17 @@ void sink_registry::reg_default(const std::string_view log_filename) {
         });
     }
 
+    if (!this->check_sink_reg(ring_sink_key)) {
+        this->reg_sink(ring_sink_key, [ring_param]() -> spdlog::sink_ptr {
+            if (ring_param.size == 0 || std::size(ring_param.filename) == 0) {
+                return nullptr;
+            }
+            auto ring = std::make_shared<ring_sink>(ring_param);
+            ring->set_level(spdlog::level::trace);
+            return ring;
+        });
+    }
+
     // reg default formatter if not regged
     if (!this->check_sink_formatter(console_sink_key)) {
         this->install_sink_formatter(
@@ -241,6 +473,12 @@ void sink_registry::reg_default(const std::string_view log_filename) {
             std::move(std::make_unique<formatter::condition_pattern_formatter>(
                 std::make_unique<spdlog::pattern_formatter>("[%Y-%m-%d %H:%M:%S.%e] [%n] [%l] [%s:%#:%!] %v"))));
     }
+    if (!this->check_sink_formatter(ring_sink_key)) {
+        this->install_sink_formatter(
+            ring_sink_key,
+            std::move(std::make_unique<formatter::condition_pattern_formatter>(
+                std::make_unique<spdlog::pattern_formatter>("[%Y-%m-%d %H:%M:%S.%e] [%n] [%l] [%s:%#:%!] %v"))));
+    }
 }
 
 void sink_registry::upkeep_default(const log_type_t log_type) {
@@ -254,6 +492,11 @@ void sink_registry::upkeep_default(const log_type_t log_type) {
     } else {
         this->disable_sink(file_sink_key);
     }
+    if (log_type != log_type_t::disabled) {
+        this->enable_sink(ring_sink_key);
+    } else {
+        this->disable_sink(ring_sink_key);
+    }
 }
 
 // get logger
@@ -265,11 +508,9 @@ std::shared_ptr<spdlog::logger> get_logger(const std::string_view name) {
         if (root == nullptr) {
             logger = nullptr;
         } else {
-            // create a new logger using same sink with root
-            auto &sinks = root->sinks();
-            logger = std::make_shared<spdlog::async_logger>(std::string{name}, sinks.cbegin(), sinks.cend(),
-                                                            spdlog::thread_pool());
-            logger->set_level(root->level());
+            // sinks are shared by all loggers through the async pool
+            logger = std::make_shared<async_logger>(std::string{name});
+            logger->set_level(get_logger_level(name));
             spdlog::register_logger(logger);
         }
     }
@@ -285,11 +526,9 @@ std::shared_ptr<spdlog::logger> get_logger(const std::string_view name, sink_for
         if (root == nullptr) {
             logger = nullptr;
         } else {
-            // create a new logger using same sink with root
-            auto &sinks = root->sinks();
-            logger = std::make_shared<spdlog::async_logger>(std::string{name}, sinks.cbegin(), sinks.cend(),
-                                                            spdlog::thread_pool());
-            logger->set_level(root->level());
+            // sinks are shared by all loggers through the async pool
+            logger = std::make_shared<async_logger>(std::string{name});
+            logger->set_level(get_logger_level(name));
             spdlog::register_logger(logger);
         }
     }
@@ -300,10 +539,9 @@ std::shared_ptr<spdlog::logger> get_logger(const std::string_view name, sink_for
             auto target_f = sink_registry_.get_formatter(sink_key);
             auto mode_f = fmap.at(sink_key).get();
             target_f->add_condition(name, mode_f->clone());
-            // override sink formatter
-            if (sink_registry_.check_sink_buf(sink_key)) {
-                auto sink_p = sink_registry_.get_buf_sink(sink_key);
-                sink_p->set_formatter(target_f->clone());
+            // the created sink takes the condition too, in place
+            if (auto live_f = sink_registry_.get_live_formatter(sink_key); live_f != nullptr) {
+                live_f->add_condition(name, mode_f->clone());
             }
         }
     }
@@ -311,16 +549,279 @@ std::shared_ptr<spdlog::logger> get_logger(const std::string_view name, sink_for
     return logger;
 }
 
+// level registry
+namespace {
+struct level_registry {
+    std::mutex mutex;
+    tsl::robin_map<std::string, spdlog::level::level_enum, std::hash<std::string_view>, std::equal_to<>> level_map;
+    std::shared_ptr<const level_listener_t> listener; // copied out under the lock, called outside
+};
+
+level_registry &ref_level_registry() {
+    static level_registry registry;
+    return registry;
+}
+
+// caller holds the registry lock
+spdlog::level::level_enum effective_level(const level_registry &registry, std::string_view name) {
+    while (true) {
+        const auto it = registry.level_map.find(name);
+        if (it != registry.level_map.end()) {
+            return it->second;
+        }
+        const auto pos = name.rfind('.');
+        if (pos == std::string_view::npos) {
+            break;
+        }
+        name = name.substr(0, pos);
+    }
+    const auto it = registry.level_map.find(ROOT_LOGGER_NAME);
+    return (it != registry.level_map.end()) ? it->second : spdlog::level::trace;
+}
+} // namespace
+
+void set_logger_level(const std::string_view name, const std::optional<spdlog::level::level_enum> level,
+                      const bool notify) {
+    auto &registry = ref_level_registry();
+    std::shared_ptr<const level_listener_t> listener;
+    {
+        // with reset_mutex, a logger created by get_logger meanwhile takes the new level
+        std::scoped_lock lock(reset_mutex, registry.mutex);
+        const auto it = registry.level_map.find(name);
+        const auto prev = (it != registry.level_map.end()) ? std::optional{it->second} : std::nullopt;
+        if (prev == level) {
+            return;
+        }
+        if (level.has_value()) {
+            registry.level_map.insert_or_assign(std::string{name}, level.value());
+        } else {
+            registry.level_map.erase(it);
+        }
+        // every logger under name, whatever the depth, may change
+        spdlog::apply_all([&registry](const std::shared_ptr<spdlog::logger> l) {
+            l->set_level(effective_level(registry, l->name()));
+        });
+        if (notify) {
+            listener = registry.listener;
+        }
+    }
+    if (listener != nullptr && *listener) {
+        try {
+            (*listener)(std::string{name}, level);
+        } catch (const std::exception &ex) {
+            fprintf(stderr, "error! %s\n", ex.what());
+        }
+    }
+}
+
+spdlog::level::level_enum get_logger_level(const std::string_view name) {
+    auto &registry = ref_level_registry();
+    std::scoped_lock lock(registry.mutex);
+    return effective_level(registry, name);
+}
+
+std::vector<std::pair<std::string, spdlog::level::level_enum>> get_level_table() {
+    auto &registry = ref_level_registry();
+    std::scoped_lock lock(registry.mutex);
+    return {registry.level_map.begin(), registry.level_map.end()};
+}
+
+void set_level_listener(level_listener_t listener) {
+    auto &registry = ref_level_registry();
+    auto next = std::make_shared<const level_listener_t>(std::move(listener));
+    {
+        std::scoped_lock lock(registry.mutex);
+        std::swap(registry.listener, next);
+    }
+    // the previous listener goes here, out of the lock
+}
+
+void load_env_levels() {
+    const char *spec = std::getenv(std::string{LOG_LEVEL_ENV}.c_str());
+    if (spec == nullptr) {
+        return;
+    }
+    for (const auto part : std::string_view{spec} | std::views::split(',')) {
+        const std::string_view entry{part.begin(), part.end()};
+        if (entry.empty()) {
+            continue;
+        }
+        const auto pos = entry.find('=');
+        const auto name = (pos == std::string_view::npos) ? ROOT_LOGGER_NAME : entry.substr(0, pos);
+        const auto level_name = (pos == std::string_view::npos) ? entry : entry.substr(pos + 1);
+        const auto level = spdlog::level::from_str(std::string{level_name});
+        if (level == spdlog::level::off && level_name != "off") {
+            fprintf(stderr, "error! unknown level in %s: %s\n", LOG_LEVEL_ENV.data(), std::string{entry}.c_str());
+            continue;
+        }
+        set_logger_level(name, level, true);
+    }
+}
+
+// logger id
+namespace {
+struct logger_id_table {
+    std::mutex mutex;
+    tsl::robin_map<std::string, size_t, std::hash<std::string_view>, std::equal_to<>> id_map;
+};
+
+logger_id_table &ref_logger_id_table() {
+    static logger_id_table table;
+    return table;
+}
+} // namespace
+
+size_t ref_logger_id(const std::string_view name) {
+    auto &table = ref_logger_id_table();
+    std::scoped_lock lock(table.mutex);
+    auto it = table.id_map.find(name);
+    if (it == table.id_map.end()) {
+        it = table.id_map.insert({std::string{name}, std::size(table.id_map)}).first;
+    }
+    return it->second;
+}
+
+size_t find_logger_id(const std::string_view name) {
+    auto &table = ref_logger_id_table();
+    std::scoped_lock lock(table.mutex);
+    const auto it = table.id_map.find(name);
+    return (it != table.id_map.end()) ? it->second : NO_LOGGER_ID;
+}
+
+// intern string
+const char *intern_string(const std::string_view str) {
+    static std::mutex intern_mutex;
+    static std::deque<std::string> intern_store; // element address is stable on push_back
+    static tsl::robin_map<std::string_view, const char *> intern_map;
+
+    std::scoped_lock lock(intern_mutex);
+    auto it = intern_map.find(str);
+    if (it != intern_map.end()) {
+        return it->second;
+    }
+    const auto &stored = intern_store.emplace_back(str);
+    intern_map.insert({std::string_view{stored}, stored.c_str()});
+    return stored.c_str();
+}
+
+// call site
+namespace {
+// chunks are never moved or freed, so readers index them without a lock once the size is published
+struct call_site_table {
+    std::mutex mutex;
+    tsl::robin_map<std::string, int> site_map; // key: filename \0 funcname \0 lineno
+    std::array<std::unique_ptr<spdlog::source_loc[]>, CALL_SITE_CHUNK_COUNT> chunk;
+    std::atomic<size_t> size{0};
+};
+
+call_site_table &ref_call_site_table() {
+    static call_site_table table;
+    return table;
+}
+} // namespace
+
+int reg_call_site(const std::string_view filename, const std::string_view funcname, const int lineno) {
+    auto &table = ref_call_site_table();
+    std::string key{filename};
+    key.push_back('\0');
+    key.append(funcname);
+    key.push_back('\0');
+    key.append(std::to_string(lineno));
+
+    std::scoped_lock lock(table.mutex);
+    if (const auto it = table.site_map.find(key); it != table.site_map.end()) {
+        return it->second;
+    }
+    const size_t site_id = table.size.load(std::memory_order_relaxed);
+    if (site_id >= CALL_SITE_CHUNK_SIZE * CALL_SITE_CHUNK_COUNT) {
+        return -1; // full, the caller sends strings
+    }
+    auto &chunk = table.chunk[site_id / CALL_SITE_CHUNK_SIZE];
+    if (chunk == nullptr) {
+        chunk = std::make_unique<spdlog::source_loc[]>(CALL_SITE_CHUNK_SIZE);
+    }
+    chunk[site_id % CALL_SITE_CHUNK_SIZE] =
+        spdlog::source_loc{intern_string(filename), lineno, intern_string(funcname)};
+    table.site_map.insert({std::move(key), static_cast<int>(site_id)});
+    table.size.store(site_id + 1, std::memory_order_release);
+    return static_cast<int>(site_id);
+}
+
+spdlog::source_loc get_call_site(const int site_id) {
+    auto &table = ref_call_site_table();
+    if (site_id < 0 || static_cast<size_t>(site_id) >= table.size.load(std::memory_order_acquire)) {
+        return spdlog::source_loc{};
+    }
+    return table.chunk[site_id / CALL_SITE_CHUNK_SIZE][site_id % CALL_SITE_CHUNK_SIZE];
+}
+
 namespace formatter {
 
+condition_pattern_formatter::condition_pattern_formatter(std::unique_ptr<spdlog::formatter> f)
+    : formatter_default(std::move(f)) {
+    std::scoped_lock lock(this->table_mutex_);
+    this->publish_({});
+}
+
+size_t condition_pattern_formatter::enter_() {
+    while (true) {
+        const uint64_t generation = this->generation_.load(std::memory_order_seq_cst);
+        const size_t parity = generation & 1;
+        this->num_reader_[parity].fetch_add(1, std::memory_order_seq_cst);
+        // counted before the writer flipped the generation: the writer waits for this reader
+        if (this->generation_.load(std::memory_order_seq_cst) == generation) {
+            return parity;
+        }
+        this->leave_(parity);
+    }
+}
+
+void condition_pattern_formatter::publish_(formatter_table &&table) {
+    auto next = std::make_unique<const formatter_table>(std::move(table));
+    this->table_.store(next.get(), std::memory_order_seq_cst);
+    // readers entering from now on load the new table, wait for those which entered before
+    const uint64_t generation = this->generation_.fetch_add(1, std::memory_order_seq_cst);
+    while (this->num_reader_[generation & 1].load(std::memory_order_seq_cst) != 0) {
+        std::this_thread::yield();
+    }
+    this->table_owned_ = std::move(next);
+}
+
 std::unique_ptr<spdlog::formatter> condition_pattern_formatter::clone() const { return this->exact_clone(); }
 
 void condition_pattern_formatter::format(const spdlog::details::log_msg &msg, spdlog::memory_buf_t &dest) {
-    const auto _src_name = msg.logger_name;
-    const std::string_view src_name = {_src_name.data(), _src_name.size()};
-    if (formatter_map_.contains(src_name)) {
-        const auto ptr_formatter = formatter_map_.at(src_name).get();
-        ptr_formatter->format(msg, dest);
+    // packed message: render it here, on the worker thread
+    if (lazy::check_packed(msg.payload)) {
+        spdlog::memory_buf_t rendered;
+        lazy::render(msg.payload, rendered);
+        spdlog::details::log_msg rendered_msg{msg};
+        rendered_msg.payload = spdlog::string_view_t{rendered.data(), rendered.size()};
+        this->format(rendered_msg, dest);
+        // color range is read back from the original msg by color sinks
+        msg.color_range_start = rendered_msg.color_range_start;
+        msg.color_range_end = rendered_msg.color_range_end;
+        return;
+    }
+
+    struct reader_scope {
+        condition_pattern_formatter &self;
+        const size_t parity;
+        ~reader_scope() { self.leave_(parity); }
+    } scope{*this, this->enter_()};
+    const formatter_table &table = *this->table_.load(std::memory_order_seq_cst);
+    size_t logger_id = sink_logger_id;
+    if (logger_id == NO_LOGGER_ID && !table.empty()) {
+        // not written by an async worker, look the name up
+        logger_id = find_logger_id({msg.logger_name.data(), msg.logger_name.size()});
+    }
+    spdlog::formatter *f = nullptr;
+    if (logger_id / CHUNK_SIZE < std::size(table)) {
+        if (const auto &chunk = table[logger_id / CHUNK_SIZE]; chunk != nullptr) {
+            f = (*chunk)[logger_id % CHUNK_SIZE].get();
+        }
+    }
+    if (f != nullptr) {
+        f->format(msg, dest);
     } else {
         // use default
         formatter_default->format(msg, dest);
@@ -328,19 +829,42 @@ void condition_pattern_formatter::format(const spdlog::details::log_msg &msg, sp
 }
 
 void condition_pattern_formatter::add_condition(const std::string_view name, std::unique_ptr<spdlog::formatter> f) {
-    if (formatter_map_.contains(name)) {
-        formatter_map_.erase(name);
+    const size_t logger_id = ref_logger_id(name);
+    const size_t chunk_id = logger_id / CHUNK_SIZE;
+    std::scoped_lock lock(this->table_mutex_);
+    formatter_table table = *this->table_.load(std::memory_order_relaxed);
+    if (std::size(table) <= chunk_id) {
+        table.resize(chunk_id + 1);
     }
-    formatter_map_.insert({std::string{name}, std::move(f)});
+    auto chunk = (table[chunk_id] != nullptr) ? std::make_shared<formatter_chunk>(*table[chunk_id])
+                                              : std::make_shared<formatter_chunk>();
+    (*chunk)[logger_id % CHUNK_SIZE] = std::move(f);
+    table[chunk_id] = std::move(chunk);
+    this->publish_(std::move(table));
 }
 
 std::unique_ptr<condition_pattern_formatter> condition_pattern_formatter::exact_clone() const {
-    auto new_default = formatter_default->clone();
-    condition_pattern_formatter::formatter_map new_formatter_map;
-    for (auto &it : formatter_map_) {
-        new_formatter_map.insert({it.first, std::move(it.second->clone())});
+    auto res = std::make_unique<condition_pattern_formatter>(formatter_default->clone());
+    formatter_table table;
+    {
+        std::scoped_lock lock(this->table_mutex_);
+        for (const auto &chunk : *this->table_.load(std::memory_order_relaxed)) {
+            if (chunk == nullptr) {
+                table.push_back(nullptr);
+                continue;
+            }
+            auto chunk_clone = std::make_shared<formatter_chunk>();
+            for (size_t i = 0; i < CHUNK_SIZE; ++i) {
+                if (const auto &f = (*chunk)[i]; f != nullptr) {
+                    (*chunk_clone)[i] = f->clone();
+                }
+            }
+            table.push_back(std::move(chunk_clone));
+        }
     }
-    return std::make_unique<condition_pattern_formatter>(std::move(new_default), std::move(new_formatter_map));
+    std::scoped_lock lock(res->table_mutex_);
+    res->publish_(std::move(table));
+    return res;
 }
 
 std::unique_ptr<spdlog::formatter> group_color_formatter::clone() const { return this->exact_clone(); }
@@ -1,12 +1,17 @@
 #ifndef LIBTCOMPLEX_LOG_H
 #define LIBTCOMPLEX_LOG_H
 
+#include <array>
+#include <atomic>
+#include <cstdint>
 #include <functional>
 #include <memory>
+#include <mutex>
 #include <optional>
 #include <stdexcept>
 #include <string>
 #include <string_view>
+#include <vector>
 
 #include <spdlog/formatter.h>
 #include <spdlog/pattern_formatter.h>
@@ -17,21 +22,33 @@
 #include <libtcomplex/log_def.h>
 
 namespace libtcomplex::log {
-enum struct log_type_t;                          // forward declare
-void reset_logging(const log_param_t log_param); // forward declare
-void flush_logging();                            // forward declare
+enum struct log_type_t;                                          // forward declare
+void reset_logging(const log_param_t log_param);                 // forward declare
+flush_stat_t flush_logging(const std::optional<double> timeout); // forward declare
 
 constexpr size_t ASYNC_QUEUE_SIZE = 8192;
-constexpr size_t ASYNC_THREAD_COUNT = 2;
+// records reach the sinks in queue order with a single worker only; sinks serialize on their mutex anyway
+constexpr size_t ASYNC_THREAD_COUNT = 1;
 constexpr std::string_view ROOT_LOGGER_NAME = "root";
-constexpr size_t FLUSH_WAIT_SLICE = 5;
+
+// dense id per logger name, assigned on first use & never reused; indexes the formatter condition tables
+constexpr size_t NO_LOGGER_ID = static_cast<size_t>(-1);
+size_t ref_logger_id(const std::string_view name);
+size_t find_logger_id(const std::string_view name); // NO_LOGGER_ID if unknown
+// logger id of the record being written by this thread, set by the async workers around the sinks
+inline thread_local size_t sink_logger_id = NO_LOGGER_ID;
 
 namespace formatter {
 class condition_pattern_formatter;
 }
 
+struct sink_meter_t;   // in log_async.h
+struct rotate_param_t; // in log_sink.h
+struct ring_param_t;   // in log_sink.h
+
 constexpr std::string_view console_sink_key = "console";
 constexpr std::string_view file_sink_key = "file";
+constexpr std::string_view ring_sink_key = "ring";
 
 class sink_registry final {
 public:
@@ -41,6 +58,10 @@ public:
         tsl::robin_map<std::string, std::unique_ptr<formatter::condition_pattern_formatter>,
                        std::hash<std::string_view>, std::equal_to<>>;
     using sink_map = tsl::robin_map<std::string, spdlog::sink_ptr, std::hash<std::string_view>, std::equal_to<>>;
+    using sink_live_formatter_map = tsl::robin_map<std::string, formatter::condition_pattern_formatter *,
+                                                   std::hash<std::string_view>, std::equal_to<>>;
+    using sink_meter_map =
+        tsl::robin_map<std::string, std::shared_ptr<sink_meter_t>, std::hash<std::string_view>, std::equal_to<>>;
 
 public:
     explicit sink_registry();
@@ -64,6 +85,11 @@ public:
     formatter::condition_pattern_formatter *get_formatter(const std::string_view sink_key) {
         return this->sink_formatter_map_.at(sink_key).get();
     }
+    // formatter owned by the created sink, nullptr if the sink is not created
+    formatter::condition_pattern_formatter *get_live_formatter(const std::string_view sink_key) {
+        const auto it = this->sink_live_formatter_map_.find(sink_key);
+        return (it != this->sink_live_formatter_map_.end()) ? it->second : nullptr;
+    }
 
     // buf sink
     inline bool check_sink_buf(const std::string_view sink_key) const { return this->sink_buf_map_.contains(sink_key); }
@@ -81,8 +107,12 @@ public:
     }
     inline const sink_map &sink_items() const { return sink_map_; }
 
+    // latency meter of a sink key, kept when the sink is re-created
+    std::shared_ptr<sink_meter_t> ref_sink_meter(const std::string_view sink_key);
+
     // default logging
-    void reg_default(const std::string_view log_filename);
+    void reg_default(const std::string_view log_filename, const file_sink_type_t file_sink_type,
+                     const rotate_param_t &rotate_param, const ring_param_t &ring_param);
     void upkeep_default(const log_type_t log_type);
 
 private:
@@ -91,7 +121,9 @@ private:
     sink_init_fn_map sink_reg_map_;                   // store logic used in reset_logging
     sink_condition_formatter_map sink_formatter_map_; // store active sink formatters
     sink_map sink_buf_map_;                           // store all sinks once been created
+    sink_live_formatter_map sink_live_formatter_map_; // store formatters owned by the created sinks
     sink_map sink_map_;                               // store active sinks
+    sink_meter_map sink_meter_map_;                   // store sink latency meters
 };
 
 using sink_formatter_map =
@@ -105,16 +137,45 @@ inline sink_registry &ref_sink_registry() {
 std::shared_ptr<spdlog::logger> get_logger(const std::string_view name);
 std::shared_ptr<spdlog::logger> get_logger(const std::string_view name, sink_formatter_map fmap);
 
+// level registry: explicit levels by dotted logger name, a logger without one follows the closest dotted parent up to
+// ROOT_LOGGER_NAME (trace if unset); registered loggers are updated on every change
+using level_listener_t = std::function<void(const std::string &name, std::optional<spdlog::level::level_enum> level)>;
+// nullopt clears the explicit level; notify: call the level listener, left out for changes coming from the listener
+// side
+void set_logger_level(const std::string_view name, const std::optional<spdlog::level::level_enum> level,
+                      const bool notify = true);
+spdlog::level::level_enum get_logger_level(const std::string_view name);          // effective
+std::vector<std::pair<std::string, spdlog::level::level_enum>> get_level_table(); // explicit levels
+// called after a notified change, outside of the registry lock
+void set_level_listener(level_listener_t listener);
+// levels set natively from the environment on the first reset_logging, notified: "info,net=debug,net.io=off" as
+// spdlog's SPDLOG_LEVEL, a bare level is the root level
+constexpr std::string_view LOG_LEVEL_ENV = "TCOMPLEX_LOG_LEVEL";
+void load_env_levels();
+
+// stable c string for the lifetime of the process, e.g. for spdlog::source_loc of non-literal strings
+const char *intern_string(const std::string_view str);
+
+// call sites of python records: registered once, then referred to by id
+constexpr size_t CALL_SITE_CHUNK_SIZE = 4096;
+constexpr size_t CALL_SITE_CHUNK_COUNT = 1024;
+int reg_call_site(const std::string_view filename, const std::string_view funcname, const int lineno);
+// lock free, an empty source_loc for an unknown id
+spdlog::source_loc get_call_site(const int site_id);
+
 // formater condtions on registered logger name
 namespace formatter {
+// conditions are a table indexed by logger id, so dispatch is two loads; adding a condition publishes a new table
+// sharing the other entries (copy on write), readers never lock. the table is in chunks of logger ids, an addition
+// copies the chunk list & one chunk. a replaced table is freed once the readers that may hold it are done
+// the formatter is used under its sink's lock
 class condition_pattern_formatter final : public spdlog::formatter {
-    using formatter_map =
-        tsl::robin_map<std::string, std::unique_ptr<spdlog::formatter>, std::hash<std::string_view>, std::equal_to<>>;
+    static constexpr size_t CHUNK_SIZE = 64;
+    using formatter_chunk = std::array<std::shared_ptr<spdlog::formatter>, CHUNK_SIZE>; // nullptr: default
+    using formatter_table = std::vector<std::shared_ptr<const formatter_chunk>>;        // nullptr: all default
 
 public:
-    explicit condition_pattern_formatter(std::unique_ptr<spdlog::formatter> f) : formatter_default(std::move(f)) {}
-    explicit condition_pattern_formatter(std::unique_ptr<spdlog::formatter> f, formatter_map &&store)
-        : formatter_default(std::move(f)), formatter_map_(std::move(store)){};
+    explicit condition_pattern_formatter(std::unique_ptr<spdlog::formatter> f);
 
     condition_pattern_formatter(const condition_pattern_formatter &other) = delete;
     condition_pattern_formatter &operator=(const condition_pattern_formatter &other) = delete;
@@ -126,8 +187,18 @@ public:
     std::unique_ptr<condition_pattern_formatter> exact_clone() const;
 
 private:
-    formatter_map formatter_map_;
+    // readers count themselves under the generation they entered in, by its parity
+    size_t enter_();
+    void leave_(const size_t parity) { this->num_reader_[parity].fetch_sub(1, std::memory_order_seq_cst); }
+    // caller holds table_mutex_; waits for the readers of the previous generation, then frees the previous table
+    void publish_(formatter_table &&table);
+
     std::unique_ptr<spdlog::formatter> formatter_default;
+    std::atomic<const formatter_table *> table_{nullptr};
+    mutable std::mutex table_mutex_; // writers
+    std::unique_ptr<const formatter_table> table_owned_;
+    std::atomic<uint64_t> generation_{0};
+    std::array<std::atomic<uint64_t>, 2> num_reader_{};
 };
 
 class group_color_formatter final : public spdlog::formatter {
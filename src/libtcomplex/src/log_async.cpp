@@ -0,0 +1,433 @@
+#include "log_async.h"
+#include "log.h"
+
+#include <algorithm>
+#include <atomic>
+#include <bit>
+#include <utility>
+
+#include <spdlog/sinks/sink.h>
+
+namespace libtcomplex::log {
+
+// counters are process wide: they survive thread pool swaps
+static std::atomic<size_t> async_num_enqueued{0};
+static std::atomic<size_t> async_num_dropped{0};
+static std::atomic<size_t> async_num_overrun{0};
+
+static std::atomic<std::shared_ptr<async_pool>> async_pool_curr;
+
+static thread_local bool enqueue_nowait = false;
+static thread_local bool enqueue_refused = false;
+
+nowait_scope::nowait_scope() : nowait_prev_(enqueue_nowait), refused_prev_(enqueue_refused) {
+    enqueue_nowait = true;
+    enqueue_refused = false;
+}
+
+nowait_scope::~nowait_scope() {
+    enqueue_nowait = nowait_prev_;
+    enqueue_refused = refused_prev_;
+}
+
+bool nowait_scope::refused() const { return enqueue_refused; }
+
+std::shared_ptr<async_pool> ref_async_pool() { return async_pool_curr.load(std::memory_order_acquire); }
+
+void set_async_pool(std::shared_ptr<async_pool> pool) {
+    // the old pool is drained & joined when its last user releases it
+    async_pool_curr.store(std::move(pool), std::memory_order_release);
+}
+
+async_stat_t get_async_stat() {
+    async_stat_t res{0, 0, 0, 0, 0, async_overflow_t::block, 0, 0, 0, 0, 0};
+    auto pool = ref_async_pool();
+    if (pool != nullptr) {
+        pool->fill_stat(res);
+    }
+    res.num_enqueued = async_num_enqueued.load(std::memory_order_relaxed);
+    res.num_dropped = async_num_dropped.load(std::memory_order_relaxed);
+    res.num_overrun = async_num_overrun.load(std::memory_order_relaxed);
+    return res;
+}
+
+// region ====== metrics >>>
+void latency_hist_t::record(const uint64_t ns) {
+    const size_t id = std::min<size_t>(std::bit_width(ns), LATENCY_BUCKET_COUNT - 1);
+    bucket[id].fetch_add(1, std::memory_order_relaxed);
+    count.fetch_add(1, std::memory_order_relaxed);
+    sum_ns.fetch_add(ns, std::memory_order_relaxed);
+    uint64_t curr_max = max_ns.load(std::memory_order_relaxed);
+    while (ns > curr_max && !max_ns.compare_exchange_weak(curr_max, ns, std::memory_order_relaxed)) {
+    }
+}
+
+latency_stat_t latency_hist_t::snapshot() const {
+    latency_stat_t res{count.load(std::memory_order_relaxed), sum_ns.load(std::memory_order_relaxed),
+                       max_ns.load(std::memory_order_relaxed), std::vector<uint64_t>(LATENCY_BUCKET_COUNT)};
+    for (size_t i = 0; i < LATENCY_BUCKET_COUNT; i++) {
+        res.bucket[i] = bucket[i].load(std::memory_order_relaxed);
+    }
+    return res;
+}
+
+static uint64_t elapsed_ns(const std::chrono::steady_clock::time_point t_begin) {
+    const auto dt = std::chrono::steady_clock::now() - t_begin;
+    return static_cast<uint64_t>(std::chrono::duration_cast<std::chrono::nanoseconds>(dt).count());
+}
+// endregion === metrics <<<
+
+// region ====== async logger >>>
+async_logger::async_logger(std::string name)
+    : spdlog::logger(std::move(name)), logger_id_(ref_logger_id(this->name_)) {}
+
+std::shared_ptr<spdlog::logger> async_logger::clone(std::string new_name) {
+    auto cloned = std::make_shared<async_logger>(*this);
+    cloned->name_ = std::move(new_name);
+    cloned->logger_id_ = ref_logger_id(cloned->name_);
+    return cloned;
+}
+
+std::vector<uint64_t> async_logger::level_count() const {
+    std::vector<uint64_t> res(level_count_.size());
+    for (size_t i = 0; i < level_count_.size(); i++) {
+        res[i] = level_count_[i].load(std::memory_order_relaxed);
+    }
+    return res;
+}
+
+bool async_logger::post_(async_pool &pool, const spdlog::details::log_msg &msg) {
+    if (!pool.post_log(shared_from_this(), msg)) {
+        return false; // refused, the caller keeps the record
+    }
+    if (msg.level < spdlog::level::off) {
+        level_count_[msg.level].fetch_add(1, std::memory_order_relaxed);
+    }
+    return true;
+}
+
+void async_logger::post_notes_(async_pool &pool) {
+    for (const auto &note : this->notes_) {
+        const spdlog::details::log_msg note_msg{note.source, this->name_, note.level,
+                                                spdlog::string_view_t{note.text.data(), note.text.size()}};
+        this->post_(pool, note_msg);
+    }
+    this->notes_.clear();
+}
+
+void async_logger::sink_it_(const spdlog::details::log_msg &msg) {
+    auto pool = ref_async_pool();
+    if (pool == nullptr) {
+        spdlog::throw_spdlog_ex("async log: thread pool doesn't exist");
+    }
+    const limit_param_t *limit = get_limit(this->logger_id_);
+    if (limit == nullptr) {
+        this->post_(*pool, msg);
+        return;
+    }
+
+    // held until msg is queued: notes come before the next record of their call site
+    std::scoped_lock lock(this->limiter_.mutex);
+    if (this->limiter_.check(*limit, msg, this->notes_) != record_limiter::verdict_t::pass) {
+        return;
+    }
+    this->post_notes_(*pool);
+    if (!this->post_(*pool, msg)) {
+        this->limiter_.forget(msg); // a retry of the caller is not a repeat
+    }
+}
+
+void async_logger::flush_() {
+    auto pool = ref_async_pool();
+    if (pool == nullptr) {
+        spdlog::throw_spdlog_ex("async flush: thread pool doesn't exist");
+    }
+    {
+        std::scoped_lock lock(this->limiter_.mutex);
+        this->limiter_.take_notes(this->notes_);
+        this->post_notes_(*pool);
+    }
+    pool->post_flush(shared_from_this());
+}
+
+// worker side, err_handler_ of spdlog::logger is private: report like the rest of the log device
+void async_logger::backend_sink_it_(const spdlog::details::log_msg &msg, const sink_set_t &sink_set) {
+    sink_logger_id = this->logger_id_; // for the condition formatters of the sinks
+    for (auto &[sink, meter] : sink_set) {
+        if (sink->should_log(msg.level)) {
+            try {
+                const auto t_begin = std::chrono::steady_clock::now();
+                sink->log(msg);
+                meter->write.record(elapsed_ns(t_begin));
+            } catch (const std::exception &ex) {
+                fprintf(stderr, "error! %s\n", ex.what());
+            }
+        }
+    }
+
+    if (should_flush_(msg)) {
+        backend_flush_(sink_set);
+    }
+}
+
+void async_logger::backend_flush_(const sink_set_t &sink_set) {
+    for (auto &[sink, meter] : sink_set) {
+        try {
+            const auto t_begin = std::chrono::steady_clock::now();
+            sink->flush();
+            meter->flush.record(elapsed_ns(t_begin));
+        } catch (const std::exception &ex) {
+            fprintf(stderr, "error! %s\n", ex.what());
+        }
+    }
+}
+// endregion === async logger <<<
+
+// region ====== drain barrier >>>
+namespace detail {
+// each worker picks up one barrier message and waits here until all workers have arrived,
+// so every message enqueued before the barrier messages has been processed once the barrier opens
+class drain_barrier {
+public:
+    explicit drain_barrier(const size_t n_worker) : n_worker_(n_worker) {}
+
+    void arrive() {
+        std::unique_lock lock(mutex_);
+        n_arrived_ += 1;
+        if (n_arrived_ == n_worker_) {
+            cv_.notify_all();
+        } else {
+            cv_.wait(lock, [this]() { return n_arrived_ >= n_worker_; });
+        }
+    }
+
+    bool wait(const std::optional<std::chrono::steady_clock::time_point> deadline) {
+        std::unique_lock lock(mutex_);
+        const auto opened = [this]() { return n_arrived_ >= n_worker_; };
+        if (!deadline.has_value()) {
+            cv_.wait(lock, opened);
+            return true;
+        }
+        return cv_.wait_until(lock, deadline.value(), opened);
+    }
+
+private:
+    const size_t n_worker_;
+    size_t n_arrived_{0};
+    std::mutex mutex_;
+    std::condition_variable cv_;
+};
+} // namespace detail
+// endregion === drain barrier <<<
+
+// region ====== async pool >>>
+static async_param_t normalize_param(async_param_t param) {
+    // one barrier / terminate message per worker has to fit in the queue
+    param.thread_count = std::max(param.thread_count, size_t{1});
+    param.queue_size = std::max(param.queue_size, param.thread_count);
+    return param;
+}
+
+async_pool::async_pool(const async_param_t &param, std::shared_ptr<const sink_set_t> sink_set)
+    : param_(normalize_param(param)), q_(param_.queue_size),
+      sink_set_(sink_set != nullptr ? std::move(sink_set) : std::make_shared<const sink_set_t>()) {
+    for (size_t i = 0; i < param_.thread_count; i++) {
+        threads_.emplace_back([this]() { this->worker_loop_(); });
+    }
+}
+
+async_pool::~async_pool() {
+    try {
+        std::vector<detail::async_msg_t> item_vec;
+        for (size_t i = 0; i < threads_.size(); i++) {
+            item_vec.emplace_back(nullptr, detail::async_msg_type_t::terminate);
+        }
+        this->enqueue_control_(std::move(item_vec));
+        for (auto &t : threads_) {
+            t.join();
+        }
+    } catch (const std::exception &ex) {
+        fprintf(stderr, "error! %s\n", ex.what());
+    }
+}
+
+bool async_pool::post_log(std::shared_ptr<async_logger> &&worker_ptr, const spdlog::details::log_msg &msg) {
+    return this->enqueue_log_(detail::async_msg_t{std::move(worker_ptr), msg});
+}
+
+void async_pool::post_flush(std::shared_ptr<async_logger> &&worker_ptr) {
+    std::vector<detail::async_msg_t> item_vec;
+    item_vec.emplace_back(std::move(worker_ptr), detail::async_msg_type_t::flush);
+    this->enqueue_control_(std::move(item_vec));
+}
+
+void async_pool::post_sink_set(std::shared_ptr<const sink_set_t> sink_set) {
+    std::vector<detail::async_msg_t> item_vec;
+    item_vec.emplace_back(sink_set != nullptr ? std::move(sink_set) : std::make_shared<const sink_set_t>());
+    this->enqueue_control_(std::move(item_vec));
+}
+
+bool async_pool::drain(const std::optional<std::chrono::steady_clock::time_point> deadline, size_t &num_drained) {
+    auto barrier = std::make_shared<detail::drain_barrier>(threads_.size());
+    std::vector<detail::async_msg_t> item_vec;
+    for (size_t i = 0; i < threads_.size(); i++) {
+        item_vec.emplace_back(barrier);
+    }
+    {
+        std::scoped_lock lock(mutex_);
+        num_drained = q_.size();
+    }
+    this->enqueue_control_(std::move(item_vec));
+    return barrier->wait(deadline);
+}
+
+async_param_t async_pool::param() {
+    std::scoped_lock lock(mutex_);
+    return param_;
+}
+
+void async_pool::set_overflow(const async_overflow_t overflow, const size_t queue_max_bytes) {
+    {
+        std::scoped_lock lock(mutex_);
+        param_.overflow = overflow;
+        param_.queue_max_bytes = queue_max_bytes;
+    }
+    // blocked callers re-check the room
+    cv_pop_.notify_all();
+}
+
+void async_pool::fill_stat(async_stat_t &stat) {
+    std::scoped_lock lock(mutex_);
+    stat.queue_size = q_.size();
+    stat.queue_capacity = param_.queue_size;
+    stat.queue_bytes = q_bytes_;
+    stat.queue_max_bytes = param_.queue_max_bytes;
+    stat.thread_count = threads_.size();
+    stat.overflow = param_.overflow;
+    stat.queue_high_water = q_high_water_;
+    stat.queue_bytes_high_water = q_bytes_high_water_;
+}
+
+void async_pool::update_high_water_() {
+    q_high_water_ = std::max(q_high_water_, q_.size());
+    q_bytes_high_water_ = std::max(q_bytes_high_water_, q_bytes_);
+}
+
+bool async_pool::check_room_(const size_t msg_bytes) const {
+    if (q_.full()) {
+        return false;
+    }
+    // an empty queue always takes one message, whatever its size
+    return param_.queue_max_bytes == 0 || q_.empty() || q_bytes_ + msg_bytes <= param_.queue_max_bytes;
+}
+
+bool async_pool::enqueue_log_(detail::async_msg_t &&item) {
+    {
+        std::unique_lock lock(mutex_);
+        if (param_.overflow == async_overflow_t::block && enqueue_nowait) {
+            if (!check_room_(item.msg_bytes)) {
+                enqueue_refused = true;
+                return false;
+            }
+        } else if (param_.overflow == async_overflow_t::block) {
+            // policy may be switched while waiting
+            cv_pop_.wait(lock, [&]() {
+                return param_.overflow != async_overflow_t::block || check_room_(item.msg_bytes); //
+            });
+        }
+        if (!check_room_(item.msg_bytes)) {
+            if (param_.overflow == async_overflow_t::overrun_oldest) {
+                while (!check_room_(item.msg_bytes)) {
+                    if (q_.front().msg_type != detail::async_msg_type_t::log) {
+                        // never evict control messages: wait for the workers to take them
+                        cv_pop_.wait(lock);
+                        continue;
+                    }
+                    detail::async_msg_t evicted{std::move(q_.front())};
+                    q_.pop_front();
+                    q_bytes_ -= evicted.msg_bytes;
+                    async_num_overrun.fetch_add(1, std::memory_order_relaxed);
+                }
+            } else {
+                async_num_dropped.fetch_add(1, std::memory_order_relaxed);
+                return true;
+            }
+        }
+        q_bytes_ += item.msg_bytes;
+        q_.push_back(std::move(item));
+        this->update_high_water_();
+    }
+    async_num_enqueued.fetch_add(1, std::memory_order_relaxed);
+    cv_push_.notify_one();
+    return true;
+}
+
+void async_pool::enqueue_control_(std::vector<detail::async_msg_t> &&item_vec) {
+    // control messages are never dropped and ignore the byte cap, a batch is kept contiguous
+    {
+        std::unique_lock lock(mutex_);
+        const auto n_item = std::min(item_vec.size(), param_.queue_size);
+        cv_pop_.wait(lock, [&]() { return q_.size() + n_item <= param_.queue_size; });
+        for (auto &item : item_vec) {
+            q_.push_back(std::move(item));
+        }
+        this->update_high_water_();
+    }
+    cv_push_.notify_all();
+}
+
+void async_pool::worker_loop_() {
+    // local copy of the active sink set, refreshed when the generation moves
+    std::shared_ptr<const sink_set_t> sink_set;
+    size_t sink_set_gen = SIZE_MAX;
+
+    while (true) {
+        detail::async_msg_t item;
+        std::shared_ptr<const sink_set_t> sink_set_prev;
+        {
+            std::unique_lock lock(mutex_);
+            cv_push_.wait(lock, [this]() { return !q_.empty(); });
+            item = std::move(q_.front());
+            q_.pop_front();
+            q_bytes_ -= item.msg_bytes;
+            if (item.msg_type == detail::async_msg_type_t::sink_set) {
+                sink_set_prev = std::exchange(sink_set_, item.sink_set_ptr);
+                sink_set_gen_ += 1;
+            }
+            if (sink_set_gen != sink_set_gen_) {
+                sink_set = sink_set_;
+                sink_set_gen = sink_set_gen_;
+            }
+        }
+        cv_pop_.notify_all();
+
+        switch (item.msg_type) {
+        case detail::async_msg_type_t::log:
+            item.worker_ptr->backend_sink_it_(item, *sink_set);
+            break;
+        case detail::async_msg_type_t::flush:
+            item.worker_ptr->backend_flush_(*sink_set);
+            break;
+        case detail::async_msg_type_t::sink_set:
+            // flush the sinks left out, they are closed once the last worker drops the previous set
+            for (auto &entry : *sink_set_prev) {
+                if (std::find(sink_set->cbegin(), sink_set->cend(), entry) == sink_set->cend()) {
+                    try {
+                        entry.sink->flush();
+                    } catch (const std::exception &ex) {
+                        fprintf(stderr, "error! %s\n", ex.what());
+                    }
+                }
+            }
+            break;
+        case detail::async_msg_type_t::barrier:
+            item.barrier_ptr->arrive();
+            break;
+        case detail::async_msg_type_t::terminate:
+            return;
+        }
+    }
+}
+// endregion === async pool <<<
+
+} // namespace libtcomplex::log
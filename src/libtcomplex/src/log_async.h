@@ -0,0 +1,192 @@
+#ifndef LIBTCOMPLEX_LOG_ASYNC_H
+#define LIBTCOMPLEX_LOG_ASYNC_H
+
+#include <array>
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <string>
+#include <thread>
+#include <vector>
+
+#include <spdlog/common.h>
+#include <spdlog/details/circular_q.h>
+#include <spdlog/details/log_msg_buffer.h>
+#include <spdlog/logger.h>
+
+#include <libtcomplex/log_def.h>
+
+#include "log_limit.h"
+
+// async logging device: spdlog::async_logger is final and its thread pool only knows block / overrun_oldest,
+// so loggers enqueue into our own pool, which owns the overflow policy, byte cap, drop counters & drain barrier
+namespace libtcomplex::log {
+
+class async_pool;
+
+// log2 latency histogram, updated by the pool workers
+struct latency_hist_t {
+    std::array<std::atomic<uint64_t>, LATENCY_BUCKET_COUNT> bucket{};
+    std::atomic<uint64_t> count{0};
+    std::atomic<uint64_t> sum_ns{0};
+    std::atomic<uint64_t> max_ns{0};
+
+    void record(const uint64_t ns);
+    latency_stat_t snapshot() const;
+};
+
+// per sink key, kept by the sink registry across sink re-creation
+struct sink_meter_t {
+    latency_hist_t write;
+    latency_hist_t flush;
+};
+
+struct sink_entry_t {
+    spdlog::sink_ptr sink;
+    std::shared_ptr<sink_meter_t> meter;
+
+    bool operator==(const sink_entry_t &other) const = default;
+};
+
+// sinks shared by all loggers, swapped as a whole by reset_logging
+using sink_set_t = std::vector<sink_entry_t>;
+
+// logger enqueuing into the current async_pool, the pool workers write to the active sink set (sinks_ is unused)
+class async_logger final : public spdlog::logger, public std::enable_shared_from_this<async_logger> {
+    friend class async_pool;
+
+public:
+    explicit async_logger(std::string name);
+    async_logger(const async_logger &other)
+        : spdlog::logger(other), logger_id_(other.logger_id_) {} // counters start over
+
+    std::shared_ptr<spdlog::logger> clone(std::string new_name) override;
+    std::vector<uint64_t> level_count() const;
+    size_t logger_id() const { return logger_id_; }
+    const record_limiter &limiter() const { return limiter_; }
+
+protected:
+    void sink_it_(const spdlog::details::log_msg &msg) override;
+    void flush_() override;
+    void backend_sink_it_(const spdlog::details::log_msg &msg, const sink_set_t &sink_set);
+    void backend_flush_(const sink_set_t &sink_set);
+
+private:
+    bool post_(async_pool &pool, const spdlog::details::log_msg &msg);
+    void post_notes_(async_pool &pool); // with limiter_ lock held
+
+    size_t logger_id_; // see ref_logger_id
+    record_limiter limiter_;
+    std::vector<limit_note_t> notes_; // scratch, under limiter_ lock
+    std::array<std::atomic<uint64_t>, spdlog::level::off> level_count_{};
+};
+
+namespace detail {
+class drain_barrier;
+
+enum struct async_msg_type_t {
+    log,
+    flush,
+    barrier,
+    sink_set,
+    terminate,
+};
+
+struct async_msg_t : spdlog::details::log_msg_buffer {
+    async_msg_type_t msg_type{async_msg_type_t::log};
+    std::shared_ptr<async_logger> worker_ptr;
+    std::shared_ptr<drain_barrier> barrier_ptr;
+    std::shared_ptr<const sink_set_t> sink_set_ptr;
+    size_t msg_bytes{0};
+
+    async_msg_t() = default;
+    async_msg_t(const async_msg_t &other) = delete;
+    async_msg_t(async_msg_t &&other) = default;
+    async_msg_t &operator=(async_msg_t &&other) = default;
+
+    async_msg_t(std::shared_ptr<async_logger> &&worker, const spdlog::details::log_msg &m)
+        : spdlog::details::log_msg_buffer{m}, worker_ptr{std::move(worker)}, msg_bytes{m.payload.size() +
+                                                                                       m.logger_name.size()} {}
+    async_msg_t(std::shared_ptr<async_logger> &&worker, const async_msg_type_t the_type)
+        : msg_type{the_type}, worker_ptr{std::move(worker)} {}
+    explicit async_msg_t(std::shared_ptr<drain_barrier> barrier)
+        : msg_type{async_msg_type_t::barrier}, barrier_ptr{std::move(barrier)} {}
+    explicit async_msg_t(std::shared_ptr<const sink_set_t> sink_set)
+        : msg_type{async_msg_type_t::sink_set}, sink_set_ptr{std::move(sink_set)} {}
+};
+} // namespace detail
+
+struct async_param_t {
+    size_t queue_size;
+    size_t thread_count;
+    async_overflow_t overflow;
+    size_t queue_max_bytes; // 0: no cap
+};
+
+class async_pool final {
+public:
+    async_pool(const async_param_t &param, std::shared_ptr<const sink_set_t> sink_set);
+    ~async_pool(); // process what is queued, then join
+
+    async_pool(const async_pool &other) = delete;
+    async_pool &operator=(const async_pool &other) = delete;
+
+    // false if refused, see nowait_scope
+    bool post_log(std::shared_ptr<async_logger> &&worker_ptr, const spdlog::details::log_msg &msg);
+    void post_flush(std::shared_ptr<async_logger> &&worker_ptr);
+    // messages queued before are written to the previous sink set, messages queued after to the new one
+    void post_sink_set(std::shared_ptr<const sink_set_t> sink_set);
+    // wait until every message queued before the call is processed, false on deadline
+    bool drain(const std::optional<std::chrono::steady_clock::time_point> deadline, size_t &num_drained);
+
+    async_param_t param();
+    void set_overflow(const async_overflow_t overflow, const size_t queue_max_bytes);
+    void fill_stat(async_stat_t &stat);
+
+private:
+    bool check_room_(const size_t msg_bytes) const; // with lock held
+    void update_high_water_();                      // with lock held
+    bool enqueue_log_(detail::async_msg_t &&item);
+    void enqueue_control_(std::vector<detail::async_msg_t> &&item_vec);
+    void worker_loop_();
+
+    async_param_t param_;
+    std::mutex mutex_;
+    std::condition_variable cv_push_; // queue not empty
+    std::condition_variable cv_pop_;  // queue got room
+    spdlog::details::circular_q<detail::async_msg_t> q_;
+    size_t q_bytes_{0};
+    size_t q_high_water_{0};
+    size_t q_bytes_high_water_{0};
+    std::shared_ptr<const sink_set_t> sink_set_; // applied by the workers, in queue order
+    size_t sink_set_gen_{0};
+    std::vector<std::thread> threads_;
+};
+
+// enqueue of the calling thread without waiting, while in scope: under the block policy a record finding no room is
+// refused instead, and not counted as dropped. e.g. for an event loop thread
+class nowait_scope {
+public:
+    nowait_scope();
+    ~nowait_scope();
+
+    nowait_scope(const nowait_scope &other) = delete;
+    nowait_scope &operator=(const nowait_scope &other) = delete;
+
+    bool refused() const; // a record was refused in scope
+
+private:
+    bool nowait_prev_;
+    bool refused_prev_;
+};
+
+// current pool, swapped by reset_logging when queue size or thread count changes
+std::shared_ptr<async_pool> ref_async_pool();
+void set_async_pool(std::shared_ptr<async_pool> pool);
+
+} // namespace libtcomplex::log
+
+#endif
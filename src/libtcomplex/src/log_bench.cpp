@@ -0,0 +1,65 @@
+#include "log.h"
+
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <stdexcept>
+#include <string>
+#include <thread>
+#include <vector>
+
+namespace libtcomplex::log {
+
+// native path of script/bench_log_suite.py: loggers of get_logger, called from native threads
+log_bench_stat_t bench_logging(const std::string &key, const size_t num_record, const size_t msg_size,
+                               const size_t thread_count) {
+    using clock = std::chrono::steady_clock;
+
+    auto logger = get_logger(key);
+    if (logger == nullptr) {
+        throw std::runtime_error("logging not initialized in main library!");
+    }
+    const std::string msg(msg_size, 'x');
+    const size_t n_thread = std::max<size_t>(thread_count, 1);
+    const size_t n_per_thread = num_record / n_thread;
+
+    std::vector<std::vector<uint64_t>> latency(n_thread);
+    std::atomic<size_t> n_ready{0};
+    std::atomic<bool> go{false};
+    std::vector<std::jthread> workers;
+    for (size_t thread_id = 0; thread_id < n_thread; thread_id++) {
+        workers.emplace_back([&, thread_id]() {
+            auto &latency_curr = latency[thread_id];
+            latency_curr.reserve(n_per_thread);
+            n_ready.fetch_add(1);
+            while (!go.load(std::memory_order_acquire)) {
+                std::this_thread::yield();
+            }
+            for (size_t i = 0; i < n_per_thread; i++) {
+                const auto t_call = clock::now();
+                logger->info("record {} of {}: {}", i, thread_id, msg);
+                latency_curr.push_back(
+                    std::chrono::duration_cast<std::chrono::nanoseconds>(clock::now() - t_call).count());
+            }
+        });
+    }
+    while (n_ready.load() < n_thread) {
+        std::this_thread::yield();
+    }
+
+    const auto t_begin = clock::now();
+    go.store(true, std::memory_order_release);
+    workers.clear(); // join
+    // until the sinks have written everything
+    flush_logging(std::nullopt);
+    const auto t_end = clock::now();
+
+    log_bench_stat_t res{n_per_thread * n_thread, std::chrono::duration<double>(t_end - t_begin).count(), {}};
+    res.latency_ns.reserve(res.num_record);
+    for (const auto &latency_curr : latency) {
+        res.latency_ns.insert(res.latency_ns.end(), latency_curr.cbegin(), latency_curr.cend());
+    }
+    return res;
+}
+
+} // namespace libtcomplex::log
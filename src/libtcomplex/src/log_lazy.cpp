@@ -0,0 +1,563 @@
+#include "log_lazy.h"
+
+#include <cmath>
+#include <cstring>
+#include <stdexcept>
+#include <utility>
+
+#include <spdlog/details/fmt_helper.h>
+
+#include <fmt/core.h>
+#include <fmt/format.h>
+
+namespace libtcomplex::log::lazy {
+
+using spdlog::memory_buf_t;
+using spdlog::details::fmt_helper::append_string_view;
+
+// region ====== pack >>>
+namespace {
+constexpr char ARG_TAG_INT = 'i';
+constexpr char ARG_TAG_FLOAT = 'f';
+constexpr char ARG_TAG_STR = 's';
+
+template <typename T> void put_raw(memory_buf_t &dest, const T value) {
+    const char *p = reinterpret_cast<const char *>(&value);
+    dest.append(p, p + sizeof(T));
+}
+
+void put_str(memory_buf_t &dest, const std::string_view str) {
+    put_raw<uint32_t>(dest, static_cast<uint32_t>(std::size(str)));
+    dest.append(str.data(), str.data() + std::size(str));
+}
+
+struct reader_t {
+    std::string_view buf;
+    size_t offset = 0;
+
+    template <typename T> T get_raw() {
+        if (offset + sizeof(T) > std::size(buf)) {
+            throw std::out_of_range("truncated lazy message");
+        }
+        T value;
+        std::memcpy(&value, buf.data() + offset, sizeof(T));
+        offset += sizeof(T);
+        return value;
+    }
+
+    std::string_view get_str() {
+        const auto len = get_raw<uint32_t>();
+        if (offset + len > std::size(buf)) {
+            throw std::out_of_range("truncated lazy message");
+        }
+        const std::string_view res = buf.substr(offset, len);
+        offset += len;
+        return res;
+    }
+};
+} // namespace
+
+void pack(memory_buf_t &dest, const std::string_view fmt, const std::vector<arg_t> &args) {
+    append_string_view(LAZY_MAGIC, dest);
+    put_str(dest, fmt);
+    put_raw<uint32_t>(dest, static_cast<uint32_t>(std::size(args)));
+    for (const auto &arg : args) {
+        if (const auto p = std::get_if<int64_t>(&arg)) {
+            put_raw<char>(dest, ARG_TAG_INT);
+            put_raw<int64_t>(dest, *p);
+        } else if (const auto p = std::get_if<double>(&arg)) {
+            put_raw<char>(dest, ARG_TAG_FLOAT);
+            put_raw<double>(dest, *p);
+        } else {
+            put_raw<char>(dest, ARG_TAG_STR);
+            put_str(dest, std::get<std::string>(arg));
+        }
+    }
+}
+// endregion === pack <<<
+
+// region ====== render >>>
+bool unpack(const spdlog::string_view_t payload, std::string_view &fmt, std::vector<arg_view_t> &args) {
+    reader_t reader{{payload.data(), payload.size()}, std::size(LAZY_MAGIC)};
+    try {
+        fmt = reader.get_str();
+        const auto nargs = reader.get_raw<uint32_t>();
+        args.reserve(nargs);
+        for (uint32_t i = 0; i < nargs; i++) {
+            switch (reader.get_raw<char>()) {
+            case ARG_TAG_INT:
+                args.emplace_back(reader.get_raw<int64_t>());
+                break;
+            case ARG_TAG_FLOAT:
+                args.emplace_back(reader.get_raw<double>());
+                break;
+            case ARG_TAG_STR:
+                args.emplace_back(reader.get_str());
+                break;
+            default:
+                throw std::out_of_range("unknown lazy message arg");
+            }
+        }
+    } catch (const std::out_of_range &ex) {
+        return false;
+    }
+    return true;
+}
+
+void render(const spdlog::string_view_t payload, memory_buf_t &dest) {
+    std::string_view fmt;
+    std::vector<arg_view_t> args;
+    if (!unpack(payload, fmt, args)) {
+        append_string_view("<corrupted lazy message>", dest);
+        return;
+    }
+
+    // message
+    const size_t msg_begin = std::size(dest);
+    try {
+        format_printf(fmt, args, dest);
+    } catch (const std::exception &ex) {
+        // keep the template, as python would have failed in getMessage()
+        dest.resize(msg_begin);
+        append_string_view(fmt, dest);
+        fmt::format_to(std::back_inserter(dest), " <format error: {}>", ex.what());
+    }
+}
+// endregion === render <<<
+
+// region ====== printf >>>
+namespace {
+struct conv_spec_t {
+    bool left = false;
+    bool zero = false;
+    bool plus = false;
+    bool space = false;
+    bool alt = false;
+    int width = -1;
+    int precision = -1;
+    char type = 0;
+};
+
+size_t count_codepoint(const std::string_view str) {
+    size_t res = 0;
+    for (const char ch : str) {
+        res += ((static_cast<unsigned char>(ch) & 0xC0) != 0x80);
+    }
+    return res;
+}
+
+std::string_view truncate_codepoint(const std::string_view str, const size_t n) {
+    size_t seen = 0;
+    for (size_t offset = 0; offset < std::size(str); offset++) {
+        if ((static_cast<unsigned char>(str[offset]) & 0xC0) != 0x80) {
+            if (seen == n) {
+                return str.substr(0, offset);
+            }
+            seen += 1;
+        }
+    }
+    return str;
+}
+
+void append_fill(memory_buf_t &dest, const char ch, size_t n) {
+    for (; n > 0; n--) {
+        dest.push_back(ch);
+    }
+}
+
+// pad body to width, zero padding goes between sign/prefix and digits
+void append_padded(memory_buf_t &dest, const conv_spec_t &spec, const std::string_view prefix,
+                   const std::string_view body, const bool allow_zero) {
+    const size_t len = count_codepoint(prefix) + count_codepoint(body);
+    const size_t fill = (spec.width > 0 && static_cast<size_t>(spec.width) > len) ? spec.width - len : 0;
+    if (spec.left) {
+        append_string_view(prefix, dest);
+        append_string_view(body, dest);
+        append_fill(dest, ' ', fill);
+    } else if (spec.zero && allow_zero) {
+        append_string_view(prefix, dest);
+        append_fill(dest, '0', fill);
+        append_string_view(body, dest);
+    } else {
+        append_fill(dest, ' ', fill);
+        append_string_view(prefix, dest);
+        append_string_view(body, dest);
+    }
+}
+
+std::string_view sign_of(const bool neg, const conv_spec_t &spec) {
+    if (neg) {
+        return "-";
+    }
+    if (spec.plus) {
+        return "+";
+    }
+    if (spec.space) {
+        return " ";
+    }
+    return "";
+}
+
+// python float.__repr__
+std::string repr_float(const double value) {
+    if (std::isnan(value)) {
+        return "nan";
+    }
+    if (std::isinf(value)) {
+        return value > 0 ? "inf" : "-inf";
+    }
+    auto res = fmt::format("{}", value);
+    if (res.find_first_of(".e") == std::string::npos) {
+        res += ".0";
+    }
+    return res;
+}
+
+// utf-8 sequence starting at value[offset], as code point & length; a stray byte decodes as itself
+std::pair<uint32_t, size_t> decode_codepoint(const std::string_view value, const size_t offset) {
+    const auto lead = static_cast<unsigned char>(value[offset]);
+    const size_t len = lead >= 0xF0 ? 4 : lead >= 0xE0 ? 3 : lead >= 0xC0 ? 2 : 1;
+    if (len == 1 || offset + len > std::size(value)) {
+        return {lead, 1};
+    }
+    uint32_t cp = lead & (0x7F >> len);
+    for (size_t i = 1; i < len; i++) {
+        cp = (cp << 6) | (static_cast<unsigned char>(value[offset + i]) & 0x3F);
+    }
+    return {cp, len};
+}
+
+// python str.__repr__, without the unicode escape rules; with ascii_only, ascii(): non-ascii code points escaped
+std::string repr_str(const std::string_view value, const bool ascii_only) {
+    const bool has_single = value.find('\'') != std::string_view::npos;
+    const bool has_double = value.find('"') != std::string_view::npos;
+    const char quote = (has_single && !has_double) ? '"' : '\'';
+    std::string res{quote};
+    for (size_t offset = 0; offset < std::size(value); offset++) {
+        const char ch = value[offset];
+        if (ascii_only && static_cast<unsigned char>(ch) >= 0x80) {
+            const auto [cp, len] = decode_codepoint(value, offset);
+            if (cp < 0x100) {
+                res += fmt::format("\\x{:02x}", cp);
+            } else if (cp < 0x10000) {
+                res += fmt::format("\\u{:04x}", cp);
+            } else {
+                res += fmt::format("\\U{:08x}", cp);
+            }
+            offset += len - 1;
+            continue;
+        }
+        switch (ch) {
+        case '\\':
+            res += "\\\\";
+            break;
+        case '\n':
+            res += "\\n";
+            break;
+        case '\r':
+            res += "\\r";
+            break;
+        case '\t':
+            res += "\\t";
+            break;
+        default:
+            if (ch == quote) {
+                res += '\\';
+                res += ch;
+            } else if (static_cast<unsigned char>(ch) < 0x20 || ch == 0x7F) {
+                res += fmt::format("\\x{:02x}", static_cast<unsigned char>(ch));
+            } else {
+                res += ch;
+            }
+            break;
+        }
+    }
+    res += quote;
+    return res;
+}
+
+// type: 's', 'r' or 'a'
+std::string to_str(const arg_view_t &arg, const char type) {
+    if (const auto p = std::get_if<int64_t>(&arg)) {
+        return fmt::format("{}", *p);
+    }
+    if (const auto p = std::get_if<double>(&arg)) {
+        return repr_float(*p);
+    }
+    const auto str = std::get<std::string_view>(arg);
+    return type == 's' ? std::string{str} : repr_str(str, type == 'a');
+}
+
+int64_t to_int(const arg_view_t &arg, const char type) {
+    if (const auto p = std::get_if<int64_t>(&arg)) {
+        return *p;
+    }
+    if (const auto p = std::get_if<double>(&arg)) {
+        if (!std::isfinite(*p)) {
+            throw std::invalid_argument("cannot convert float to integer");
+        }
+        // python formats a float beyond int64 itself, see ExtHandler._lazy_args; the cast would be undefined
+        if (!(*p >= -0x1p63 && *p < 0x1p63)) {
+            throw std::invalid_argument("float out of int64 range");
+        }
+        return static_cast<int64_t>(*p);
+    }
+    throw std::invalid_argument(fmt::format("%{} format: a real number is required, not str", type));
+}
+
+double to_float(const arg_view_t &arg, const char type) {
+    if (const auto p = std::get_if<int64_t>(&arg)) {
+        return static_cast<double>(*p);
+    }
+    if (const auto p = std::get_if<double>(&arg)) {
+        return *p;
+    }
+    throw std::invalid_argument(fmt::format("%{} format: a real number is required, not str", type));
+}
+
+void format_int(memory_buf_t &dest, const conv_spec_t &spec, const int64_t value) {
+    const bool neg = value < 0;
+    const uint64_t mag = neg ? (uint64_t{0} - static_cast<uint64_t>(value)) : static_cast<uint64_t>(value);
+
+    std::string digits;
+    std::string prefix{sign_of(neg, spec)};
+    switch (spec.type) {
+    case 'o':
+        digits = fmt::format("{:o}", mag);
+        if (spec.alt) {
+            prefix += "0o";
+        }
+        break;
+    case 'x':
+        digits = fmt::format("{:x}", mag);
+        if (spec.alt) {
+            prefix += "0x";
+        }
+        break;
+    case 'X':
+        digits = fmt::format("{:X}", mag);
+        if (spec.alt) {
+            prefix += "0X";
+        }
+        break;
+    default:
+        digits = fmt::format("{}", mag);
+        break;
+    }
+    if (spec.precision > 0 && static_cast<size_t>(spec.precision) > std::size(digits)) {
+        digits.insert(0, spec.precision - std::size(digits), '0');
+    }
+    append_padded(dest, spec, prefix, digits, true);
+}
+
+void format_float(memory_buf_t &dest, const conv_spec_t &spec, const double value) {
+    const int precision = spec.precision >= 0 ? spec.precision : 6;
+    std::string body;
+    switch (spec.type) {
+    case 'e':
+        body = spec.alt ? fmt::format("{:#.{}e}", std::fabs(value), precision)
+                        : fmt::format("{:.{}e}", std::fabs(value), precision);
+        break;
+    case 'E':
+        body = spec.alt ? fmt::format("{:#.{}E}", std::fabs(value), precision)
+                        : fmt::format("{:.{}E}", std::fabs(value), precision);
+        break;
+    case 'f':
+        body = spec.alt ? fmt::format("{:#.{}f}", std::fabs(value), precision)
+                        : fmt::format("{:.{}f}", std::fabs(value), precision);
+        break;
+    case 'F':
+        body = spec.alt ? fmt::format("{:#.{}F}", std::fabs(value), precision)
+                        : fmt::format("{:.{}F}", std::fabs(value), precision);
+        break;
+    case 'g':
+        body = spec.alt ? fmt::format("{:#.{}g}", std::fabs(value), std::max(precision, 1))
+                        : fmt::format("{:.{}g}", std::fabs(value), std::max(precision, 1));
+        break;
+    default: // 'G'
+        body = spec.alt ? fmt::format("{:#.{}G}", std::fabs(value), std::max(precision, 1))
+                        : fmt::format("{:.{}G}", std::fabs(value), std::max(precision, 1));
+        break;
+    }
+    const bool finite = std::isfinite(value);
+    append_padded(dest, spec, sign_of(std::signbit(value) && !std::isnan(value), spec), body, finite);
+}
+
+void format_str(memory_buf_t &dest, const conv_spec_t &spec, const std::string_view value) {
+    const std::string_view body =
+        (spec.precision >= 0) ? truncate_codepoint(value, static_cast<size_t>(spec.precision)) : value;
+    append_padded(dest, spec, "", body, false);
+}
+
+void format_char(memory_buf_t &dest, const conv_spec_t &spec, const arg_view_t &arg) {
+    if (const auto p = std::get_if<std::string_view>(&arg)) {
+        if (count_codepoint(*p) != 1) {
+            throw std::invalid_argument("%c requires int or char");
+        }
+        format_str(dest, spec, *p);
+        return;
+    }
+    const auto code = to_int(arg, 'c');
+    if (code < 0 || code > 0x10FFFF) {
+        throw std::invalid_argument("%c arg not in range(0x110000)");
+    }
+    // utf-8 encode
+    char buf[4];
+    size_t len;
+    const auto cp = static_cast<uint32_t>(code);
+    if (cp < 0x80) {
+        buf[0] = static_cast<char>(cp);
+        len = 1;
+    } else if (cp < 0x800) {
+        buf[0] = static_cast<char>(0xC0 | (cp >> 6));
+        buf[1] = static_cast<char>(0x80 | (cp & 0x3F));
+        len = 2;
+    } else if (cp < 0x10000) {
+        buf[0] = static_cast<char>(0xE0 | (cp >> 12));
+        buf[1] = static_cast<char>(0x80 | ((cp >> 6) & 0x3F));
+        buf[2] = static_cast<char>(0x80 | (cp & 0x3F));
+        len = 3;
+    } else {
+        buf[0] = static_cast<char>(0xF0 | (cp >> 18));
+        buf[1] = static_cast<char>(0x80 | ((cp >> 12) & 0x3F));
+        buf[2] = static_cast<char>(0x80 | ((cp >> 6) & 0x3F));
+        buf[3] = static_cast<char>(0x80 | (cp & 0x3F));
+        len = 4;
+    }
+    append_padded(dest, spec, "", std::string_view{buf, len}, false);
+}
+} // namespace
+
+void format_printf(const std::string_view fmt, const std::vector<arg_view_t> &args, memory_buf_t &dest) {
+    size_t arg_id = 0;
+    const auto next_arg = [&]() -> const arg_view_t & {
+        if (arg_id >= std::size(args)) {
+            throw std::invalid_argument("not enough arguments for format string");
+        }
+        return args[arg_id++];
+    };
+    const auto parse_num = [&](size_t &pos) -> int {
+        int res = 0;
+        while (pos < std::size(fmt) && fmt[pos] >= '0' && fmt[pos] <= '9') {
+            res = res * 10 + (fmt[pos] - '0');
+            pos++;
+        }
+        return res;
+    };
+
+    size_t pos = 0;
+    while (pos < std::size(fmt)) {
+        const size_t next = fmt.find('%', pos);
+        if (next == std::string_view::npos) {
+            append_string_view(fmt.substr(pos), dest);
+            break;
+        }
+        append_string_view(fmt.substr(pos, next - pos), dest);
+        pos = next + 1;
+        if (pos >= std::size(fmt)) {
+            throw std::invalid_argument("incomplete format");
+        }
+        if (fmt[pos] == '(') {
+            throw std::invalid_argument("format requires a mapping");
+        }
+
+        conv_spec_t spec;
+        // flags
+        for (bool in_flag = true; in_flag && pos < std::size(fmt); pos += in_flag) {
+            switch (fmt[pos]) {
+            case '-':
+                spec.left = true;
+                break;
+            case '0':
+                spec.zero = true;
+                break;
+            case '+':
+                spec.plus = true;
+                break;
+            case ' ':
+                spec.space = true;
+                break;
+            case '#':
+                spec.alt = true;
+                break;
+            default:
+                in_flag = false;
+                break;
+            }
+        }
+        // width
+        if (pos < std::size(fmt) && fmt[pos] == '*') {
+            pos++;
+            const auto width = to_int(next_arg(), '*');
+            if (width < 0) {
+                spec.left = true;
+            }
+            spec.width = static_cast<int>(width < 0 ? -width : width);
+        } else if (pos < std::size(fmt) && fmt[pos] >= '0' && fmt[pos] <= '9') {
+            spec.width = parse_num(pos);
+        }
+        // precision
+        if (pos < std::size(fmt) && fmt[pos] == '.') {
+            pos++;
+            if (pos < std::size(fmt) && fmt[pos] == '*') {
+                pos++;
+                const auto precision = to_int(next_arg(), '*');
+                spec.precision = static_cast<int>(precision < 0 ? 0 : precision);
+            } else {
+                spec.precision = parse_num(pos);
+            }
+        }
+        // length modifier, ignored as in python
+        while (pos < std::size(fmt) && (fmt[pos] == 'h' || fmt[pos] == 'l' || fmt[pos] == 'L')) {
+            pos++;
+        }
+        if (pos >= std::size(fmt)) {
+            throw std::invalid_argument("incomplete format");
+        }
+
+        spec.type = fmt[pos++];
+        switch (spec.type) {
+        case '%':
+            dest.push_back('%');
+            break;
+        case 'd':
+        case 'i':
+        case 'u':
+        case 'o':
+        case 'x':
+        case 'X': {
+            const auto &arg = next_arg();
+            if ((spec.type == 'o' || spec.type == 'x' || spec.type == 'X') && std::holds_alternative<double>(arg)) {
+                throw std::invalid_argument(fmt::format("%{} format: an integer is required, not float", spec.type));
+            }
+            format_int(dest, spec, to_int(arg, spec.type));
+            break;
+        }
+        case 'e':
+        case 'E':
+        case 'f':
+        case 'F':
+        case 'g':
+        case 'G':
+            format_float(dest, spec, to_float(next_arg(), spec.type));
+            break;
+        case 's':
+        case 'r':
+        case 'a':
+            format_str(dest, spec, to_str(next_arg(), spec.type));
+            break;
+        case 'c':
+            format_char(dest, spec, next_arg());
+            break;
+        default:
+            throw std::invalid_argument(fmt::format("unsupported format character '{}'", spec.type));
+        }
+    }
+
+    if (arg_id != std::size(args)) {
+        throw std::invalid_argument("not all arguments converted during string formatting");
+    }
+}
+// endregion === printf <<<
+
+} // namespace libtcomplex::log::lazy
@@ -0,0 +1,40 @@
+#ifndef LIBTCOMPLEX_LOG_LAZY_H
+#define LIBTCOMPLEX_LOG_LAZY_H
+
+#include <cstdint>
+#include <string>
+#include <string_view>
+#include <variant>
+#include <vector>
+
+#include <spdlog/common.h>
+
+// lazy message: python %-style template & args are packed into the payload on the caller thread,
+// the message is rendered by the sink formatter on the async worker thread
+namespace libtcomplex::log::lazy {
+
+using arg_t = std::variant<int64_t, double, std::string>;
+using arg_view_t = std::variant<int64_t, double, std::string_view>;
+
+// payload prefix marking a packed message
+constexpr std::string_view LAZY_MAGIC{"\0tcl", 4};
+
+inline bool check_packed(const spdlog::string_view_t payload) {
+    return std::string_view{payload.data(), payload.size()}.starts_with(LAZY_MAGIC);
+}
+
+// caller thread
+void pack(spdlog::memory_buf_t &dest, const std::string_view fmt, const std::vector<arg_t> &args);
+
+// worker thread: template & args of a packed payload, views into payload; false if corrupted
+bool unpack(const spdlog::string_view_t payload, std::string_view &fmt, std::vector<arg_view_t> &args);
+
+// worker thread: render the message of a packed payload into dest
+void render(const spdlog::string_view_t payload, spdlog::memory_buf_t &dest);
+
+// python printf-style formatting: `fmt % tuple(args)`
+void format_printf(const std::string_view fmt, const std::vector<arg_view_t> &args, spdlog::memory_buf_t &dest);
+
+} // namespace libtcomplex::log::lazy
+
+#endif
@@ -0,0 +1,174 @@
+#include "log_limit.h"
+
+#include <algorithm>
+#include <functional>
+#include <memory>
+
+#include <fmt/core.h>
+
+#include "log.h"
+
+namespace libtcomplex::log {
+
+// region ====== limit table >>>
+namespace {
+struct limit_table_t {
+    limit_param_t limit_default;
+    std::vector<std::optional<limit_param_t>> limit_by_id;
+};
+
+bool check_active(const limit_param_t &limit) {
+    return limit.logger_rate > 0 || limit.site_rate > 0 || limit.repeat_window > 0;
+}
+
+class limit_registry final {
+public:
+    limit_registry() {
+        this->table_store_.push_back(std::make_unique<const limit_table_t>(limit_table_t{{0, 0, 0, 0, 0}, {}}));
+        this->table_.store(this->table_store_.back().get(), std::memory_order_release);
+    }
+
+    const limit_table_t &table() const { return *this->table_.load(std::memory_order_acquire); }
+
+    template <typename update_fn> void update(update_fn &&fn) {
+        std::scoped_lock lock(this->mutex_);
+        limit_table_t table = this->table();
+        fn(table);
+        // a reader may still hold an older table, limits are set rarely
+        this->table_store_.push_back(std::make_unique<const limit_table_t>(std::move(table)));
+        this->table_.store(this->table_store_.back().get(), std::memory_order_release);
+    }
+
+private:
+    std::atomic<const limit_table_t *> table_{nullptr};
+    std::mutex mutex_; // writers
+    std::vector<std::unique_ptr<const limit_table_t>> table_store_;
+};
+
+limit_registry &ref_limit_registry() {
+    static limit_registry limit_registry_;
+    return limit_registry_;
+}
+} // namespace
+
+void set_limit_default(const limit_param_t &limit) {
+    ref_limit_registry().update([&](limit_table_t &table) { table.limit_default = limit; });
+}
+
+void set_logger_limit(const std::string &name, const std::optional<limit_param_t> limit) {
+    const size_t logger_id = ref_logger_id(name);
+    ref_limit_registry().update([&](limit_table_t &table) {
+        if (logger_id >= std::size(table.limit_by_id)) {
+            table.limit_by_id.resize(logger_id + 1);
+        }
+        table.limit_by_id[logger_id] = limit;
+    });
+}
+
+const limit_param_t *get_limit(const size_t logger_id) {
+    const limit_table_t &table = ref_limit_registry().table();
+    const limit_param_t *limit = &table.limit_default;
+    if (logger_id < std::size(table.limit_by_id) && table.limit_by_id[logger_id].has_value()) {
+        limit = &table.limit_by_id[logger_id].value();
+    }
+    return check_active(*limit) ? limit : nullptr;
+}
+// endregion === limit table <<<
+
+// region ====== record limiter >>>
+namespace detail {
+bool limit_bucket_t::take(const double rate, const double burst, const limit_clock::time_point now) {
+    const double capacity = std::max(burst, 1.0);
+    if (this->tokens < 0) {
+        this->tokens = capacity;
+    } else {
+        const double dt = std::chrono::duration<double>(now - this->t_fill).count();
+        this->tokens = std::min(capacity, this->tokens + rate * dt);
+    }
+    this->t_fill = now;
+    if (this->tokens < 1.0) {
+        return false;
+    }
+    this->tokens -= 1.0;
+    return true;
+}
+
+size_t limit_site_key_hash::operator()(const limit_site_key_t &key) const noexcept {
+    return std::hash<const char *>{}(key.first) ^ (std::hash<int>{}(key.second) * 0x9e3779b97f4a7c15ULL);
+}
+} // namespace detail
+
+record_limiter::verdict_t record_limiter::check(const limit_param_t &limit, const spdlog::details::log_msg &msg,
+                                                std::vector<limit_note_t> &notes) {
+    const auto now = clock::now();
+    auto it = this->site_map_.find({msg.source.filename, msg.source.line});
+    if (it == this->site_map_.end()) {
+        it = this->site_map_.insert({{msg.source.filename, msg.source.line}, site_t{.source = msg.source}}).first;
+    }
+    site_t &site = it.value();
+
+    // a repeat of the last message of the site within the window takes no token
+    size_t msg_hash = 0;
+    if (limit.repeat_window > 0) {
+        msg_hash = std::hash<std::string_view>{}({msg.payload.data(), msg.payload.size()});
+        if (site.has_last && site.last_hash == msg_hash && site.last_len == msg.payload.size() &&
+            std::chrono::duration<double>(now - site.t_last).count() <= limit.repeat_window) {
+            site.num_repeat += 1;
+            site.note_level = std::max(site.note_level, msg.level);
+            this->num_collapsed_.fetch_add(1, std::memory_order_relaxed);
+            return verdict_t::collapsed;
+        }
+    }
+
+    bool admitted = true;
+    if (limit.site_rate > 0) {
+        admitted = site.bucket.take(limit.site_rate, limit.site_burst, now);
+    }
+    if (admitted && limit.logger_rate > 0 && !this->bucket_.take(limit.logger_rate, limit.logger_burst, now)) {
+        admitted = false;
+        if (limit.site_rate > 0) {
+            site.bucket.tokens += 1.0; // give back the token of the site
+        }
+    }
+    if (!admitted) {
+        site.num_rate_limited += 1;
+        site.note_level = std::max(site.note_level, msg.level);
+        this->num_rate_limited_.fetch_add(1, std::memory_order_relaxed);
+        return verdict_t::rate_limited;
+    }
+
+    take_note_(site, notes);
+    site.has_last = limit.repeat_window > 0;
+    site.last_hash = msg_hash;
+    site.last_len = msg.payload.size();
+    site.t_last = now;
+    return verdict_t::pass;
+}
+
+void record_limiter::take_notes(std::vector<limit_note_t> &notes) {
+    for (auto it = this->site_map_.begin(); it != this->site_map_.end(); ++it) {
+        take_note_(it.value(), notes);
+    }
+}
+
+void record_limiter::forget(const spdlog::details::log_msg &msg) {
+    if (auto it = this->site_map_.find({msg.source.filename, msg.source.line}); it != this->site_map_.end()) {
+        it.value().has_last = false;
+    }
+}
+
+void record_limiter::take_note_(site_t &site, std::vector<limit_note_t> &notes) {
+    if (site.num_repeat > 0) {
+        notes.push_back({site.source, site.note_level, fmt::format("last message repeated {} times", site.num_repeat)});
+        site.num_repeat = 0;
+    }
+    if (site.num_rate_limited > 0) {
+        notes.push_back(
+            {site.source, site.note_level, fmt::format("{} records suppressed by rate limit", site.num_rate_limited)});
+        site.num_rate_limited = 0;
+    }
+    site.note_level = spdlog::level::trace;
+}
+// endregion === record limiter <<<
+
+} // namespace libtcomplex::log
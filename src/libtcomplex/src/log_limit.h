@@ -0,0 +1,104 @@
+#ifndef LIBTCOMPLEX_LOG_LIMIT_H
+#define LIBTCOMPLEX_LOG_LIMIT_H
+
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <mutex>
+#include <optional>
+#include <string>
+#include <string_view>
+#include <utility>
+#include <vector>
+
+#include <spdlog/common.h>
+#include <spdlog/details/log_msg.h>
+
+#include <tsl/robin_map.h>
+
+#include <libtcomplex/log_def.h>
+
+// producer side record limits: token buckets per logger & per call site, collapsing of repeated messages. checked on
+// the calling thread before a record takes a slot of the async queue
+namespace libtcomplex::log {
+
+// limit table: the default of log_param_t & explicit limits by logger id, published copy on write, readers never lock
+// set_logger_limit is declared in log_def.h
+void set_limit_default(const limit_param_t &limit);
+// nullptr: no limit for the logger
+const limit_param_t *get_limit(const size_t logger_id);
+
+// summary record of suppressed records of a call site, logged before the next record of the site
+struct limit_note_t {
+    spdlog::source_loc source;
+    spdlog::level::level_enum level;
+    std::string text;
+};
+
+namespace detail {
+using limit_clock = std::chrono::steady_clock;
+
+struct limit_bucket_t {
+    double tokens{-1.0}; // < 0: not filled yet
+    limit_clock::time_point t_fill;
+
+    bool take(const double rate, const double burst, const limit_clock::time_point now);
+};
+
+// source_loc strings are literals or interned, so a call site is identified by address & line
+using limit_site_key_t = std::pair<const char *, int>;
+struct limit_site_key_hash {
+    size_t operator()(const limit_site_key_t &key) const noexcept;
+};
+
+struct limit_site_t {
+    spdlog::source_loc source;
+    spdlog::level::level_enum note_level{spdlog::level::trace}; // highest of the suppressed records
+    limit_bucket_t bucket;
+    uint64_t num_rate_limited{0}; // since the last note
+    size_t last_hash{0};          // payload of the last passed record
+    size_t last_len{0};
+    bool has_last{false};
+    limit_clock::time_point t_last;
+    uint64_t num_repeat{0}; // since the last note
+};
+} // namespace detail
+
+// state of one logger, used under mutex
+class record_limiter final {
+public:
+    enum struct verdict_t {
+        pass,
+        rate_limited,
+        collapsed,
+    };
+
+    // notes to log before msg, if it passes, are left in notes
+    verdict_t check(const limit_param_t &limit, const spdlog::details::log_msg &msg, std::vector<limit_note_t> &notes);
+    // notes of every call site with suppressed records, e.g. on flush
+    void take_notes(std::vector<limit_note_t> &notes);
+    // msg passed check but is not queued: it is no longer the last message of its call site
+    void forget(const spdlog::details::log_msg &msg);
+
+    uint64_t num_rate_limited() const { return num_rate_limited_.load(std::memory_order_relaxed); }
+    uint64_t num_collapsed() const { return num_collapsed_.load(std::memory_order_relaxed); }
+
+    std::mutex mutex;
+
+private:
+    using clock = detail::limit_clock;
+    using bucket_t = detail::limit_bucket_t;
+    using site_key_t = detail::limit_site_key_t;
+    using site_t = detail::limit_site_t;
+
+    static void take_note_(site_t &site, std::vector<limit_note_t> &notes);
+
+    bucket_t bucket_;
+    tsl::robin_map<site_key_t, site_t, detail::limit_site_key_hash> site_map_;
+    std::atomic<uint64_t> num_rate_limited_{0};
+    std::atomic<uint64_t> num_collapsed_{0};
+};
+
+} // namespace libtcomplex::log
+
+#endif
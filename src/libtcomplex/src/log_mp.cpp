@@ -0,0 +1,417 @@
+#include "log_mp.h"
+
+#include <algorithm>
+#include <cstring>
+#include <new>
+#include <thread>
+
+#include <spdlog/common.h>
+
+#ifdef _WIN32
+#define NOMINMAX
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+namespace libtcomplex::log::mp {
+
+// atomics live in memory shared between processes: they have to be lock free (address free)
+static_assert(std::atomic<uint64_t>::is_always_lock_free);
+
+// region ====== layout >>>
+constexpr size_t CACHE_LINE_SIZE = 64;
+
+struct ring_header {
+    uint64_t magic;
+    uint32_t version;
+    uint32_t slot_size; // bytes per slot, slot header included
+    uint64_t slot_count;
+    alignas(CACHE_LINE_SIZE) std::atomic<uint64_t> enqueue_pos;
+    alignas(CACHE_LINE_SIZE) std::atomic<uint64_t> dequeue_pos;
+    alignas(CACHE_LINE_SIZE) std::atomic<uint64_t> num_dropped;
+};
+
+// bounded mpmc queue of d. vyukov: seq == pos when free for producer pos, seq == pos + 1 once committed
+struct ring_slot {
+    std::atomic<uint64_t> seq;
+    uint32_t len;
+    uint32_t reserved;
+    // followed by the payload
+    char *data() { return reinterpret_cast<char *>(this + 1); }
+};
+
+constexpr size_t RING_HEADER_SIZE = (sizeof(ring_header) + CACHE_LINE_SIZE - 1) / CACHE_LINE_SIZE * CACHE_LINE_SIZE;
+// endregion === layout <<<
+
+// region ====== mapping >>>
+#ifdef _WIN32
+static void *map_segment(const std::string &name, const size_t map_size, const bool create, void *&handle) {
+    if (create) {
+        handle = CreateFileMappingA(INVALID_HANDLE_VALUE, nullptr, PAGE_READWRITE, static_cast<DWORD>(map_size >> 32),
+                                    static_cast<DWORD>(map_size & 0xffffffff), name.c_str());
+    } else {
+        handle = OpenFileMappingA(FILE_MAP_ALL_ACCESS, FALSE, name.c_str());
+    }
+    if (handle == nullptr) {
+        spdlog::throw_spdlog_ex("mp log: failed to open shared memory " + name);
+    }
+    void *addr = MapViewOfFile(handle, FILE_MAP_ALL_ACCESS, 0, 0, map_size);
+    if (addr == nullptr) {
+        CloseHandle(handle);
+        spdlog::throw_spdlog_ex("mp log: failed to map shared memory " + name);
+    }
+    return addr;
+}
+
+static size_t query_segment_size(const std::string &name) {
+    void *handle = nullptr;
+    void *addr = map_segment(name, 0, false, handle);
+    MEMORY_BASIC_INFORMATION info;
+    VirtualQuery(addr, &info, sizeof(info));
+    UnmapViewOfFile(addr);
+    CloseHandle(handle);
+    return info.RegionSize;
+}
+
+static int64_t current_pid() { return static_cast<int64_t>(GetCurrentProcessId()); }
+
+static void unmap_segment(const std::string &name, void *addr, const size_t map_size, void *handle, const bool owner) {
+    UnmapViewOfFile(addr);
+    CloseHandle(handle);
+}
+#else
+static std::string shm_path(const std::string &name) { return name.starts_with('/') ? name : "/" + name; }
+
+static void *map_segment(const std::string &name, const size_t map_size, const bool create, void *&handle) {
+    const auto path = shm_path(name);
+    const int fd = create ? shm_open(path.c_str(), O_CREAT | O_EXCL | O_RDWR, 0600) : shm_open(path.c_str(), O_RDWR, 0);
+    if (fd < 0) {
+        spdlog::throw_spdlog_ex("mp log: failed to open shared memory " + name, errno);
+    }
+    if (create && ftruncate(fd, static_cast<off_t>(map_size)) != 0) {
+        const int err = errno;
+        close(fd);
+        shm_unlink(path.c_str());
+        spdlog::throw_spdlog_ex("mp log: failed to size shared memory " + name, err);
+    }
+    void *addr = mmap(nullptr, map_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    const int err = errno;
+    close(fd);
+    if (addr == MAP_FAILED) {
+        if (create) {
+            shm_unlink(path.c_str());
+        }
+        spdlog::throw_spdlog_ex("mp log: failed to map shared memory " + name, err);
+    }
+    handle = nullptr;
+    return addr;
+}
+
+static size_t query_segment_size(const std::string &name) {
+    const int fd = shm_open(shm_path(name).c_str(), O_RDONLY, 0);
+    if (fd < 0) {
+        spdlog::throw_spdlog_ex("mp log: failed to open shared memory " + name, errno);
+    }
+    struct stat st;
+    const int res = fstat(fd, &st);
+    close(fd);
+    if (res != 0) {
+        spdlog::throw_spdlog_ex("mp log: failed to stat shared memory " + name, errno);
+    }
+    return static_cast<size_t>(st.st_size);
+}
+
+static int64_t current_pid() { return static_cast<int64_t>(getpid()); }
+
+static void unmap_segment(const std::string &name, void *addr, const size_t map_size, void *handle, const bool owner) {
+    munmap(addr, map_size);
+    if (owner) {
+        // mappings of attached workers stay valid
+        shm_unlink(shm_path(name).c_str());
+    }
+}
+#endif
+// endregion === mapping <<<
+
+// region ====== ring >>>
+std::unique_ptr<shm_ring> shm_ring::create(const std::string &name, const size_t slot_count, const size_t slot_size) {
+    // power of 2 slot count, cache line aligned slots
+    size_t n_slot = 2;
+    while (n_slot < slot_count) {
+        n_slot <<= 1;
+    }
+    const size_t stride =
+        (std::max(slot_size, sizeof(ring_slot) + 64) + CACHE_LINE_SIZE - 1) / CACHE_LINE_SIZE * CACHE_LINE_SIZE;
+    const size_t map_size = RING_HEADER_SIZE + n_slot * stride;
+
+    void *handle = nullptr;
+    void *addr = map_segment(name, map_size, true, handle);
+
+    auto header = new (addr) ring_header{};
+    header->magic = RING_MAGIC;
+    header->version = RING_VERSION;
+    header->slot_size = static_cast<uint32_t>(stride);
+    header->slot_count = n_slot;
+    header->enqueue_pos.store(0, std::memory_order_relaxed);
+    header->dequeue_pos.store(0, std::memory_order_relaxed);
+    header->num_dropped.store(0, std::memory_order_relaxed);
+    auto base = static_cast<char *>(addr) + RING_HEADER_SIZE;
+    for (size_t i = 0; i < n_slot; i++) {
+        auto slot = new (base + i * stride) ring_slot{};
+        slot->seq.store(i, std::memory_order_relaxed);
+    }
+    std::atomic_thread_fence(std::memory_order_release);
+
+    return std::unique_ptr<shm_ring>(new shm_ring(name, addr, map_size, handle, true));
+}
+
+std::unique_ptr<shm_ring> shm_ring::attach(const std::string &name) {
+    const size_t map_size = query_segment_size(name);
+    if (map_size < RING_HEADER_SIZE) {
+        spdlog::throw_spdlog_ex("mp log: not a log ring " + name);
+    }
+    void *handle = nullptr;
+    void *addr = map_segment(name, map_size, false, handle);
+    auto header = static_cast<ring_header *>(addr);
+    if (header->magic != RING_MAGIC || header->version != RING_VERSION ||
+        RING_HEADER_SIZE + header->slot_count * header->slot_size > map_size) {
+        unmap_segment(name, addr, map_size, handle, false);
+        spdlog::throw_spdlog_ex("mp log: not a log ring " + name);
+    }
+    return std::unique_ptr<shm_ring>(new shm_ring(name, addr, map_size, handle, false));
+}
+
+shm_ring::shm_ring(const std::string &name, void *addr, const size_t map_size, void *handle, const bool owner)
+    : name_(name), addr_(addr), map_size_(map_size), handle_(handle), owner_(owner), owner_pid_(current_pid()),
+      header_(static_cast<ring_header *>(addr)) {
+    dequeue_pos_ = header_->dequeue_pos.load(std::memory_order_acquire);
+}
+
+shm_ring::~shm_ring() { unmap_segment(name_, addr_, map_size_, handle_, owner_ && owner_pid_ == current_pid()); }
+
+ring_slot *shm_ring::slot_at(const uint64_t pos) const {
+    auto base = static_cast<char *>(addr_) + RING_HEADER_SIZE;
+    return reinterpret_cast<ring_slot *>(base + (pos & (header_->slot_count - 1)) * header_->slot_size);
+}
+
+size_t shm_ring::capacity() const { return header_->slot_size - sizeof(ring_slot); }
+
+char *shm_ring::claim(uint64_t &pos, const bool block) {
+    pos = header_->enqueue_pos.load(std::memory_order_relaxed);
+    while (true) {
+        auto slot = slot_at(pos);
+        const uint64_t seq = slot->seq.load(std::memory_order_acquire);
+        const auto dif = static_cast<int64_t>(seq - pos);
+        if (dif == 0) {
+            if (header_->enqueue_pos.compare_exchange_weak(pos, pos + 1, std::memory_order_relaxed)) {
+                return slot->data();
+            }
+        } else if (dif < 0) {
+            // full: the consumer has not released this slot yet
+            if (!block) {
+                header_->num_dropped.fetch_add(1, std::memory_order_relaxed);
+                return nullptr;
+            }
+            std::this_thread::yield();
+            pos = header_->enqueue_pos.load(std::memory_order_relaxed);
+        } else {
+            pos = header_->enqueue_pos.load(std::memory_order_relaxed);
+        }
+    }
+}
+
+void shm_ring::commit(const uint64_t pos, const size_t len) {
+    auto slot = slot_at(pos);
+    slot->len = static_cast<uint32_t>(std::min(len, this->capacity()));
+    slot->seq.store(pos + 1, std::memory_order_release);
+}
+
+std::optional<std::string_view> shm_ring::peek() {
+    auto slot = slot_at(dequeue_pos_);
+    if (slot->seq.load(std::memory_order_acquire) != dequeue_pos_ + 1) {
+        // empty, or the producer of the next slot has not committed yet
+        return std::nullopt;
+    }
+    return std::string_view{slot->data(), slot->len};
+}
+
+void shm_ring::release() {
+    auto slot = slot_at(dequeue_pos_);
+    slot->seq.store(dequeue_pos_ + header_->slot_count, std::memory_order_release);
+    dequeue_pos_ += 1;
+    header_->dequeue_pos.store(dequeue_pos_, std::memory_order_release);
+}
+
+uint64_t shm_ring::enqueue_pos() const { return header_->enqueue_pos.load(std::memory_order_acquire); }
+
+uint64_t shm_ring::dequeue_pos() const { return header_->dequeue_pos.load(std::memory_order_acquire); }
+
+mp_stat_t shm_ring::stat() const {
+    const uint64_t enqueue_pos = header_->enqueue_pos.load(std::memory_order_relaxed);
+    const uint64_t dequeue_pos = header_->dequeue_pos.load(std::memory_order_relaxed);
+    return mp_stat_t{header_->slot_count, header_->slot_size, enqueue_pos - dequeue_pos, enqueue_pos,
+                     header_->num_dropped.load(std::memory_order_relaxed)};
+}
+// endregion === ring <<<
+
+// region ====== record >>>
+// fixed head, then key, filename, funcname & msg bytes
+struct record_head_t {
+    int64_t created_ns;
+    int32_t lvl;
+    int32_t lineno;
+    uint32_t msg_len;
+    uint16_t key_len;
+    uint16_t filename_len;
+    uint16_t funcname_len;
+    uint16_t reserved;
+};
+
+size_t record_size(const record_view_t &rec) {
+    return sizeof(record_head_t) + rec.key.size() + rec.filename.size() + rec.funcname.size() + rec.msg.size();
+}
+
+size_t encode_record(char *dest, const size_t cap, const record_view_t &rec) {
+    if (cap < sizeof(record_head_t)) {
+        return 0;
+    }
+    size_t left = cap - sizeof(record_head_t);
+    const auto cut = [&left](const std::string_view str, const size_t max_len) {
+        const size_t len = std::min({str.size(), max_len, left});
+        left -= len;
+        return str.substr(0, len);
+    };
+    const auto key = cut(rec.key, UINT16_MAX);
+    const auto filename = cut(rec.filename, UINT16_MAX);
+    const auto funcname = cut(rec.funcname, UINT16_MAX);
+    const auto msg = cut(rec.msg, UINT32_MAX);
+
+    const record_head_t head{rec.created_ns,
+                             rec.lvl,
+                             rec.lineno,
+                             static_cast<uint32_t>(msg.size()),
+                             static_cast<uint16_t>(key.size()),
+                             static_cast<uint16_t>(filename.size()),
+                             static_cast<uint16_t>(funcname.size()),
+                             0};
+    char *it = dest;
+    std::memcpy(it, &head, sizeof(head));
+    it += sizeof(head);
+    for (const auto str : {key, filename, funcname, msg}) {
+        std::memcpy(it, str.data(), str.size());
+        it += str.size();
+    }
+    return static_cast<size_t>(it - dest);
+}
+
+std::optional<record_view_t> decode_record(const std::string_view raw) {
+    record_head_t head;
+    if (raw.size() < sizeof(head)) {
+        return std::nullopt;
+    }
+    std::memcpy(&head, raw.data(), sizeof(head));
+    if (sizeof(head) + head.key_len + head.filename_len + head.funcname_len + size_t{head.msg_len} > raw.size()) {
+        return std::nullopt;
+    }
+    size_t offset = sizeof(head);
+    const auto take = [&raw, &offset](const size_t len) {
+        const auto res = raw.substr(offset, len);
+        offset += len;
+        return res;
+    };
+    const auto key = take(head.key_len);
+    const auto filename = take(head.filename_len);
+    const auto funcname = take(head.funcname_len);
+    const auto msg = take(head.msg_len);
+    return record_view_t{head.lvl, head.created_ns, key, filename, funcname, head.lineno, msg};
+}
+// endregion === record <<<
+
+// region ====== host >>>
+ring_host::ring_host(std::unique_ptr<shm_ring> ring, consume_fn fn)
+    : ring_(std::move(ring)), fn_(std::move(fn)), owner_pid_(current_pid()) {
+    thread_ = std::make_unique<std::thread>([this]() { this->loop_(); });
+}
+
+ring_host::~ring_host() {
+    if (owner_pid_ != current_pid()) {
+        // forked child: the drain thread only exists in the parent
+        static_cast<void>(thread_.release());
+        return;
+    }
+    this->stop();
+}
+
+void ring_host::stop() {
+    stopping_.store(true, std::memory_order_release);
+    if (thread_ != nullptr && thread_->joinable()) {
+        thread_->join();
+    }
+}
+
+bool ring_host::drain(const std::optional<std::chrono::steady_clock::time_point> deadline) {
+    const uint64_t target = ring_->enqueue_pos();
+    std::unique_lock lock(mutex_);
+    const auto drained = [this, target]() { return stopped_ || ring_->dequeue_pos() >= target; };
+    if (!deadline.has_value()) {
+        cv_.wait(lock, drained);
+        return true;
+    }
+    return cv_.wait_until(lock, deadline.value(), drained);
+}
+
+void ring_host::loop_() {
+    using namespace std::chrono_literals;
+    constexpr size_t BATCH_SIZE = 1024;
+    constexpr size_t SPIN_COUNT = 64;
+    constexpr auto IDLE_SLEEP_MAX = 1ms;
+
+    size_t n_idle = 0;
+    while (true) {
+        size_t n_consumed = 0;
+        while (n_consumed < BATCH_SIZE) {
+            const auto raw = ring_->peek();
+            if (!raw.has_value()) {
+                break;
+            }
+            try {
+                fn_(raw.value());
+            } catch (const std::exception &ex) {
+                fprintf(stderr, "error! %s\n", ex.what());
+            }
+            ring_->release();
+            n_consumed += 1;
+        }
+
+        if (n_consumed > 0) {
+            n_idle = 0;
+            std::scoped_lock lock(mutex_);
+            cv_.notify_all();
+            continue;
+        }
+        if (stopping_.load(std::memory_order_acquire)) {
+            // records claimed but never committed (e.g. a worker killed mid write) are given up
+            break;
+        }
+
+        // back off: spin, then sleep up to IDLE_SLEEP_MAX
+        n_idle += 1;
+        if (n_idle < SPIN_COUNT) {
+            std::this_thread::yield();
+        } else {
+            const auto sleep_time = std::chrono::microseconds{std::min<size_t>(n_idle - SPIN_COUNT + 1, 20) * 50};
+            std::this_thread::sleep_for(std::min<std::chrono::microseconds>(sleep_time, IDLE_SLEEP_MAX));
+        }
+    }
+
+    std::scoped_lock lock(mutex_);
+    stopped_ = true;
+    cv_.notify_all();
+}
+// endregion === host <<<
+
+} // namespace libtcomplex::log::mp
@@ -0,0 +1,120 @@
+#ifndef LIBTCOMPLEX_LOG_MP_H
+#define LIBTCOMPLEX_LOG_MP_H
+
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <cstddef>
+#include <cstdint>
+#include <functional>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <string>
+#include <string_view>
+#include <thread>
+
+#include <libtcomplex/log_def.h>
+
+// multiprocess logging: a bounded multi-producer / single-consumer ring in named shared memory,
+// worker processes write encoded records into slots, the main process drains them into its loggers
+namespace libtcomplex::log::mp {
+
+constexpr uint64_t RING_MAGIC = 0x676e72706d6c6374; // "tclmprng"
+constexpr uint32_t RING_VERSION = 1;
+constexpr size_t RING_SLOT_COUNT = 8192;
+constexpr size_t RING_SLOT_SIZE = 512;
+
+struct ring_header; // layout in log_mp.cpp
+struct ring_slot;
+
+class shm_ring final {
+public:
+    // main process: create & own the segment (unlinked on destruction)
+    static std::unique_ptr<shm_ring> create(const std::string &name, const size_t slot_count, const size_t slot_size);
+    // worker process: map an existing segment
+    static std::unique_ptr<shm_ring> attach(const std::string &name);
+
+    ~shm_ring();
+    shm_ring(const shm_ring &other) = delete;
+    shm_ring &operator=(const shm_ring &other) = delete;
+
+    // producer (any process): claim a slot, write at most capacity() bytes into it, then commit
+    // nullptr if the ring is full and block is false
+    char *claim(uint64_t &pos, const bool block);
+    void commit(const uint64_t pos, const size_t len);
+    size_t capacity() const;
+
+    // consumer (single thread of the owning process)
+    std::optional<std::string_view> peek();
+    void release();
+
+    uint64_t enqueue_pos() const;
+    uint64_t dequeue_pos() const;
+    mp_stat_t stat() const;
+    const std::string &name() const { return name_; }
+
+private:
+    shm_ring(const std::string &name, void *addr, const size_t map_size, void *handle, const bool owner);
+    ring_slot *slot_at(const uint64_t pos) const;
+
+    std::string name_;
+    void *addr_;
+    size_t map_size_;
+    void *handle_; // mapping handle on windows
+    bool owner_;
+    int64_t owner_pid_; // a forked child never unlinks the segment of its parent
+    ring_header *header_;
+    uint64_t dequeue_pos_{0}; // consumer only
+};
+
+// record encoding in a slot
+struct record_view_t {
+    int lvl; // python levelno
+    int64_t created_ns;
+    std::string_view key; // native logger name
+    std::string_view filename;
+    std::string_view funcname;
+    int lineno;
+    std::string_view msg; // plain text, or a packed lazy payload
+};
+
+size_t record_size(const record_view_t &rec);
+// fields are cut to fit into cap, the msg last; returns bytes written
+size_t encode_record(char *dest, const size_t cap, const record_view_t &rec);
+std::optional<record_view_t> decode_record(const std::string_view raw);
+
+// main process: a thread handing every record of the ring to consume_fn, in ring order
+class ring_host final {
+public:
+    using consume_fn = std::function<void(const std::string_view raw)>;
+
+    ring_host(std::unique_ptr<shm_ring> ring, consume_fn fn);
+    ~ring_host();
+    ring_host(const ring_host &other) = delete;
+    ring_host &operator=(const ring_host &other) = delete;
+
+    // wait until every record committed before the call is consumed, false on deadline
+    bool drain(const std::optional<std::chrono::steady_clock::time_point> deadline);
+    // consume what is committed, then stop
+    void stop();
+
+    mp_stat_t stat() const { return ring_->stat(); }
+    const std::string &name() const { return ring_->name(); }
+
+private:
+    void loop_();
+
+    std::unique_ptr<shm_ring> ring_;
+    consume_fn fn_;
+    std::atomic<bool> stopping_{false};
+    bool stopped_{false}; // guarded by mutex_
+    std::mutex mutex_;
+    std::condition_variable cv_; // records consumed
+    int64_t owner_pid_;
+    std::unique_ptr<std::thread> thread_;
+};
+
+} // namespace libtcomplex::log::mp
+
+#endif
@@ -0,0 +1,486 @@
+#include "log_sink.h"
+#include "log.h"
+
+#include <algorithm>
+#include <bit>
+#include <chrono>
+#include <cstdio>
+#include <cstring>
+#include <filesystem>
+#include <system_error>
+#include <utility>
+
+#include <fmt/core.h>
+#include <fmt/format.h>
+
+#include <spdlog/details/os.h>
+
+#ifdef _WIN32
+#define NOMINMAX
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <unistd.h>
+#endif
+
+namespace libtcomplex::log {
+
+// region ====== rotating file >>>
+static constexpr size_t ROTATE_SUFFIX_LEN = [] {
+    size_t len = 1;
+    for (size_t n = FILE_MAX_ROTATE; n >= 10; n /= 10) {
+        ++len;
+    }
+    return len;
+}();
+
+std::string rotated_filename(const std::string &filename, const size_t rotate_id) {
+    return fmt::format("{}.{:0{}}", filename, rotate_id, ROTATE_SUFFIX_LEN);
+}
+
+void rotate_file(const std::string &filename, const size_t max_rotate) {
+    namespace fs = std::filesystem;
+    std::error_code ec;
+
+    fs::remove(rotated_filename(filename, max_rotate), ec);
+    for (size_t rotate_id = max_rotate - 1; rotate_id > 0; --rotate_id) {
+        const auto src = rotated_filename(filename, rotate_id);
+        if (fs::exists(src, ec)) {
+            fs::rename(src, rotated_filename(filename, rotate_id + 1));
+        }
+    }
+    if (fs::exists(filename, ec)) {
+        fs::rename(filename, rotated_filename(filename, 1));
+    }
+}
+
+rotating_file_sink::rotating_file_sink(const std::string &filename, const rotate_param_t &param)
+    : filename_{filename}, param_{param} {
+    this->param_.max_rotate = std::clamp<size_t>(this->param_.max_rotate, 1, FILE_MAX_ROTATE);
+
+    std::error_code ec;
+    const auto size_prev = std::filesystem::file_size(this->filename_, ec);
+    bool truncate = true;
+    if (!ec && size_prev > 0) {
+        try {
+            rotate_file(this->filename_, this->param_.max_rotate);
+        } catch (const std::filesystem::filesystem_error &ex) {
+            fprintf(stderr, "error! %s\n", ex.what());
+            truncate = false; // append rather than lose the previous run
+        }
+    }
+    this->file_helper_.open(this->filename_, truncate);
+    this->opened_ = true;
+    this->current_size_ = this->file_helper_.size();
+    this->rotate_tp_ = this->next_rotate_tp_(spdlog::log_clock::now());
+}
+
+void rotating_file_sink::sink_it_(const spdlog::details::log_msg &msg) {
+    spdlog::memory_buf_t formatted;
+    this->formatter_->format(msg, formatted);
+    if (!this->opened_) {
+        // reopen failed on the last rotation
+        this->file_helper_.open(this->filename_, false);
+        this->opened_ = true;
+    }
+    if (this->should_rotate_(msg.time, std::size(formatted))) {
+        this->rotate_(msg.time);
+    }
+    this->file_helper_.write(formatted);
+    this->current_size_ += std::size(formatted);
+}
+
+void rotating_file_sink::flush_() {
+    if (this->opened_) {
+        this->file_helper_.flush();
+    }
+}
+
+bool rotating_file_sink::should_rotate_(const spdlog::log_clock::time_point tp, const size_t len) const {
+    if (tp >= this->rotate_tp_) {
+        return true;
+    }
+    return (this->param_.max_size > 0) && (this->current_size_ > 0) &&
+           (this->current_size_ + len > this->param_.max_size);
+}
+
+void rotating_file_sink::rotate_(const spdlog::log_clock::time_point tp) {
+    this->rotate_tp_ = this->next_rotate_tp_(tp);
+
+    this->file_helper_.close();
+    this->opened_ = false;
+    try {
+        rotate_file(this->filename_, this->param_.max_rotate);
+    } catch (const std::filesystem::filesystem_error &ex) {
+        // keep writing to the current file, retried at the next size / time boundary
+        fprintf(stderr, "error! %s\n", ex.what());
+        this->current_size_ = 0;
+        this->file_helper_.open(this->filename_, false);
+        this->opened_ = true;
+        return;
+    }
+    this->current_size_ = 0;
+    this->file_helper_.open(this->filename_, true);
+    this->opened_ = true;
+}
+
+spdlog::log_clock::time_point rotating_file_sink::next_rotate_tp_(const spdlog::log_clock::time_point tp) const {
+    using clock_duration = spdlog::log_clock::duration;
+    const auto interval =
+        std::chrono::duration_cast<clock_duration>(std::chrono::duration<double>{this->param_.interval});
+    if (interval <= clock_duration::zero()) {
+        return spdlog::log_clock::time_point::max();
+    }
+    const auto since_epoch = tp.time_since_epoch();
+    return spdlog::log_clock::time_point{since_epoch - since_epoch % interval + interval};
+}
+// endregion === rotating file <<<
+
+// region ====== binary file >>>
+namespace {
+void put_varint(spdlog::memory_buf_t &dest, uint64_t value) {
+    while (value >= 0x80) {
+        dest.push_back(static_cast<char>((value & 0x7f) | 0x80));
+        value >>= 7;
+    }
+    dest.push_back(static_cast<char>(value));
+}
+
+void put_svarint(spdlog::memory_buf_t &dest, const int64_t value) {
+    put_varint(dest, (static_cast<uint64_t>(value) << 1) ^ static_cast<uint64_t>(value >> 63));
+}
+
+void put_bytes(spdlog::memory_buf_t &dest, const std::string_view str) {
+    put_varint(dest, std::size(str));
+    dest.append(str.data(), str.data() + std::size(str));
+}
+
+void put_double(spdlog::memory_buf_t &dest, const double value) {
+    static_assert(std::endian::native == std::endian::little, "binary log sink assumes little endian");
+    char raw[sizeof(double)];
+    std::memcpy(raw, &value, sizeof(double));
+    dest.append(raw, raw + sizeof(double));
+}
+
+std::string_view c_str_view(const char *str) { return (str == nullptr) ? std::string_view{} : std::string_view{str}; }
+} // namespace
+
+binary_file_sink::binary_file_sink(const std::string &filename) {
+    this->file_helper_.open(filename, true);
+    spdlog::memory_buf_t header;
+    header.append(BINARY_MAGIC.data(), BINARY_MAGIC.data() + std::size(BINARY_MAGIC));
+    header.push_back(static_cast<char>(BINARY_VERSION));
+    this->file_helper_.write(header);
+}
+
+uint64_t binary_file_sink::intern_(spdlog::memory_buf_t &dest, const std::string_view str) {
+    if (const auto it = this->dict_.find(str); it != this->dict_.end()) {
+        return it->second;
+    }
+    const uint64_t id = this->dict_next_++;
+    dest.push_back(static_cast<char>(BINARY_ENTRY_STR));
+    put_bytes(dest, str);
+    if (std::size(this->dict_) < BINARY_DICT_MAX) {
+        this->dict_.insert({std::string{str}, id});
+    }
+    return id;
+}
+
+uint64_t binary_file_sink::intern_source_(spdlog::memory_buf_t &dest, const char *str) {
+    if (const auto it = this->source_dict_.find(str); it != this->source_dict_.end()) {
+        return it->second;
+    }
+    const uint64_t id = this->intern_(dest, c_str_view(str));
+    if (std::size(this->source_dict_) < BINARY_DICT_MAX) {
+        this->source_dict_.insert({str, id});
+    }
+    return id;
+}
+
+void binary_file_sink::sink_it_(const spdlog::details::log_msg &msg) {
+    // str entries go to out first, the record after them
+    auto &out = this->out_;
+    auto &rec = this->rec_;
+    auto &args = this->args_;
+    out.clear();
+    rec.clear();
+    args.clear();
+
+    std::string_view fmt;
+    const bool is_lazy = lazy::check_packed(msg.payload) && lazy::unpack(msg.payload, fmt, args);
+
+    const int64_t time_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(msg.time.time_since_epoch()).count();
+    rec.push_back(static_cast<char>(is_lazy ? BINARY_ENTRY_LAZY : BINARY_ENTRY_TEXT));
+    put_svarint(rec, time_ns - this->time_prev_ns_);
+    this->time_prev_ns_ = time_ns;
+    put_varint(rec, static_cast<uint64_t>(msg.level));
+    put_varint(rec, this->intern_(out, {msg.logger_name.data(), msg.logger_name.size()}));
+    put_varint(rec, this->intern_source_(out, msg.source.filename));
+    put_varint(rec, this->intern_source_(out, msg.source.funcname));
+    put_varint(rec, static_cast<uint64_t>(std::max(msg.source.line, 0)));
+    put_varint(rec, msg.thread_id);
+    if (is_lazy) {
+        put_varint(rec, this->intern_(out, fmt));
+        put_varint(rec, std::size(args));
+        for (const auto &arg : args) {
+            if (const auto p = std::get_if<int64_t>(&arg)) {
+                rec.push_back('i');
+                put_svarint(rec, *p);
+            } else if (const auto p = std::get_if<double>(&arg)) {
+                rec.push_back('f');
+                put_double(rec, *p);
+            } else {
+                rec.push_back('s');
+                put_bytes(rec, std::get<std::string_view>(arg));
+            }
+        }
+    } else {
+        put_bytes(rec, {msg.payload.data(), msg.payload.size()});
+    }
+
+    out.append(rec.data(), rec.data() + std::size(rec));
+    this->file_helper_.write(out);
+}
+
+void binary_file_sink::flush_() { this->file_helper_.flush(); }
+// endregion === binary file <<<
+
+// region ====== mmap file >>>
+static size_t round_up_chunk(const size_t size) {
+    return (size + MMAP_CHUNK_SIZE - 1) / MMAP_CHUNK_SIZE * MMAP_CHUNK_SIZE;
+}
+
+#ifdef _WIN32
+mmap_file_sink::mmap_file_sink(const std::string &filename) : filename_{filename} {
+    spdlog::details::os::create_dir(spdlog::details::os::dir_name(filename));
+    this->file_handle_ = CreateFileA(filename.c_str(), GENERIC_READ | GENERIC_WRITE, FILE_SHARE_READ, nullptr,
+                                     CREATE_ALWAYS, FILE_ATTRIBUTE_NORMAL, nullptr);
+    if (this->file_handle_ == INVALID_HANDLE_VALUE) {
+        this->file_handle_ = nullptr;
+        spdlog::throw_spdlog_ex("mmap file sink: failed to open " + filename);
+    }
+    try {
+        this->map_(MMAP_CHUNK_SIZE);
+    } catch (const spdlog::spdlog_ex &) {
+        CloseHandle(this->file_handle_);
+        throw;
+    }
+}
+
+mmap_file_sink::~mmap_file_sink() {
+    this->unmap_();
+    if (this->file_handle_ != nullptr) {
+        LARGE_INTEGER pos;
+        pos.QuadPart = static_cast<LONGLONG>(this->size_);
+        if (!SetFilePointerEx(this->file_handle_, pos, nullptr, FILE_BEGIN) || !SetEndOfFile(this->file_handle_)) {
+            fprintf(stderr, "error! mmap file sink: failed to truncate %s\n", this->filename_.c_str());
+        }
+        CloseHandle(this->file_handle_);
+    }
+}
+
+void mmap_file_sink::map_(const size_t map_size) {
+    this->unmap_();
+    // a mapping larger than the file extends it
+    this->map_handle_ =
+        CreateFileMappingA(this->file_handle_, nullptr, PAGE_READWRITE, static_cast<DWORD>(map_size >> 32),
+                           static_cast<DWORD>(map_size & 0xffffffff), nullptr);
+    if (this->map_handle_ == nullptr) {
+        spdlog::throw_spdlog_ex("mmap file sink: failed to grow " + this->filename_);
+    }
+    this->addr_ = static_cast<char *>(MapViewOfFile(this->map_handle_, FILE_MAP_ALL_ACCESS, 0, 0, map_size));
+    if (this->addr_ == nullptr) {
+        CloseHandle(this->map_handle_);
+        this->map_handle_ = nullptr;
+        spdlog::throw_spdlog_ex("mmap file sink: failed to map " + this->filename_);
+    }
+    this->map_size_ = map_size;
+}
+
+void mmap_file_sink::unmap_() {
+    if (this->addr_ != nullptr) {
+        UnmapViewOfFile(this->addr_);
+        this->addr_ = nullptr;
+    }
+    if (this->map_handle_ != nullptr) {
+        CloseHandle(this->map_handle_);
+        this->map_handle_ = nullptr;
+    }
+    this->map_size_ = 0;
+}
+#else
+mmap_file_sink::mmap_file_sink(const std::string &filename) : filename_{filename} {
+    spdlog::details::os::create_dir(spdlog::details::os::dir_name(filename));
+    this->fd_ = open(filename.c_str(), O_RDWR | O_CREAT | O_TRUNC | O_CLOEXEC, 0644);
+    if (this->fd_ < 0) {
+        spdlog::throw_spdlog_ex("mmap file sink: failed to open " + filename, errno);
+    }
+    try {
+        this->map_(MMAP_CHUNK_SIZE);
+    } catch (const spdlog::spdlog_ex &) {
+        close(this->fd_);
+        throw;
+    }
+}
+
+mmap_file_sink::~mmap_file_sink() {
+    this->unmap_();
+    if (this->fd_ >= 0) {
+        if (ftruncate(this->fd_, static_cast<off_t>(this->size_)) != 0) {
+            fprintf(stderr, "error! mmap file sink: failed to truncate %s\n", this->filename_.c_str());
+        }
+        close(this->fd_);
+    }
+}
+
+void mmap_file_sink::map_(const size_t map_size) {
+#if defined(__linux__)
+    // blocks are reserved: a full disk is reported here, not as SIGBUS on a later copy
+    const int err = posix_fallocate(this->fd_, 0, static_cast<off_t>(map_size));
+    if (err != 0) {
+        spdlog::throw_spdlog_ex("mmap file sink: failed to grow " + this->filename_, err);
+    }
+    void *addr = (this->addr_ == nullptr) ? mmap(nullptr, map_size, PROT_READ | PROT_WRITE, MAP_SHARED, this->fd_, 0)
+                                          : mremap(this->addr_, this->map_size_, map_size, MREMAP_MAYMOVE);
+#else
+    if (ftruncate(this->fd_, static_cast<off_t>(map_size)) != 0) {
+        spdlog::throw_spdlog_ex("mmap file sink: failed to grow " + this->filename_, errno);
+    }
+    this->unmap_();
+    void *addr = mmap(nullptr, map_size, PROT_READ | PROT_WRITE, MAP_SHARED, this->fd_, 0);
+#endif
+    if (addr == MAP_FAILED) {
+        spdlog::throw_spdlog_ex("mmap file sink: failed to map " + this->filename_, errno);
+    }
+#ifdef MADV_POPULATE_WRITE
+    // fault the new chunk in writable at once, not a page fault per page while appending; best effort
+    madvise(static_cast<char *>(addr) + this->map_size_, map_size - this->map_size_, MADV_POPULATE_WRITE);
+#endif
+    this->addr_ = static_cast<char *>(addr);
+    this->map_size_ = map_size;
+}
+
+void mmap_file_sink::unmap_() {
+    if (this->addr_ != nullptr) {
+        munmap(this->addr_, this->map_size_);
+        this->addr_ = nullptr;
+    }
+    this->map_size_ = 0;
+}
+#endif
+
+void mmap_file_sink::sink_it_(const spdlog::details::log_msg &msg) {
+    this->formatted_.clear();
+    this->formatter_->format(msg, this->formatted_);
+    const size_t len = std::size(this->formatted_);
+    if (this->size_ + len > this->map_size_) {
+        this->map_(round_up_chunk(std::max(this->size_ + len, this->map_size_ + MMAP_CHUNK_SIZE)));
+    }
+    std::memcpy(this->addr_ + this->size_, this->formatted_.data(), len);
+    this->size_ += len;
+}
+// endregion === mmap file <<<
+
+// region ====== ring >>>
+namespace {
+// source_loc strings are literals or interned, kept as pointers
+struct ring_slot_header_t {
+    spdlog::log_clock::time_point time;
+    size_t thread_id;
+    const char *filename;
+    const char *funcname;
+    int line;
+    spdlog::level::level_enum level;
+    uint16_t name_len;
+    uint16_t payload_len;
+    // followed by name & payload
+};
+
+constexpr size_t RING_SLOT_ROOM = RING_SLOT_SIZE - sizeof(ring_slot_header_t);
+static_assert(RING_SLOT_SIZE > sizeof(ring_slot_header_t) && RING_SLOT_ROOM <= UINT16_MAX);
+} // namespace
+
+ring_sink::ring_sink(const ring_param_t &param) : param_{param} {
+    this->param_.size = std::max<size_t>(this->param_.size, 1);
+    this->slots_.resize(this->param_.size * RING_SLOT_SIZE);
+}
+
+void ring_sink::sink_it_(const spdlog::details::log_msg &msg) {
+    // the oldest record gives way once the ring is full
+    size_t slot_id = this->head_ + this->count_;
+    if (this->count_ < this->param_.size) {
+        this->count_ += 1;
+    } else {
+        this->head_ = (this->head_ + 1) % this->param_.size;
+    }
+    char *slot = this->slots_.data() + (slot_id % this->param_.size) * RING_SLOT_SIZE;
+
+    std::string_view name{msg.logger_name.data(), msg.logger_name.size()};
+    std::string_view payload{msg.payload.data(), msg.payload.size()};
+    name = name.substr(0, RING_SLOT_ROOM);
+    if (std::size(name) + std::size(payload) > RING_SLOT_ROOM) {
+        if (lazy::check_packed(msg.payload)) {
+            // a cut packed payload can not be rendered
+            this->rendered_.clear();
+            lazy::render(msg.payload, this->rendered_);
+            payload = {this->rendered_.data(), this->rendered_.size()};
+        }
+        payload = payload.substr(0, RING_SLOT_ROOM - std::size(name));
+    }
+
+    const ring_slot_header_t header{msg.time,
+                                    msg.thread_id,
+                                    msg.source.filename,
+                                    msg.source.funcname,
+                                    msg.source.line,
+                                    msg.level,
+                                    static_cast<uint16_t>(std::size(name)),
+                                    static_cast<uint16_t>(std::size(payload))};
+    std::memcpy(slot, &header, sizeof(header));
+    std::memcpy(slot + sizeof(header), name.data(), std::size(name));
+    std::memcpy(slot + sizeof(header) + std::size(name), payload.data(), std::size(payload));
+
+    if (msg.level >= this->param_.dump_level && this->param_.dump_level != spdlog::level::off) {
+        this->dump_();
+    }
+}
+
+size_t ring_sink::dump() {
+    std::scoped_lock lock(this->mutex_);
+    return this->dump_();
+}
+
+size_t ring_sink::dump_() {
+    if (this->count_ == 0) {
+        return 0;
+    }
+    spdlog::details::file_helper file_helper;
+    file_helper.open(this->param_.filename, false);
+
+    spdlog::memory_buf_t out;
+    fmt::format_to(std::back_inserter(out), "==== ring dump: {} records ====\n", this->count_);
+    // records of all loggers: the formatter looks each logger up by name
+    const size_t sink_logger_id_prev = std::exchange(sink_logger_id, NO_LOGGER_ID);
+    for (size_t i = 0; i < this->count_; ++i) {
+        const char *slot = this->slots_.data() + ((this->head_ + i) % this->param_.size) * RING_SLOT_SIZE;
+        ring_slot_header_t header;
+        std::memcpy(&header, slot, sizeof(header));
+        const char *name = slot + sizeof(header);
+        spdlog::details::log_msg msg{header.time, spdlog::source_loc{header.filename, header.line, header.funcname},
+                                     spdlog::string_view_t{name, header.name_len}, header.level,
+                                     spdlog::string_view_t{name + header.name_len, header.payload_len}};
+        msg.thread_id = header.thread_id;
+        this->formatter_->format(msg, out);
+    }
+    sink_logger_id = sink_logger_id_prev;
+    file_helper.write(out);
+
+    const size_t res = this->count_;
+    this->head_ = 0;
+    this->count_ = 0;
+    return res;
+}
+// endregion === ring <<<
+
+} // namespace libtcomplex::log
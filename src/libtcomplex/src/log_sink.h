@@ -0,0 +1,178 @@
+#ifndef LIBTCOMPLEX_LOG_SINK_H
+#define LIBTCOMPLEX_LOG_SINK_H
+
+#include <cstddef>
+#include <cstdint>
+#include <mutex>
+#include <string>
+#include <string_view>
+#include <vector>
+
+#include <spdlog/common.h>
+#include <spdlog/details/file_helper.h>
+#include <spdlog/sinks/base_sink.h>
+
+#include <tsl/robin_map.h>
+
+#include <libtcomplex/log_def.h>
+
+#include "log_lazy.h"
+
+// sinks of the logging device, written by the async pool workers
+namespace libtcomplex::log {
+
+// region ====== rotating file >>>
+// fixed slots: file.log -> file.log.01 -> ... -> file.log.NN, the oldest removed
+std::string rotated_filename(const std::string &filename, const size_t rotate_id);
+void rotate_file(const std::string &filename, const size_t max_rotate);
+
+struct rotate_param_t {
+    size_t max_size;   // bytes, 0: no size based rotation
+    double interval;   // seconds, 0: no timed rotation
+    size_t max_rotate; // rotated files kept, at most FILE_MAX_ROTATE
+
+    bool operator==(const rotate_param_t &other) const = default;
+};
+
+// rotates on the worker thread writing the record, producers only enqueue and never wait on the file
+// the file left by a previous run is rotated on open, timed rotation is aligned to multiples of interval (utc)
+class rotating_file_sink final : public spdlog::sinks::base_sink<std::mutex> {
+public:
+    rotating_file_sink(const std::string &filename, const rotate_param_t &param);
+
+protected:
+    void sink_it_(const spdlog::details::log_msg &msg) override;
+    void flush_() override;
+
+private:
+    bool should_rotate_(const spdlog::log_clock::time_point tp, const size_t len) const;
+    void rotate_(const spdlog::log_clock::time_point tp);
+    spdlog::log_clock::time_point next_rotate_tp_(const spdlog::log_clock::time_point tp) const;
+
+    std::string filename_;
+    rotate_param_t param_;
+    spdlog::details::file_helper file_helper_;
+    bool opened_{false};
+    size_t current_size_{0};
+    spdlog::log_clock::time_point rotate_tp_;
+};
+// endregion === rotating file <<<
+
+// region ====== binary file >>>
+// file: magic, version byte, then entries; integers are LEB128 varints, signed ones zigzag encoded
+//   str entry:  kind, len, bytes; takes the next dictionary id, counting from 0
+//   text entry: kind, time delta ns (signed, to the previous record), level, logger id, filename id, funcname id,
+//               lineno, thread id, len, message bytes
+//   lazy entry: as text entry up to thread id, then template id, arg count, args as tag byte & value
+//               ('i': signed varint, 'f': 8 byte little endian double, 's': len, bytes)
+// decoded by util.upkeep.log_decode
+constexpr std::string_view BINARY_MAGIC{"TCLBIN", 6};
+constexpr uint8_t BINARY_VERSION = 1;
+constexpr uint8_t BINARY_ENTRY_STR = 0;
+constexpr uint8_t BINARY_ENTRY_TEXT = 1;
+constexpr uint8_t BINARY_ENTRY_LAZY = 2;
+// strings remembered by the writer, beyond that a str entry is repeated on use
+constexpr size_t BINARY_DICT_MAX = 65536;
+
+// no formatter involved: call sites, logger names & lazy templates are interned, lazy args stored as is
+class binary_file_sink final : public spdlog::sinks::base_sink<std::mutex> {
+public:
+    explicit binary_file_sink(const std::string &filename);
+
+protected:
+    void sink_it_(const spdlog::details::log_msg &msg) override;
+    void flush_() override;
+
+private:
+    // id of str, a str entry is appended to dest if it is new
+    uint64_t intern_(spdlog::memory_buf_t &dest, const std::string_view str);
+    // source_loc strings are literals or interned, so their address identifies them
+    uint64_t intern_source_(spdlog::memory_buf_t &dest, const char *str);
+
+    using dict_map = tsl::robin_map<std::string, uint64_t, std::hash<std::string_view>, std::equal_to<>>;
+    using source_dict_map = tsl::robin_map<const char *, uint64_t>;
+
+    spdlog::details::file_helper file_helper_;
+    dict_map dict_;
+    source_dict_map source_dict_;
+    spdlog::memory_buf_t out_; // scratch, reused across records
+    spdlog::memory_buf_t rec_;
+    std::vector<lazy::arg_view_t> args_;
+    uint64_t dict_next_{0};
+    int64_t time_prev_ns_{0};
+};
+// endregion === binary file <<<
+
+// region ====== mmap file >>>
+// the file grows by this much, at least
+constexpr size_t MMAP_CHUNK_SIZE = size_t{16} << 20;
+
+// text as the basic file sink, appended by a copy into a mapping of the file: the file is preallocated in chunks, so
+// there is no syscall per record or flush, and truncated to the written size on close. a reader sees the records at
+// once; until close, or after a crash, the file is zero filled behind the last record
+class mmap_file_sink final : public spdlog::sinks::base_sink<std::mutex> {
+public:
+    explicit mmap_file_sink(const std::string &filename);
+    ~mmap_file_sink() override;
+
+    mmap_file_sink(const mmap_file_sink &other) = delete;
+    mmap_file_sink &operator=(const mmap_file_sink &other) = delete;
+
+protected:
+    void sink_it_(const spdlog::details::log_msg &msg) override;
+    void flush_() override {} // the mapping is the page cache, as after fflush of the basic file sink
+
+private:
+    void map_(const size_t map_size); // (re)map the file, grown to map_size bytes
+    void unmap_();
+
+    std::string filename_;
+#ifdef _WIN32
+    void *file_handle_{nullptr};
+    void *map_handle_{nullptr};
+#else
+    int fd_{-1};
+#endif
+    char *addr_{nullptr};
+    size_t map_size_{0};
+    size_t size_{0};                 // written bytes
+    spdlog::memory_buf_t formatted_; // scratch, reused across records
+};
+// endregion === mmap file <<<
+
+// region ====== ring >>>
+struct ring_param_t {
+    size_t size;          // records kept
+    std::string filename; // dumps are appended to it
+    spdlog::level::level_enum dump_level;
+
+    bool operator==(const ring_param_t &other) const = default;
+};
+
+// flight recorder: the last size records, each copied as is into a slot of RING_SLOT_SIZE bytes (message cut to fit,
+// a cut lazy message is rendered first); formatted only when dumped, on a record at or above dump_level or on dump().
+// a dump empties the ring
+class ring_sink final : public spdlog::sinks::base_sink<std::mutex> {
+public:
+    explicit ring_sink(const ring_param_t &param);
+
+    size_t dump(); // records written
+
+protected:
+    void sink_it_(const spdlog::details::log_msg &msg) override;
+    void flush_() override {}
+
+private:
+    size_t dump_(); // with lock held
+
+    ring_param_t param_;
+    std::vector<char> slots_;
+    size_t head_{0}; // oldest record
+    size_t count_{0};
+    spdlog::memory_buf_t rendered_; // scratch, reused across records
+};
+// endregion === ring <<<
+
+} // namespace libtcomplex::log
+
+#endif
@@ -5,11 +5,18 @@ from .type_def import (
     OptEntryCommandlineMapPattern,
     OptEntryCommandlineBoolPattern,
 )
-from .callback import OptEntryCallback
+from .callback import OptEntryCallback, OptCallbackCycleError
 from .reg import OptRegistry
+from .watch import OptConfigWatcher
+from .view import FrozenMapping, FrozenSequence, CowMapping, CowSequence
 
 __all__ = [
     "OptRegistry",
+    "OptConfigWatcher",
+    "FrozenMapping",
+    "FrozenSequence",
+    "CowMapping",
+    "CowSequence",
     "OptEntrySource",
     "OptEntryCommandlinePattern",
     "OptEntryCommandlineSeqPattern",
@@ -17,4 +24,5 @@ __all__ = [
     "OptEntryCommandlineBoolPattern",
     "OptEntryValueUnspecified",
     "OptEntryCallback",
+    "OptCallbackCycleError",
 ]
@@ -11,53 +11,62 @@ class OptEntryCallback:
         return OptEntryValueUnspecified
 
 
-def resolve_callback_dependency(callback_map: typing.Mapping[str, OptEntryCallback]):
-    # obtain adj list
-    all_keys = set(callback_map.keys())
-    adj_list = {}
+class OptCallbackCycleError(RuntimeError):
+    def __init__(self, cycle: list[str]):
+        super().__init__(f"circular dependency when solving callback order! cycle: {' -> '.join(cycle + cycle[:1])}")
+        self.cycle = cycle
+
+
+def resolve_callback_wave(callback_map: typing.Mapping[str, OptEntryCallback]) -> list[list[str]]:
+    """Kahn's algorithm by waves: a wave depends on earlier waves only, its callbacks may run concurrently
+
+    dependencies out of callback_map are ignored. raise OptCallbackCycleError on a cycle
+    """
+    # obtain adj list: key -> callbacks depending on it
+    indeg = {}
+    dependent: dict[str, list[str]] = {}
     for k, v in callback_map.items():
-        dlist = []
-        for d in v.dependency:
-            if d in all_keys:
-                dlist.append(d)
-        adj_list[k] = dlist
-
-    # get proc requirement
-    proc_dep_list = adj_list.copy()
-    proc_clear_list: dict[str, list[str]] = {}
-    for k, dlist in proc_dep_list.items():
-        for vv in dlist:
-            if vv not in proc_clear_list:
-                proc_clear_list[vv] = []
-            proc_clear_list[vv].append(k)
-
-    # toposort
+        dset = {d for d in v.dependency if d in callback_map}
+        indeg[k] = len(dset)
+        for d in dset:
+            dependent.setdefault(d, []).append(k)
+
+    # toposort, in registration order within a wave
+    position = {k: i for i, k in enumerate(indeg)}
     res = []
-    while True:
-        if len(proc_dep_list) == 0:
-            break
-
-        # iterate over proc_dep_list to find whether have a 0
-        k_curr = next(iter(proc_dep_list.keys()))
-        indeg_curr = len(proc_dep_list[k_curr])
-        for _k in proc_dep_list:
-            _indeg = len(proc_dep_list[_k])
-            if _indeg < indeg_curr:
-                k_curr = _k
-                indeg_curr = _indeg
-                if indeg_curr == 0:
-                    break
-
-        if indeg_curr > 0:
-            return None
-
-        res.append(k_curr)
-
-        if k_curr in proc_clear_list:
-            clear_list = proc_clear_list[k_curr]
-            for k_node in clear_list:
-                proc_dep_list[k_node].remove(k_curr)
-            proc_clear_list.pop(k_curr)
-
-        proc_dep_list.pop(k_curr)
+    wave = [k for k, n in indeg.items() if n == 0]
+    num_done = 0
+    while len(wave) > 0:
+        res.append(wave)
+        num_done += len(wave)
+        next_wave = []
+        for k in wave:
+            for k_node in dependent.get(k, []):
+                indeg[k_node] -= 1
+                if indeg[k_node] == 0:
+                    next_wave.append(k_node)
+        wave = sorted(next_wave, key=position.__getitem__)
+
+    if num_done < len(indeg):
+        raise OptCallbackCycleError(find_callback_cycle(callback_map, {k for k, n in indeg.items() if n > 0}))
     return res
+
+
+def find_callback_cycle(callback_map: typing.Mapping[str, OptEntryCallback], left: set[str]) -> list[str]:
+    # left: callbacks never ready, each depends on another one of left; follow dependencies until a key repeats
+    k = min(left)
+    path = []
+    pos = {}
+    while k not in pos:
+        pos[k] = len(path)
+        path.append(k)
+        k = next(d for d in callback_map[k].dependency if d in left)
+    return path[pos[k] :]
+
+
+def resolve_callback_dependency(callback_map: typing.Mapping[str, OptEntryCallback]):
+    # run order, None on a cycle
+    try:
+        return [k for wave in resolve_callback_wave(callback_map) for k in wave]
+    except OptCallbackCycleError:
+        return None
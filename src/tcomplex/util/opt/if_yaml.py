@@ -1,7 +1,119 @@
+import atexit
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 import yaml
 
+# libyaml if yaml is built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# parsed blob cache: one pickle per config path, valid while size, mtime & content hash match
+YAML_CACHE_VERSION = 1
+# worker processes pay off for large file sets only, smaller ones load serially
+YAML_POOL_MIN_BYTES = 1 << 20
+_pool = None  # kept across calls, for the pid that made it
+_pool_key = None  # (pid, workers)
+_pool_lock = threading.Lock()
+
+
+def _cache_filename(cache_dir, filename):
+    path_hash = hashlib.blake2b(os.path.abspath(filename).encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, f"{path_hash}.pickle")
+
+
+def _read_cache(cache_filename, key):
+    try:
+        with open(cache_filename, "rb") as f:
+            cache_key, blob = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        return False, None
+    if cache_key != key:
+        return False, None
+    return True, blob
+
+
+def _write_cache(cache_dir, cache_filename, key, blob):
+    # written aside then renamed, a reader never sees a partial entry
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_filename = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((key, blob), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, cache_filename)
+    except (OSError, pickle.PicklingError):
+        pass  # no cache, the blob is still good
+
+
+def load_yaml(filename, cache_dir=None):
+    """Parsed yaml file; with cache_dir, a hit skips parsing
+
+    cache entries are pickles, cache_dir must only be writable by trusted users
+    """
+    if cache_dir is None:
+        with open(filename, "rb") as f:
+            return yaml.load(f, Loader=SafeLoader)
+
+    with open(filename, "rb") as f:
+        stat = os.fstat(f.fileno())
+        data = f.read()
+    key = (
+        YAML_CACHE_VERSION,
+        os.path.abspath(filename),
+        stat.st_size,
+        stat.st_mtime_ns,
+        hashlib.blake2b(data, digest_size=32).digest(),
+    )
+    cache_filename = _cache_filename(cache_dir, filename)
+    hit, blob = _read_cache(cache_filename, key)
+    if not hit:
+        blob = yaml.load(data, Loader=SafeLoader)
+        _write_cache(cache_dir, cache_filename, key, blob)
+    return blob
+
+
+def _get_pool(num_worker):
+    global _pool, _pool_key
+    with _pool_lock:
+        # a pool of the parent process does not work after fork
+        if _pool_key != (os.getpid(), num_worker):
+            if _pool is not None and _pool_key[0] == os.getpid():
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(max_workers=num_worker)
+            _pool_key = (os.getpid(), num_worker)
+        return _pool
+
+
+def _shutdown_pool():
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None and _pool_key[0] == os.getpid():
+            _pool.shutdown()
+        _pool, _pool_key = None, None
+
+
+atexit.register(_shutdown_pool)
+
+
+def _total_size(filename_list):
+    try:
+        return sum(os.path.getsize(filename) for filename in filename_list)
+    except OSError:
+        return 0  # loaded serially, the error is raised there
+
 
-def load_yaml(filename):
-    with open(filename, "r") as f:
-        res = yaml.safe_load(f)
-    return res
+def load_yaml_list(filename_list, cache_dir=None, max_workers=1):
+    """load_yaml of each file, in order; with max_workers > 1, several files holding YAML_POOL_MIN_BYTES or more
+    are loaded by a process pool, kept for later calls"""
+    if max_workers is None or max_workers > 1:
+        num_worker = min(len(filename_list), max_workers or os.cpu_count() or 1)
+        if num_worker > 1 and _total_size(filename_list) >= YAML_POOL_MIN_BYTES:
+            executor = _get_pool(num_worker)
+            return list(executor.map(load_yaml, filename_list, [cache_dir] * len(filename_list)))
+    return [load_yaml(filename, cache_dir) for filename in filename_list]
@@ -1,8 +1,12 @@
 import os
 import argparse
+import logging
+import threading
+from collections.abc import Mapping
 from typing import Optional, Union, Any
-from typing import Sequence
-from dataclasses import dataclass
+from typing import Sequence, Callable
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 
 from .type_def import OptEntrySource, OptEntryValueUnspecified, analyze_type, cast_to_res
 from .type_def import (
@@ -14,12 +18,16 @@ from .type_def import supported_by_commandline, proclist_pattern_paired
 from .type_def import handle_cmd_seq, handle_cmd_map
 from .type_def import hook_cmd_bool, handle_cmd_bool
 
-from .callback import OptEntryCallback, resolve_callback_dependency
+from .callback import OptEntryCallback, resolve_callback_wave
 
-from .if_yaml import load_yaml
+from .if_yaml import load_yaml_list
+from .watch import OptConfigWatcher
+from .view import freeze_value, CowMapping, CowSequence
 
 from copy import deepcopy
 
+_logger = logging.getLogger(__name__)
+
 
 @dataclass
 class OptEntryAttr:
@@ -31,6 +39,118 @@ class OptEntryAttr:
     callback: Optional[OptEntryCallback]
 
 
+@dataclass
+class OptPlanEntry:
+    key: str
+    key_path: tuple[str, ...]
+    meta: OptEntryAttr
+    proclist: Any
+
+
+# defaults of these types are shared by parsed configs, others are deep copied
+OPT_IMMUTABLE_DEFAULT_TYPE = (type(None), bool, int, float, complex, str, bytes, type)
+
+
+@dataclass
+class OptDefaultNode:
+    template: dict[str, Any]  # immutable defaults as is, in registration order
+    child: dict[str, "OptDefaultNode"]
+    mutable: list[str]
+
+
+def build_default_node(meta_info_tree):
+    node = OptDefaultNode(template={}, child={}, mutable=[])
+    for key, sub_tree in meta_info_tree.items():
+        if isinstance(sub_tree, OptEntryAttr):
+            node.template[key] = sub_tree.default
+            if type(sub_tree.default) not in OPT_IMMUTABLE_DEFAULT_TYPE:
+                node.mutable.append(key)
+        else:
+            node.template[key] = None
+            node.child[key] = build_default_node(sub_tree)
+    return node
+
+
+def copy_default_node(node):
+    res = dict(node.template)
+    for key in node.mutable:
+        res[key] = deepcopy(res[key])
+    for key, child in node.child.items():
+        res[key] = copy_default_node(child)
+    return res
+
+
+@dataclass
+class OptParsePlan:
+    default: OptDefaultNode = field(default_factory=lambda: OptDefaultNode(template={}, child={}, mutable=[]))
+    # config entries as a tree of key parts, so a config file is walked along the keys it holds
+    config_tree: dict[str, Any] = field(default_factory=dict)
+    cmdline: list[OptPlanEntry] = field(default_factory=list)
+    callback: dict[str, OptPlanEntry] = field(default_factory=dict)
+    key_path: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    required: list[OptPlanEntry] = field(default_factory=list)  # no default
+    # key -> callback keys depending on it
+    callback_dependent: dict[str, list[str]] = field(default_factory=dict)
+
+
+def build_parse_plan(meta_info, meta_info_tree, category_proclist_cache):
+    plan = OptParsePlan(default=build_default_node(meta_info_tree))
+    for entry_key, entry_meta in meta_info.items():
+        entry = OptPlanEntry(
+            key=entry_key,
+            key_path=tuple(entry_key.split(".")),
+            meta=entry_meta,
+            proclist=category_proclist_cache[entry_meta.category],
+        )
+        if entry_meta.source in (OptEntrySource.CONFIG_ONLY, OptEntrySource.COMMANDLINE_OVER_CONFIG):
+            _handle = plan.config_tree
+            for key_part in entry.key_path[:-1]:
+                _handle = _handle.setdefault(key_part, {})
+            _handle[entry.key_path[-1]] = entry
+        if entry_meta.source in (OptEntrySource.COMMANDLINE_ONLY, OptEntrySource.COMMANDLINE_OVER_CONFIG):
+            plan.cmdline.append(entry)
+        if entry_meta.callback is not None:
+            plan.callback[entry_key] = entry
+            for dep_key in entry_meta.callback.dependency:
+                plan.callback_dependent.setdefault(dep_key, []).append(entry_key)
+        if entry_meta.default == OptEntryValueUnspecified:
+            plan.required.append(entry)
+        plan.key_path[entry_key] = entry.key_path
+    return plan
+
+
+def iter_config_entry(config_tree, config_blob):
+    # (entry, raw value) of the config entries present in config_blob
+    if not isinstance(config_blob, Mapping):
+        return
+    for key_part, raw_res in config_blob.items():
+        node = config_tree.get(key_part)
+        if node is None:
+            continue
+        if isinstance(node, OptPlanEntry):
+            yield node, raw_res
+        else:
+            yield from iter_config_entry(node, raw_res)
+
+
+@dataclass
+class OptParseState:
+    # inputs of the last parse, kept for reload
+    file_list: list[str]
+    layer_list: list[dict[str, Any]]  # per config file: key -> cast value
+    cmdline: dict[str, Any]  # key -> cast value
+
+
+def resolve_base_value(entry, state):
+    # value before callbacks: command line over the last config file setting the key over the default
+    if entry.key in state.cmdline:
+        return state.cmdline[entry.key]
+    for layer in reversed(state.layer_list):
+        if entry.key in layer:
+            return layer[entry.key]
+    return deepcopy(entry.meta.default)
+
+
 def prepare_default_config(meta_info_tree):
     def _prepare_default_config(_meta_info_tree):
         if isinstance(_meta_info_tree, OptEntryAttr):
@@ -69,12 +189,29 @@ def check_opt_integrity(meta_info_tree, config_tree, prefix=None):
 
 
 class OptRegistry:
-    def __init__(self, prog: str = "prog"):
+    def __init__(
+        self,
+        prog: str = "prog",
+        cache_dir: Optional[str] = None,
+        load_workers: Optional[int] = 1,
+        callback_workers: int = 1,
+    ):
         self.prog = prog
+        # config files: parsed blobs cached in cache_dir if set, loaded by a process pool if load_workers > 1 (None:
+        # a worker per cpu)
+        self.cache_dir = cache_dir
+        self.load_workers = load_workers
+        # callbacks of a wave (independent of each other) run by a thread pool if callback_workers > 1
+        self.callback_workers = callback_workers
 
         self.supported_seq_type: list[type] = [list, tuple]
         self.supported_map_type: list[type] = [dict]
 
+        # subscribers of reload: (prefix, fn), kept across reset
+        self._subscriber: list[tuple[Optional[str], Callable[[dict[str, Any]], None]]] = []
+        self._lock = threading.RLock()  # config & parse state, between parse, reload & select
+        self._reload_lock = threading.Lock()
+
         self.reset()
 
     def reset(self):
@@ -82,12 +219,14 @@ class OptRegistry:
         self.meta_info: dict[str, OptEntryAttr] = {}
         self.meta_info_tree: dict[str, Any] = {}
         self.category_proclist_cache: dict[Union[type, Any], Any] = {}
+        self._parse_plan: Optional[OptParsePlan] = None
 
         # bind: store
         self.bind_config_list: list[str] = []
 
         # config: store parse res
         self.config = {}
+        self._parse_state: Optional[OptParseState] = None
 
     def reg_seq_type(self, newtype: type):
         assert isinstance(newtype, type)
@@ -163,6 +302,13 @@ class OptRegistry:
                     _handle[key_part] = {}
                     _handle = _handle[key_part]
         self.meta_info[internal_key] = attr_tuple
+        self._parse_plan = None
+
+    def parse_plan(self) -> OptParsePlan:
+        # built on first use after a registration
+        if self._parse_plan is None:
+            self._parse_plan = build_parse_plan(self.meta_info, self.meta_info_tree, self.category_proclist_cache)
+        return self._parse_plan
 
     def bind_default_option(self, cfg: Union[str, Sequence[str]]):
         if isinstance(cfg, Sequence):
@@ -194,22 +340,18 @@ class OptRegistry:
             return
 
         # hook arg
-        entry_cmdline = (
-            entry_key
-            for entry_key, entry_meta in self.meta_info.items()
-            if entry_meta.source in (OptEntrySource.COMMANDLINE_ONLY, OptEntrySource.COMMANDLINE_OVER_CONFIG)
-        )
-        for entry_key in entry_cmdline:
-            entry_meta = self.meta_info[entry_key]
-            if entry_meta.category == bool:
-                hook_cmd_bool(parser, entry_key, entry_meta.cmdpattern, entry_meta)
+        for entry in self.parse_plan().cmdline:
+            if entry.meta.category == bool:
+                hook_cmd_bool(parser, entry.key, entry.meta.cmdpattern, entry.meta)
             else:
-                parser.add_argument(f"--{entry_key}", help=entry_meta.desc)
+                parser.add_argument(f"--{entry.key}", help=entry.meta.desc)
 
     def parse(self, parser: Optional[argparse.ArgumentParser] = None, arg_src=None, cfg_override=None):
+        plan = self.parse_plan()
+
         # get a copy of default arg
         # required arg is leave to sentry
-        _config = prepare_default_config(self.meta_info_tree)
+        _config = copy_default_node(plan.default)
 
         if parser is None:
             parse_res = None
@@ -222,43 +364,31 @@ class OptRegistry:
                 self.bind_config_list.extend(cfg_list)
 
         # process cfg
-        entry_config = (
-            entry_key
-            for entry_key, entry_meta in self.meta_info.items()
-            if entry_meta.source in (OptEntrySource.CONFIG_ONLY, OptEntrySource.COMMANDLINE_OVER_CONFIG)
-        )
         for config_filepath in self.bind_config_list:
             config_ext = os.path.splitext(config_filepath)[1]
-            if config_ext in [".yml", ".yaml"]:
-                config_blob = load_yaml(config_filepath)
-            else:
+            if config_ext not in [".yml", ".yaml"]:
                 raise RuntimeError(f"unsupported config type! got {repr(config_ext)}")
-
-            for entry_key in entry_config:
-                entry_meta = self.meta_info[entry_key]
-                index_status, raw_res = index_key(config_blob, entry_key)
-                if index_status:
-                    cast_res = cast_to_res(raw_res, self.category_proclist_cache[entry_meta.category])
-                    set_value(_config, entry_key, cast_res)
+        config_file_list = list(self.bind_config_list)
+        config_blob_list = load_yaml_list(config_file_list, self.cache_dir, self.load_workers)
+        config_layer_list = [self._cast_config(plan, config_blob) for config_blob in config_blob_list]
+        for config_layer in config_layer_list:
+            for entry_key, cast_res in config_layer.items():
+                set_value_path(_config, plan.key_path[entry_key], cast_res)
 
         # process command line
+        cmdline_value = {}
         if parse_res is None:
             pass
         else:
             # override with arg
-            entry_cmdline = (
-                entry_key
-                for entry_key, entry_meta in self.meta_info.items()
-                if entry_meta.source in (OptEntrySource.COMMANDLINE_ONLY, OptEntrySource.COMMANDLINE_OVER_CONFIG)
-            )
-            for entry_key in entry_cmdline:
-                entry_meta = self.meta_info[entry_key]
+            for entry in plan.cmdline:
+                entry_meta = entry.meta
                 if entry_meta.category == bool:
-                    raw_res = handle_cmd_bool(parse_res, entry_key, entry_meta.cmdpattern)
+                    raw_res = handle_cmd_bool(parse_res, entry.key, entry_meta.cmdpattern)
                     if raw_res == OptEntryValueUnspecified:
                         continue
                 else:
-                    raw_res = getattr(parse_res, entry_key)
+                    raw_res = getattr(parse_res, entry.key)
                     if raw_res is None:
                         continue
                     # handle raw_res
@@ -266,68 +396,285 @@ class OptRegistry:
                         raw_res = handle_cmd_seq(raw_res, entry_meta.cmdpattern)
                     elif isinstance(entry_meta.cmdpattern, OptEntryCommandlineMapPattern):
                         raw_res = handle_cmd_map(raw_res, entry_meta.cmdpattern)
-                cast_res = cast_to_res(raw_res, self.category_proclist_cache[entry_meta.category])
-                set_value(_config, entry_key, cast_res)
+                cmdline_value[entry.key] = cast_to_res(raw_res, entry.proclist)
+                set_value_path(_config, entry.key_path, cmdline_value[entry.key])
 
         # TODO: process override
         pass
 
         # * experimental: resolve callback dependency
         entry_callback_map = {}
-        for entry_key, entry_meta in self.meta_info.items():
-            if entry_meta.callback is not None and (
-                entry_meta.callback.always or index_key(_config, entry_key)[1] == OptEntryValueUnspecified
-            ):
-                entry_callback_map[entry_key] = entry_meta.callback
-        callback_run_order = resolve_callback_dependency(entry_callback_map)
-        if callback_run_order is None:
-            raise RuntimeError("circular dependency when solving callback order!")
+        for entry in plan.callback.values():
+            if entry.meta.callback.always or index_path(_config, entry.key_path)[1] == OptEntryValueUnspecified:
+                entry_callback_map[entry.key] = entry.meta.callback
+        callback_wave_list = resolve_callback_wave(entry_callback_map)
 
         # process callback
-        for entry_key in callback_run_order:
-            entry_callback: OptEntryCallback = self.meta_info[entry_key].callback
-            entry_value = index_key(_config, entry_key)[1]
+        def _run_callback(entry_key):
+            entry = plan.callback[entry_key]
+            entry_callback: OptEntryCallback = entry.meta.callback
+            entry_value = index_path(_config, entry.key_path)[1]
             dep = {}
             for dep_key in entry_callback.dependency:
-                dep[dep_key] = index_key(_config, dep_key)[1]
-            callback_value = entry_callback(entry_key, entry_value, prog=self.prog, dep=dep)
+                dep_path = plan.key_path.get(dep_key) or dep_key.split(".")
+                dep[dep_key] = index_path(_config, dep_path)[1]
+            return entry_callback(entry_key, entry_value, prog=self.prog, dep=dep)
+
+        def _apply_callback(entry_key, callback_value):
             if callback_value != OptEntryValueUnspecified:
-                set_value(_config, entry_key, callback_value)
+                set_value_path(_config, plan.key_path[entry_key], callback_value)
+
+        self._run_callback_wave(callback_wave_list, _run_callback, _apply_callback)
 
         # self.config bind to new config
         # return default arg
-        is_good, lack_key_list = check_opt_integrity(self.meta_info_tree, _config)
-        if not is_good:
+        # only a key without default can be left unspecified
+        lack_key_list = [
+            entry.key for entry in plan.required if index_path(_config, entry.key_path)[1] == OptEntryValueUnspecified
+        ]
+        if len(lack_key_list) > 0:
             raise ValueError(f"unspecified value in config! key: {lack_key_list}")
-        self.config = _config
+        with self._lock:
+            self.config = _config
+            self._parse_state = OptParseState(
+                file_list=config_file_list, layer_list=config_layer_list, cmdline=cmdline_value
+            )
+
+    @staticmethod
+    def _cast_config(plan, config_blob):
+        return {
+            entry.key: cast_to_res(raw_res, entry.proclist)
+            for entry, raw_res in iter_config_entry(plan.config_tree, config_blob)
+        }
+
+    def _run_callback_wave(self, callback_wave_list, run_fn, apply_fn):
+        # run_fn(key) of a wave concurrently if callback_workers > 1, then apply_fn(key, value) in wave order: a wave
+        # reads results of earlier waves only
+        num_worker = min(self.callback_workers, max((len(wave) for wave in callback_wave_list), default=0))
+        if num_worker <= 1:
+            for wave in callback_wave_list:
+                for entry_key in wave:
+                    apply_fn(entry_key, run_fn(entry_key))
+            return
+
+        with ThreadPoolExecutor(max_workers=num_worker, thread_name_prefix="opt-callback") as executor:
+            for wave in callback_wave_list:
+                if len(wave) == 1:
+                    res_list = [run_fn(wave[0])]
+                else:
+                    res_list = list(executor.map(run_fn, wave))
+                for entry_key, res in zip(wave, res_list):
+                    apply_fn(entry_key, res)
 
     # TODO: unified interface for extracing arg from parser & dict
 
-    def select(self, prefix: Optional[str] = None):
-        if prefix is None:
-            return deepcopy(self.config)
+    def select(self, prefix: Optional[str] = None, frozen: bool = False):
+        """config under prefix (all if None): a deep copy, or with frozen a read-only view sharing the config"""
+        index_value = self._index_config(prefix)
+        return freeze_value(index_value) if frozen else deepcopy(index_value)
+
+    def snapshot(self, prefix: Optional[str] = None):
+        """config under prefix (all if None), shared with the config until written; a write copies its path only"""
+        index_value = self._index_config(prefix)
+        if isinstance(index_value, dict):
+            return CowMapping(index_value)
+        if isinstance(index_value, list):
+            return CowSequence(index_value)
+        return index_value
+
+    def _index_config(self, prefix):
+        # a published config is never mutated in place, the value can be read outside of the lock
+        with self._lock:
+            if prefix is None:
+                return self.config
+
+            index_status, index_value = index_key(self.config, prefix)
+            if not index_status:
+                raise KeyError(f"prefix not found! got {prefix}")
+            return index_value
+
+    # reload
+    def subscribe(self, prefix: Optional[str], fn: Callable[[dict[str, Any]], None]):
+        """fn(changed) after a reload changing keys under prefix (all keys if None), changed: key -> new value"""
+        handle = (prefix, fn)
+        with self._lock:
+            self._subscriber.append(handle)
+        return handle
+
+    def unsubscribe(self, handle):
+        with self._lock:
+            if handle in self._subscriber:
+                self._subscriber.remove(handle)
+
+    def watch(self, interval: float = 1.0, debounce: float = 0.1, use_inotify: bool = True):
+        """reload on change of the config files, by a started OptConfigWatcher; stop() it when done"""
+        return OptConfigWatcher(self, interval, debounce, use_inotify).start()
+
+    def config_file_list(self) -> list[str]:
+        # config files of the last parse
+        with self._lock:
+            return [] if self._parse_state is None else list(self._parse_state.file_list)
+
+    def reload(self, filename_list: Optional[Sequence[str]] = None) -> dict[str, Any]:
+        """Re-read config files of the last parse, all if filename_list is None; changed keys -> new value
+
+        only keys set by the re-read files before or after are re-resolved, then the callbacks of changed keys and of
+        their dependents, in dependency order. the command line of the last parse still wins. on error the config is
+        left as is. subscribers are notified of the changed keys under their prefix
+        """
+        # reloads one at a time; files are loaded & resolved outside of self._lock, select is not held up meanwhile
+        with self._reload_lock:
+            while True:
+                with self._lock:
+                    plan = self.parse_plan()
+                    state = self._parse_state
+                    config = self.config
+                if state is None:
+                    raise RuntimeError("reload before parse!")
+                res = self._resolve_reload(plan, state, config, filename_list)
+                if res is None:
+                    return {}
+                new_state, new_config, changed = res
+                with self._lock:
+                    if self._parse_state is not state:
+                        continue  # parsed meanwhile, reload on top of it
+                    self.config = new_config
+                    self._parse_state = new_state
+                    subscriber_list = list(self._subscriber)
+                break
+
+        # outside of the locks, a subscriber may select or reload
+        for prefix, fn in subscriber_list:
+            sub_changed = {
+                entry_key: deepcopy(value)
+                for entry_key, value in changed.items()
+                if prefix is None or entry_key == prefix or entry_key.startswith(prefix + ".")
+            }
+            if len(sub_changed) > 0:
+                try:
+                    fn(sub_changed)
+                except Exception:
+                    _logger.exception(f"config subscriber failed, prefix: {prefix}")
+        return changed
+
+    def _resolve_reload(self, plan, state, config, filename_list):
+        # (new parse state, new config, changed keys -> new value) of a reload on top of state & config, None if no
+        # file of the last parse is in filename_list. config is not mutated
+        if filename_list is None:
+            file_id_list = list(range(len(state.file_list)))
+        else:
+            path_set = {os.path.abspath(filename) for filename in filename_list}
+            file_id_list = [i for i, filename in enumerate(state.file_list) if os.path.abspath(filename) in path_set]
+        if len(file_id_list) == 0:
+            return None
+
+        config_blob_list = load_yaml_list([state.file_list[i] for i in file_id_list], self.cache_dir, self.load_workers)
+        new_layer_list = list(state.layer_list)
+        touched_key = set()
+        for file_id, config_blob in zip(file_id_list, config_blob_list):
+            new_layer = self._cast_config(plan, config_blob)
+            old_layer = state.layer_list[file_id]
+            for entry_key in old_layer.keys() | new_layer.keys():
+                if entry_key not in old_layer or entry_key not in new_layer:
+                    touched_key.add(entry_key)
+                elif old_layer[entry_key] != new_layer[entry_key]:
+                    touched_key.add(entry_key)
+            new_layer_list[file_id] = new_layer
+        new_state = OptParseState(file_list=state.file_list, layer_list=new_layer_list, cmdline=state.cmdline)
+
+        # values before callbacks
+        pending = {}
+        for entry_key in touched_key:
+            entry = plan.callback.get(entry_key) or OptPlanEntry(
+                entry_key, plan.key_path[entry_key], self.meta_info[entry_key], None
+            )
+            new_value = resolve_base_value(entry, new_state)
+            if new_value != index_path(config, entry.key_path)[1] or entry_key in plan.callback:
+                pending[entry_key] = new_value
+
+        def _lookup(key):
+            if key in pending:
+                return pending[key]
+            return index_path(config, plan.key_path.get(key) or key.split("."))[1]
+
+        # callbacks of changed keys & their dependents
+        dirty = set(pending)
+        stack = list(pending)
+        while len(stack) > 0:
+            for dependent_key in plan.callback_dependent.get(stack.pop(), []):
+                if dependent_key not in dirty:
+                    dirty.add(dependent_key)
+                    stack.append(dependent_key)
+        callback_key = [entry_key for entry_key in plan.callback if entry_key in dirty]
+        if len(callback_key) > 0:
+            callback_wave_list = resolve_callback_wave(
+                {entry_key: plan.callback[entry_key].meta.callback for entry_key in callback_key}
+            )
 
-        index_status, index_value = index_key(self.config, prefix)
-        if not index_status:
-            raise KeyError(f"prefix not found! got {prefix}")
-        return deepcopy(index_value)
+            def _run_callback(entry_key):
+                entry = plan.callback[entry_key]
+                entry_callback: OptEntryCallback = entry.meta.callback
+                entry_value = resolve_base_value(entry, new_state)
+                if entry_callback.always or entry_value == OptEntryValueUnspecified:
+                    dep = {dep_key: _lookup(dep_key) for dep_key in entry_callback.dependency}
+                    callback_value = entry_callback(entry_key, entry_value, prog=self.prog, dep=dep)
+                    if callback_value != OptEntryValueUnspecified:
+                        entry_value = callback_value
+                return entry_value
+
+            self._run_callback_wave(callback_wave_list, _run_callback, pending.__setitem__)
+
+        changed = {
+            entry_key: value
+            for entry_key, value in pending.items()
+            if value != index_path(config, plan.key_path[entry_key])[1]
+        }
+        lack_key_list = [entry_key for entry_key, value in changed.items() if value == OptEntryValueUnspecified]
+        if len(lack_key_list) > 0:
+            raise ValueError(f"unspecified value in config! key: {lack_key_list}")
+
+        # copy on write: views of the current config keep reading it
+        new_config = dict(config)
+        copied = {id(new_config)}
+        for entry_key, value in changed.items():
+            replace_value_path(new_config, plan.key_path[entry_key], value, copied)
+        return new_state, new_config, changed
 
 
 def set_value(config, key, value):
-    key_list = key.split(".")
+    set_value_path(config, key.split("."), value)
+
+
+def set_value_path(config, key_path, value):
     handle = config
-    for keypart in key_list[:-1]:
+    for keypart in key_path[:-1]:
         handle = handle[keypart]
-    handle[key_list[-1]] = value
+    handle[key_path[-1]] = value
+
+
+def replace_value_path(config, key_path, value, copied: set[int]):
+    # set_value_path replacing the nodes on the path by shallow copies, unless they are in copied (by id)
+    handle = config
+    for keypart in key_path[:-1]:
+        child = handle[keypart]
+        if id(child) not in copied:
+            child = dict(child)
+            copied.add(id(child))
+            handle[keypart] = child
+        handle = child
+    handle[key_path[-1]] = value
 
 
 def index_key(tree, key):
+    return index_path(tree, key.split("."))
+
+
+def index_path(tree, key_path):
     if tree is None:
         return False, None
 
-    key_list = key.split(".")
     handle = tree
-    for keypart in key_list:
+    for keypart in key_path:
         if keypart not in handle:
             return False, None
         handle = handle[keypart]
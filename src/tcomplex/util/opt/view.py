@@ -0,0 +1,242 @@
+from collections.abc import Mapping, MutableMapping, Sequence, MutableSequence
+from copy import deepcopy
+from typing import Any
+
+# views of a resolved config tree, sharing it: the registry never mutates a published tree in place, a change
+# replaces the nodes on its path (see OptRegistry.reload), so a view keeps reading the tree it was taken from
+
+
+_IMMUTABLE_TYPE = (str, bytes, int, float, complex, type(None))
+
+
+def _freeze_leaf(value):
+    # a value other than a dict or list node, no longer sharing anything mutable with the config tree
+    if isinstance(value, _IMMUTABLE_TYPE):
+        return value
+    if isinstance(value, tuple):
+        return tuple(freeze_value(x) for x in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze_value(x) for x in value)
+    return deepcopy(value)
+
+
+def freeze_value(value):
+    if isinstance(value, dict):
+        return FrozenMapping(value)
+    if isinstance(value, list):
+        return FrozenSequence(value)
+    return _freeze_leaf(value)
+
+
+def thaw_value(value):
+    # plain, mutable copy
+    if isinstance(value, (FrozenMapping, CowMapping)):
+        return value.thaw()
+    if isinstance(value, (FrozenSequence, CowSequence)):
+        return value.thaw()
+    return deepcopy(value)
+
+
+class FrozenMapping(Mapping):
+    """read-only view of a dict node, nested dicts & lists are read-only views as well"""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    def __getitem__(self, key):
+        return freeze_value(self._data[key])
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __eq__(self, other):
+        if isinstance(other, (FrozenMapping, CowMapping)):
+            return self._data == other._data
+        return self._data == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._data!r})"
+
+    def __deepcopy__(self, memo):
+        return self.thaw()
+
+    def thaw(self) -> dict:
+        return deepcopy(self._data)
+
+
+class FrozenSequence(Sequence):
+    """read-only view of a list node"""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: list):
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [freeze_value(x) for x in self._data[index]]
+        return freeze_value(self._data[index])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, (FrozenSequence, CowSequence)):
+            return self._data == other._data
+        return self._data == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._data!r})"
+
+    def __deepcopy__(self, memo):
+        return self.thaw()
+
+    def thaw(self) -> list:
+        return deepcopy(self._data)
+
+
+class _CowNode:
+    # a node copies its data (shallow) on its first write, then relinks the copy into its parent, which copies itself
+    # in turn: a write copies the nodes on its path only
+    __slots__ = ("_data", "_owned", "_parent", "_key", "_child")
+
+    def __init__(self, data, parent=None, key=None):
+        self._data = data
+        self._owned = False
+        self._parent = parent
+        self._key = key
+        self._child = {}  # key -> view handed out, a later write through any of them is seen by all
+
+    def _own(self):
+        if self._owned:
+            return
+        self._data = self._data.copy()
+        self._owned = True
+        if self._parent is not None:
+            self._parent._own()
+            self._parent._data[self._key] = self._data
+
+    def _detach(self, key=None):
+        # views handed out for a slot replaced, deleted or shifted (all slots if key is None) stop writing into this
+        # node: a later write copies their data for themselves only
+        if key is None:
+            child_list = list(self._child.values())
+            self._child.clear()
+        else:
+            child_list = [self._child.pop(key)] if key in self._child else []
+        for child in child_list:
+            child._parent = None
+
+    def _wrap(self, key, value):
+        if isinstance(value, dict):
+            cls = CowMapping
+        elif isinstance(value, list):
+            cls = CowSequence
+        else:
+            return _freeze_leaf(value)  # replaced by a write, never changed in place
+        child = self._child.get(key)
+        if child is None or child._data is not value:
+            self._detach(key)
+            child = cls(value, self, key)
+            self._child[key] = child
+        return child
+
+    def __deepcopy__(self, memo):
+        return self.thaw()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._data!r})"
+
+    def thaw(self):
+        return deepcopy(self._data)
+
+
+class CowMapping(_CowNode, MutableMapping):
+    """copy on write snapshot of a dict node: reads share the config tree, a write copies the nodes on its path"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return self._wrap(key, self._data[key])
+
+    def __setitem__(self, key, value):
+        self._own()
+        self._detach(key)
+        self._data[key] = thaw_value(value)
+
+    def __delitem__(self, key):
+        self._own()
+        del self._data[key]
+        self._detach(key)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __eq__(self, other):
+        if isinstance(other, (FrozenMapping, CowMapping)):
+            return self._data == other._data
+        return self._data == other
+
+    __hash__ = None
+
+
+class CowSequence(_CowNode, MutableSequence):
+    """copy on write snapshot of a list node"""
+
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return deepcopy(self._data[index])
+        if index < 0:
+            index += len(self._data)
+        return self._wrap(index, self._data[index])
+
+    def __setitem__(self, index, value: Any):
+        self._own()
+        if isinstance(index, slice):
+            self._data[index] = [thaw_value(x) for x in value]
+            self._detach()
+        else:
+            if index < 0:
+                index += len(self._data)
+            self._data[index] = thaw_value(value)
+            self._detach(index)
+
+    def __delitem__(self, index):
+        self._own()
+        del self._data[index]
+        self._detach()
+
+    def insert(self, index, value):
+        self._own()
+        self._data.insert(index, thaw_value(value))
+        self._detach()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, (FrozenSequence, CowSequence)):
+            return self._data == other._data
+        return self._data == other
+
+    __hash__ = None
@@ -0,0 +1,186 @@
+import os
+import sys
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+from typing import Optional
+
+_logger = logging.getLogger(__name__)
+
+# inotify, linux only
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_ATTRIB
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then len bytes of name
+
+
+class _Inotify:
+    # watches of the parent directories: editors replace files by rename, a watch of the file itself is lost then
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wd_dir: dict[int, str] = {}
+
+    def watch_dir(self, dir_set):
+        for wd, dirname in list(self.wd_dir.items()):
+            if dirname not in dir_set:
+                self._rm_watch(self.fd, wd)
+                self.wd_dir.pop(wd)
+        watched = set(self.wd_dir.values())
+        for dirname in dir_set - watched:
+            wd = self._add_watch(self.fd, os.fsencode(dirname), INOTIFY_MASK)
+            if wd < 0:
+                _logger.warning(f"inotify watch failed, dir: {dirname}, errno: {ctypes.get_errno()}")
+                continue
+            self.wd_dir[wd] = dirname
+
+    def read(self) -> set[str]:
+        # paths of the events pending
+        res = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return res
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(buf):
+                wd, _, _, name_len = INOTIFY_EVENT.unpack_from(buf, offset)
+                offset += INOTIFY_EVENT.size
+                name = buf[offset : offset + name_len].rstrip(b"\0")
+                offset += name_len
+                if wd in self.wd_dir and len(name) > 0:
+                    res.add(os.path.join(self.wd_dir[wd], os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _stat_key(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class OptConfigWatcher:
+    """Reload the config files of the last parse of registry when they change, on a daemon thread
+
+    inotify on linux, else the files are polled every interval seconds. changes are collected for debounce seconds
+    before the reload, so a burst of writes reloads once
+    """
+
+    def __init__(self, registry, interval: float = 1.0, debounce: float = 0.1, use_inotify: bool = True):
+        self.registry = registry
+        self.interval = interval
+        self.debounce = debounce
+        self._inotify: Optional[_Inotify] = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                _logger.warning(f"inotify unavailable, polling config files: {e}")
+        # wakes the select of the inotify fd on stop, polling waits on the stop event alone
+        self._wake: Optional[tuple[int, int]] = os.pipe() if self._inotify is not None else None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stat: dict[str, Optional[tuple[int, int]]] = {}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="opt-config-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        if self._wake is not None:
+            os.write(self._wake[1], b"\0")
+        self._thread.join()
+        self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        if self._wake is not None:
+            os.close(self._wake[0])
+            os.close(self._wake[1])
+            self._wake = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _file_map(self):
+        # abspath -> path as bound to the registry, re-read each round: a parse may bind other files
+        return {os.path.abspath(filename): filename for filename in self.registry.config_file_list()}
+
+    def _wait(self, timeout) -> bool:
+        # False when stopped
+        if self._inotify is None:
+            return not self._stop.wait(timeout)
+        select.select([self._wake[0], self._inotify.fd], [], [], timeout)
+        return not self._stop.is_set()
+
+    def _changed_by_stat(self, file_map):
+        res = set()
+        for path in file_map:
+            stat_key = _stat_key(path)
+            if path in self._stat and self._stat[path] != stat_key:
+                res.add(path)
+            self._stat[path] = stat_key
+        for path in list(self._stat):
+            if path not in file_map:
+                self._stat.pop(path)
+        return res
+
+    def _run(self):
+        self._changed_by_stat(self._file_map())
+        while not self._stop.is_set():
+            file_map = self._file_map()
+            if self._inotify is not None:
+                self._inotify.watch_dir({os.path.dirname(path) for path in file_map})
+                if not self._wait(self.interval):
+                    break
+                changed = self._inotify.read() & file_map.keys()
+            else:
+                if not self._wait(self.interval):
+                    break
+                changed = self._changed_by_stat(file_map)
+            if len(changed) == 0:
+                continue
+
+            # debounce: let the writer finish
+            if self.debounce > 0:
+                if self._stop.wait(self.debounce):
+                    break
+            file_map = self._file_map()
+            if self._inotify is not None:
+                changed |= self._inotify.read()
+            changed |= self._changed_by_stat(file_map)
+            reload_list = [file_map[path] for path in changed if path in file_map]
+            if len(reload_list) == 0:
+                continue
+            try:
+                changed_key = self.registry.reload(reload_list)
+                _logger.info(f"config reloaded, files: {reload_list}, changed keys: {list(changed_key)}")
+            except Exception:
+                _logger.exception(f"config reload failed, files: {reload_list}")
@@ -1,6 +1,16 @@
+import asyncio
+import atexit
+import collections
+import itertools
 import logging
 import logging.handlers
+import operator
 import os
+import re
+import secrets
+import threading
+import time
+import weakref
 
 from typing import Optional
 from .rotate_file import rotate
@@ -22,11 +32,36 @@ _root_logger = logging.getLogger()
 _console_handler: Optional[logging.Handler] = None
 _file_handler: dict[str, logging.Handler] = {}
 _ext_handler: Optional[logging.Handler] = None
-_queue_handler = None  # for multiprocessing
-
-
-def log_init():
-    _root_logger.setLevel(logging.DEBUG)
+_mp_host = None  # for multiprocessing, main process
+_mp_handler: Optional[logging.Handler] = None  # for multiprocessing, worker process
+
+# loggers of this package share their level with the native loggers, see sync_levels
+EXT_LOGGER_PACKAGE = __name__.split(".", 1)[0]
+# batched submission to ext
+EXT_FLUSH_INTERVAL = 0.1
+# arg types cheap to capture for native formatting (exact types, bool excluded)
+EXT_LAZY_ARG_TYPE = (int, float, str)
+# ints beyond int64 and floats beyond it (%d of those would overflow natively) are formatted here
+EXT_LAZY_INT_RANGE = (-(2**63), 2**63 - 1)
+# call site ids of the native table, pathname -> lineno -> id (a line sits in one function)
+# process wide and kept across fork, as the table
+_call_site: dict[str, dict[int, int]] = {}
+_NO_CALL_SITE: dict[int, int] = {}
+_call_site_full = False  # the table never shrinks, new call sites send their strings from then on
+# records of a loop kept by AsyncExtHandler while the native queue is full
+EXT_SPILL_MAX = 65536
+EXT_SPILL_RETRY = 0.01
+EXT_SPILL_BATCH = 256
+# shared memory ring of worker processes
+MP_RING_SLOT_COUNT = 8192
+MP_RING_SLOT_SIZE = 512
+
+
+def log_init(patch_all_loggers=False):
+    native_root = any(name == _root_logger.name for name, _ in _log.get_level_table())
+    sync_levels(patch_all_loggers)
+    if not native_root:
+        set_level(None, logging.DEBUG)
 
 
 def enable_console(formatter=None):
@@ -84,7 +119,8 @@ def disable_file(filename):
     _root_logger.removeHandler(file_handler)
 
 
-def enable_ext():
+def enable_ext(batch_size=None, flush_interval=EXT_FLUSH_INTERVAL, lazy_format=False, loop_safe=False):
+    """loop_safe: AsyncExtHandler, never blocking an asyncio loop (no batching)"""
     global _ext_handler
 
     _log.reset_logging(_log.log_param_t(_log.log_type_t.console_file, "multisink2.txt"))
@@ -92,7 +128,10 @@ def enable_ext():
     if _ext_handler is not None:
         return
 
-    _ext_handler = ExtHandler()
+    if loop_safe:
+        _ext_handler = AsyncExtHandler(lazy_format=lazy_format)
+    else:
+        _ext_handler = ExtHandler(batch_size=batch_size, flush_interval=flush_interval, lazy_format=lazy_format)
     _root_logger.addHandler(_ext_handler)
 
 
@@ -103,45 +142,443 @@ def disable_ext():
         return
 
     _root_logger.removeHandler(_ext_handler)
+    _ext_handler.close()
     _ext_handler = None
 
 
-def configure_mp_main():
-    # TODO
-    pass
+def configure_mp_main(slot_count=MP_RING_SLOT_COUNT, slot_size=MP_RING_SLOT_SIZE):
+    """Create the shared memory ring drained into the native loggers, return its name for `configure_mp_worker`"""
+    global _mp_host
 
+    if _mp_host is None:
+        if not _log.check_init():
+            raise Exception("logging not initialized in main library!")
+        name = f"tcl_{os.getpid()}_{secrets.token_hex(4)}"
+        _mp_host = _log.LogMpHost(name, slot_count, slot_size)
 
-def configure_mp_worker():
-    # TODO
-    pass
+    return _mp_host.name()
+
+
+def configure_mp_worker(ring_name, batch_size=None, flush_interval=EXT_FLUSH_INTERVAL, lazy_format=False):
+    """Send the records of this (worker) process to the ring of the main process, e.g. as pool initializer"""
+    global _ext_handler, _mp_handler
+
+    log_init()
+
+    # a forked ext handler points to a log device not running in this process
+    if _ext_handler is not None:
+        _root_logger.removeHandler(_ext_handler)
+        _ext_handler = None
+
+    if _mp_handler is None:
+        atexit.register(deconfigure_mp_worker)
+    else:
+        deconfigure_mp_worker()
+
+    _mp_handler = MpHandler(ring_name, batch_size=batch_size, flush_interval=flush_interval, lazy_format=lazy_format)
+    _root_logger.addHandler(_mp_handler)
+
+
+def deconfigure_mp_worker():
+    global _mp_handler
+
+    if _mp_handler is None:
+        return
+
+    # submit buffered records, then unmap the ring
+    _root_logger.removeHandler(_mp_handler)
+    _mp_handler.close()
+    _mp_handler = None
 
 
 def deconfigure_mp_main():
-    # TODO
+    global _mp_host
+
+    if _mp_host is None:
+        return
+
+    # records left in the ring are drained before the ring goes
+    _mp_host.close()
+    _mp_host = None
+
+
+# levels
+class _NativeLevel:
+    # level changes go to the native level table too
+    def setLevel(self, level):
+        super().setLevel(level)
+        _log.set_logger_level(self.name, self.level)
+
+
+class ExtLogger(_NativeLevel, logging.Logger):
+    """Logger sharing its level with the native logger of the same dotted name"""
+
+
+class _ExtRootLogger(_NativeLevel, logging.RootLogger):
     pass
 
 
+def _on_native_level(name, level):
+    # a level set natively: applied here without pushing it back
+    logger = _root_logger if name == _root_logger.name else logging.getLogger(name)
+    if logger.level != level:
+        logging.Logger.setLevel(logger, level)
+
+
+def get_logger(name):
+    """`logging.getLogger(name)` as an ExtLogger, its `setLevel` goes to the native logger too"""
+    logger = logging.getLogger(name)
+    if type(logger) is logging.Logger:
+        logger.__class__ = ExtLogger
+    return logger
+
+
+def sync_levels(patch_all_loggers=False):
+    """Share levels between python and native loggers by dotted name, both ways
+
+    Levels set natively (e.g. from TCOMPLEX_LOG_LEVEL) are applied to the python loggers. Levels set by `set_level`,
+    or by `setLevel` of an ExtLogger, go to the native logger. Loggers of this package and those of `get_logger` are
+    ExtLogger; with patch_all_loggers, every logger is: loggers created from now on are ExtLogger, existing plain loggers
+    (root and those of other libraries included) are switched over.
+    `Logger.isEnabledFor` answers from its cache without a native call, and records below the native level are no
+    longer built in python just to be dropped natively.
+    """
+    if patch_all_loggers:
+        logging.setLoggerClass(ExtLogger)
+        if type(_root_logger) is logging.RootLogger:
+            _root_logger.__class__ = _ExtRootLogger
+    logger_list = [_root_logger]
+    for name, logger in list(logging.Logger.manager.loggerDict.items()):
+        if type(logger) is logging.Logger and (patch_all_loggers or name.split(".", 1)[0] == EXT_LOGGER_PACKAGE):
+            logger.__class__ = ExtLogger
+        if isinstance(logger, _NativeLevel):
+            logger_list.append(logger)
+
+    # native levels first, python levels win where both are set; but the root, python has it set from the start
+    native_level = dict(_log.get_level_table())
+    python_level = {logger.name: logger.level for logger in logger_list if logger.level != logging.NOTSET}
+    if _root_logger.name in native_level:
+        python_level.pop(_root_logger.name, None)
+    for name, level in native_level.items():
+        if name not in python_level:
+            _on_native_level(name, level)
+    for name, level in python_level.items():
+        _log.set_logger_level(name, level)
+
+    _log.set_level_listener(_on_native_level)
+
+
+def set_level(name, level):
+    """Level of the python and native logger name, root for the root logger; NOTSET to follow the dotted parent"""
+    logger = _root_logger if name in (None, "", _root_logger.name) else logging.getLogger(name)
+    logging.Logger.setLevel(logger, level)
+    _log.set_logger_level(logger.name, logger.level)
+
+
+def is_enabled_for(name, level):
+    """Native level check of logger name, e.g. for the key of LogCtx, no record is built"""
+    return _log.is_enabled_for(name, level)
+
+
+def _unset_level_listener():
+    # the listener holds a python function, it has to go before the interpreter
+    _log.set_level_listener(None)
+
+
+atexit.register(_unset_level_listener)
+
+
 # log handler
+def call_site_id(record):
+    # the source location is converted & stored natively once, records only carry the id
+    # with the table full: (filename, funcname, lineno), as taken in place of the id by LogCtx.log_batch
+    global _call_site_full
+    site = _call_site.get(record.pathname, _NO_CALL_SITE).get(record.lineno)
+    if site is None:
+        if not _call_site_full:
+            site = _log.reg_call_site(record.filename, record.funcName or "", record.lineno)
+        if site is None or site < 0:
+            _call_site_full = True
+            return record.filename, record.funcName or "", record.lineno
+        _call_site.setdefault(record.pathname, {})[record.lineno] = site
+    return site
+
+
 class ExtHandler(logging.Handler):
-    def __init__(self) -> None:
+    """Forward records to the native logger
+
+    With `batch_size` set, records are buffered and submitted in one `LogCtx.log_batch` call (which releases the gil)
+    once the buffer is full, `flush_interval` seconds have passed, or on `flush`.
+    With `lazy_format` set, `record.msg` and `record.args` are sent as is when args are plain int/float/str, and the
+    message is formatted by the native worker thread.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = EXT_FLUSH_INTERVAL,
+        lazy_format: bool = False,
+    ) -> None:
         super().__init__()
+        self.ctx = self._open_ctx()
+        self.lazy_format = lazy_format
+        self._pid = os.getpid()
+
+        # batch mode
+        self.batch_size = batch_size if batch_size is not None and batch_size > 1 else None
+        self.flush_interval = flush_interval
+        self._buffer: list[tuple] = []
+        self._flush_event: Optional[threading.Event] = None
+        self._flush_thread: Optional[threading.Thread] = None
+        if self.batch_size is not None and flush_interval is not None and flush_interval > 0:
+            self._flush_event = threading.Event()
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="ExtHandlerFlush", daemon=True)
+            self._flush_thread.start()
+
+    def _open_ctx(self):
         if not _log.check_init():
             raise Exception("logging not initialized in main library!")
+        return _log.LogCtx()
+
+    def _lazy_args(self, record):
+        # args for native formatting, None if the message must be formatted here
+        args = record.args
+        if not self.lazy_format or not args or type(args) is not tuple or type(record.msg) is not str:
+            return None
+        int_min, int_max = EXT_LAZY_INT_RANGE
+        for arg in args:
+            arg_type = type(arg)
+            if arg_type not in EXT_LAZY_ARG_TYPE:
+                return None
+            if arg_type is not str and not int_min <= arg <= int_max:
+                return None
+        return args
+
+    def _entry(self, record):
+        # (levelno, msg, args, created_ns, site) as taken by LogCtx.log_batch, site as by call_site_id
+        args = self._lazy_args(record)
+        if args is None:
+            msg, args = record.getMessage(), ()
+        else:
+            msg = record.msg
+
+        site = _call_site.get(record.pathname, _NO_CALL_SITE).get(record.lineno)  # inlined hit of call_site_id
+        if site is None:
+            site = call_site_id(record)
+        created_ns = getattr(record, "created_ns", None)  # python 3.13+, before: the float created (~0.2us)
+        if created_ns is None:
+            created_ns = int(record.created * 1e9)
+        return record.levelno, msg, args, created_ns, site
 
-        self.ctx = _log.LogCtx()
+    def emit(self, record):
+        entry = self._entry(record)
+        if self.batch_size is None:
+            levelno, msg, args, created_ns, site = entry
+            if type(site) is not int:
+                if len(args) == 0:
+                    self.ctx.log(levelno, msg, created_ns, *site)
+                else:
+                    self.ctx.log_lazy(levelno, msg, args, created_ns, *site)
+            elif len(args) == 0:
+                self.ctx.log_site(levelno, msg, created_ns, site)
+            else:
+                self.ctx.log_lazy_site(levelno, msg, args, created_ns, site)
+            return
+
+        # called with handler lock held
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.batch_size:
+            self._submit()
+
+    def _submit(self):
+        # caller holds handler lock
+        if len(self._buffer) == 0:
+            return
+        batch, self._buffer = self._buffer, []
+        self.ctx.log_batch(batch)
+
+    def _flush_loop(self):
+        while not self._flush_event.wait(self.flush_interval):
+            self.acquire()
+            try:
+                self._submit()
+            finally:
+                self.release()
+
+    def flush(self):
+        if self._pid != os.getpid():
+            return  # forked copy, the native log device does not run here
+        self.acquire()
+        try:
+            self._submit()
+            _log.flush_logging()
+        finally:
+            self.release()
+
+    def close(self):
+        if self._pid != os.getpid():
+            super().close()
+            return
+        if self._flush_event is not None:
+            self._flush_event.set()
+            self._flush_thread.join()
+            self._flush_event = None
+            self._flush_thread = None
+        self.acquire()
+        try:
+            self._submit()
+        finally:
+            self.release()
+        super().close()
+
+
+class MpHandler(ExtHandler):
+    """Forward records of a worker process to the shared memory ring of the main process
+
+    Same batching & lazy formatting as `ExtHandler`; with `block` unset, records are dropped (and counted) while the
+    ring is full.
+    """
+
+    def __init__(
+        self,
+        ring_name: str,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = EXT_FLUSH_INTERVAL,
+        lazy_format: bool = False,
+        block: bool = True,
+    ) -> None:
+        self.ring_name = ring_name
+        self.block = block
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval, lazy_format=lazy_format)
+
+    def _open_ctx(self):
+        return _log.LogMpCtx(self.ring_name, block=self.block)
+
+    def flush(self):
+        # records are in the ring once submitted, the main process drains it
+        self.acquire()
+        try:
+            self._submit()
+        finally:
+            self.release()
+
+
+class AsyncExtHandler(ExtHandler):
+    """ExtHandler whose emit never blocks an asyncio loop
+
+    On a thread running a loop, a record the native queue has no room for (block policy) is kept in a buffer local to
+    the loop and submitted again from the loop, in order. At most `spill_max` records are kept per loop, further ones are
+    dropped and counted in `num_spill_dropped`. Other threads log as with `ExtHandler`.
+    """
+
+    def __init__(
+        self,
+        lazy_format: bool = False,
+        spill_max: int = EXT_SPILL_MAX,
+        spill_retry: float = EXT_SPILL_RETRY,
+    ) -> None:
+        super().__init__(lazy_format=lazy_format)
+        self.spill_max = spill_max
+        self.spill_retry = spill_retry
+        self.num_spill_dropped = 0
+        self._spill: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()  # loop -> deque of entries
 
     def emit(self, record):
-        self.ctx.log(
-            record.levelno, record.getMessage(), record.created, record.filename, record.funcName, record.lineno
-        )
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            super().emit(record)
+            return
+
+        entry = self._entry(record)
+        spill = self._spill.get(loop)
+        if spill is None:
+            levelno, msg, args, created_ns, site = entry
+            if type(site) is not int:
+                taken = self.ctx.try_log_batch([entry]) == 1
+            elif len(args) == 0:
+                taken = self.ctx.try_log_site(levelno, msg, created_ns, site)
+            else:
+                taken = self.ctx.try_log_lazy_site(levelno, msg, args, created_ns, site)
+            if taken:
+                return
+            spill = self._spill[loop] = collections.deque()
+            loop.call_later(self.spill_retry, self._retry_spill, loop)
+        # behind the records kept before, to keep the order
+        if len(spill) >= self.spill_max:
+            self.num_spill_dropped += 1
+            return
+        spill.append(entry)
+
+    def _submit_spill(self, loop):
+        # caller holds handler lock; True once nothing is kept for loop
+        spill = self._spill.get(loop)
+        while spill:
+            num_taken = self.ctx.try_log_batch(list(itertools.islice(spill, EXT_SPILL_BATCH)))
+            for _ in range(num_taken):
+                spill.popleft()
+            if num_taken < EXT_SPILL_BATCH:
+                break
+        if spill:
+            return False
+        self._spill.pop(loop, None)
+        return True
+
+    def _retry_spill(self, loop):
+        self.acquire()
+        try:
+            done = self._submit_spill(loop)
+        finally:
+            self.release()
+        if not done:
+            loop.call_later(self.spill_retry, self._retry_spill, loop)
+
+    def _submit_spill_blocking(self):
+        # caller holds handler lock
+        for spill in list(self._spill.values()):
+            self.ctx.log_batch(list(spill))
+        self._spill.clear()
 
     def flush(self):
+        if self._pid != os.getpid():
+            return
         self.acquire()
-        _log.flush_logging()
-        self.release()
+        try:
+            self._submit_spill_blocking()
+        finally:
+            self.release()
+        super().flush()
+
+    def close(self):
+        if self._pid == os.getpid():
+            self.acquire()
+            try:
+                self._submit_spill_blocking()
+            finally:
+                self.release()
+        super().close()
 
 
 # log format
+_FORMAT_FIELD_PATTERN = re.compile(r"%\((\w+)\)")
+
+
+def compile_format(log_fmt):
+    """Turn a `%(name)s` style format into a positional format and the attrgetter feeding it"""
+    names = _FORMAT_FIELD_PATTERN.findall(log_fmt)
+    pos_fmt = _FORMAT_FIELD_PATTERN.sub("%", log_fmt)
+    if len(names) > 1:
+        getter = operator.attrgetter(*names)
+    else:
+        # attrgetter of a single name does not return a tuple
+        _getter_list = [operator.attrgetter(name) for name in names]
+
+        def getter(record):
+            return tuple(_getter(record) for _getter in _getter_list)
+
+    return pos_fmt, getter, "asctime" in names
+
+
 class Formatter(logging.Formatter):
     """Logging Formatter to add colors and count warning / errors"""
 
@@ -150,11 +587,49 @@ class Formatter(logging.Formatter):
     msg_str = "%(message)s"
     src_str = "(%(name)s @ %(filename)s:%(lineno)d)"
 
+    FORMATS: dict[int, str] = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # self.FORMATS defined in derived class, compiled once
+        self.compiled_formats = {levelno: compile_format(log_fmt) for levelno, log_fmt in self.FORMATS.items()}
+        self.default_compiled_format = compile_format("%(message)s")
+        self._asctime_cache = (None, "")  # (second, rendered prefix)
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt is not None:
+            return super().formatTime(record, datefmt)
+
+        # the part up to seconds only changes once per second
+        second = int(record.created)
+        cache_second, prefix = self._asctime_cache
+        if cache_second != second:
+            prefix = time.strftime(self.default_time_format, self.converter(record.created))
+            self._asctime_cache = (second, prefix)
+        if self.default_msec_format:
+            return self.default_msec_format % (prefix, record.msecs)
+        return prefix
+
     def format(self, record):
-        # self.FORMATS defined in derived class
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        pos_fmt, getter, uses_time = self.compiled_formats.get(record.levelno, self.default_compiled_format)
+        record.message = record.getMessage()
+        if uses_time:
+            record.asctime = self.formatTime(record)
+        res = pos_fmt % getter(record)
+
+        # same as logging.Formatter.format
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            if res[-1:] != "\n":
+                res = res + "\n"
+            res = res + record.exc_text
+        if record.stack_info:
+            if res[-1:] != "\n":
+                res = res + "\n"
+            res = res + self.formatStack(record.stack_info)
+        return res
 
 
 class ConsoleFormatter(Formatter):
@@ -211,7 +686,208 @@ def ask_for_confirm():
 
 # wrap module
 log_type = _log.log_type_t
+async_overflow = _log.async_overflow_t
+file_sink_type = _log.file_sink_type_t
+limit_param = _log.limit_param_t
+
+
+def _native_level_no(level):
+    # python level -> spdlog level number, as the native level registry: above CRITICAL is off
+    if level is None:
+        return None
+    if level < logging.DEBUG:
+        return 0
+    return level // 10 if level <= logging.CRITICAL else 6
+
+
+def _log_param(file_level=None, ring_dump_level=None, **kwargs):
+    return _log.log_param_t(
+        file_level=_native_level_no(file_level), ring_dump_level=_native_level_no(ring_dump_level), **kwargs
+    )
+
+
+def reset_logging(
+    log_type=None,
+    log_filename=None,
+    async_queue_size=None,
+    async_thread_count=None,
+    async_overflow=None,
+    async_queue_max_bytes=None,
+    file_sink_type=None,
+    file_max_size=None,
+    file_rotate_interval=None,
+    file_max_rotate=None,
+    file_level=None,
+    ring_size=None,
+    ring_filename=None,
+    ring_dump_level=None,
+    limit=None,
+):
+    """Configure the native log device, arguments left to None keep their current value
+
+    file_level and ring_dump_level are python levels. with ring_size > 0, a flight recorder keeps the last ring_size
+    records of every level in memory and appends them to ring_filename (log_filename + ".ring" if empty) when a record
+    at or above ring_dump_level arrives (never if above CRITICAL) or on dump_ring; e.g. a file at INFO, the debug
+    trail dumped on ERROR
+
+    limit is the limit_param of loggers without their own, see set_limit
+    """
+    _log.reset_logging(
+        _log_param(
+            log_type=log_type,
+            log_filename=log_filename,
+            async_queue_size=async_queue_size,
+            async_thread_count=async_thread_count,
+            async_overflow=async_overflow,
+            async_queue_max_bytes=async_queue_max_bytes,
+            file_sink_type=file_sink_type,
+            file_max_size=file_max_size,
+            file_rotate_interval=file_rotate_interval,
+            file_max_rotate=file_max_rotate,
+            file_level=file_level,
+            ring_size=ring_size,
+            ring_filename=ring_filename,
+            ring_dump_level=ring_dump_level,
+            limit=limit,
+        )
+    )
+
 
+def set_limit(name, limit):
+    """Rate limit & repeat collapsing of the native logger name, None for the limit of reset_logging
+
+    checked on the calling thread before a record is queued, for LogCtx and native records alike: e.g.
+    limit_param(site_rate=10, site_burst=50, repeat_window=5) lets each call site of the logger log 10 records/s after
+    a burst of 50, and logs a repeat of the last message of a call site within 5s as a count. suppressed records are
+    reported by a note record of the call site, and counted in get_log_metrics()["suppressed"]
+    """
+    _log.set_logger_limit(name, limit)
+
+
+def flush_logging(timeout=None):
+    if _ext_handler is not None:
+        _ext_handler.acquire()
+        try:
+            _ext_handler._submit()
+        finally:
+            _ext_handler.release()
+    if _mp_host is not None:
+        _mp_host.drain(timeout)
+    return _log.flush_logging(timeout)
+
+
+def dump_ring():
+    """Write the records kept by the flight recorder to its file and empty it, after a flush; records written"""
+    if _ext_handler is not None:
+        _ext_handler.acquire()
+        try:
+            _ext_handler._submit()
+        finally:
+            _ext_handler.release()
+    if _mp_host is not None:
+        _mp_host.drain()
+    return _log.dump_ring()
 
-def reset_logging(log_type=None, log_filename=None):
-    _log.reset_logging(_log.log_param_t(log_type=log_type, log_filename=log_filename))
+
+# asyncio
+def _set_future_result(fut, res):
+    if not fut.done():
+        fut.set_result(res)
+
+
+def _native_call(loop, fn, *args):
+    # fn(*args, done) returns at once, done is called by the native control thread and wakes the loop, no one polls
+    fut = loop.create_future()
+
+    def done(*res):
+        try:
+            loop.call_soon_threadsafe(_set_future_result, fut, res[0] if res else None)
+        except RuntimeError:
+            pass  # loop closed meanwhile
+
+    fn(*args, done)
+    return fut
+
+
+async def aflush(timeout=None):
+    """flush_logging for code on an asyncio loop, the loop keeps running while the native side drains
+
+    records AsyncExtHandler keeps for this loop are submitted first, as the queue makes room
+    """
+    loop = asyncio.get_running_loop()
+    handler = _ext_handler
+    if isinstance(handler, AsyncExtHandler):
+        while True:
+            handler.acquire()
+            try:
+                done = handler._submit_spill(loop)
+            finally:
+                handler.release()
+            if done:
+                break
+            stat = await _native_call(loop, _log.flush_logging_async, timeout)
+            if not stat.drained:
+                return stat
+    elif handler is not None:
+        handler.acquire()
+        try:
+            handler._submit()
+        finally:
+            handler.release()
+    if _mp_host is not None:
+        # the ring host has no completion callback, its drain waits on an executor thread
+        await loop.run_in_executor(None, _mp_host.drain, timeout)
+    return await _native_call(loop, _log.flush_logging_async, timeout)
+
+
+async def areset_logging(**kwargs):
+    """reset_logging for code on an asyncio loop, same arguments; done on the native side, in call order with aflush"""
+    loop = asyncio.get_running_loop()
+    await _native_call(loop, _log.reset_logging_async, _log_param(**kwargs))
+
+
+def _wait_native_calls():
+    # completion callbacks hold python functions, they have to run before the interpreter goes
+    _log.wait_logging_async()
+
+
+atexit.register(_wait_native_calls)
+
+
+def get_async_stat():
+    # queue fill & lost message counters of the native async device
+    return _log.get_async_stat()
+
+
+# native level order of logger_metrics_t.level_count
+EXT_LEVEL_NAME = ("trace", "debug", "info", "warning", "error", "critical")
+
+
+def _latency_dict(stat):
+    # bucket i: [2**(i-1), 2**i) ns
+    return {"count": stat.count, "sum_ns": stat.sum_ns, "max_ns": stat.max_ns, "bucket": list(stat.bucket)}
+
+
+def get_log_metrics():
+    """Snapshot of the native log device as plain dicts, e.g. for export to monitoring"""
+    metrics = _log.get_log_metrics()
+    async_stat = metrics.async_stat
+    return {
+        "async": {
+            "queue_size": async_stat.queue_size,
+            "queue_capacity": async_stat.queue_capacity,
+            "queue_bytes": async_stat.queue_bytes,
+            "queue_max_bytes": async_stat.queue_max_bytes,
+            "queue_high_water": async_stat.queue_high_water,
+            "queue_bytes_high_water": async_stat.queue_bytes_high_water,
+            "thread_count": async_stat.thread_count,
+            "num_enqueued": async_stat.num_enqueued,
+            "num_dropped": async_stat.num_dropped,
+            "num_overrun": async_stat.num_overrun,
+        },
+        "loggers": {m.name: dict(zip(EXT_LEVEL_NAME, m.level_count)) for m in metrics.loggers},
+        "suppressed": {
+            m.name: {"rate_limited": m.num_rate_limited, "collapsed": m.num_collapsed} for m in metrics.loggers
+        },
+        "sinks": {m.key: {"write": _latency_dict(m.write), "flush": _latency_dict(m.flush)} for m in metrics.sinks},
+    }
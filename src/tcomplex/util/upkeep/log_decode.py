@@ -0,0 +1,190 @@
+"""read back files of the binary native file sink (log.file_sink_type.binary), layout in libtcomplex log_sink.h
+
+usage: python -m tcomplex.util.upkeep.log_decode file.bin [--json]
+"""
+import argparse
+import datetime
+import json
+import os
+import struct
+import sys
+
+BINARY_MAGIC = b"TCLBIN"
+BINARY_VERSION = 1
+BINARY_ENTRY_STR = 0
+BINARY_ENTRY_TEXT = 1
+BINARY_ENTRY_LAZY = 2
+
+# spdlog level names, by level number
+LEVEL_NAME = ("trace", "debug", "info", "warning", "error", "critical", "off")
+
+READ_SIZE = 1 << 20
+
+_double = struct.Struct("<d")
+
+
+class _Truncated(Exception):
+    pass
+
+
+class _Reader:
+    __slots__ = ("buf", "pos")
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def byte(self):
+        if self.pos >= len(self.buf):
+            raise _Truncated
+        res = self.buf[self.pos]
+        self.pos += 1
+        return res
+
+    def varint(self):
+        buf = self.buf
+        pos = self.pos
+        res = 0
+        shift = 0
+        while True:
+            if pos >= len(buf):
+                raise _Truncated
+            b = buf[pos]
+            pos += 1
+            res |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return res
+
+    def svarint(self):
+        value = self.varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def bytes(self):
+        end = self.varint() + self.pos
+        if end > len(self.buf):
+            raise _Truncated
+        res = self.buf[self.pos : end]
+        self.pos = end
+        return res
+
+    def double(self):
+        end = self.pos + _double.size
+        if end > len(self.buf):
+            raise _Truncated
+        (res,) = _double.unpack_from(self.buf, self.pos)
+        self.pos = end
+        return res
+
+
+def _decode_str(raw):
+    return raw.decode("utf-8", "replace")
+
+
+def render_lazy(template, args):
+    try:
+        return template % args
+    except (TypeError, ValueError) as ex:
+        # same fallback as the native formatter
+        return f"{template} <format error: {ex}>"
+
+
+def iter_records(filename):
+    """records of a binary log file as dicts, in file order; a cut record at the end is skipped"""
+    strs = []
+    time_ns = 0
+    with open(filename, "rb") as f:
+        header = f.read(len(BINARY_MAGIC) + 1)
+        if header[: len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError(f"not a binary log file: {filename}")
+        if header[len(BINARY_MAGIC)] != BINARY_VERSION:
+            raise ValueError(f"unsupported binary log version {header[len(BINARY_MAGIC)]}: {filename}")
+
+        rest = b""
+        while True:
+            chunk = f.read(READ_SIZE)
+            reader = _Reader(rest + chunk)
+            while reader.pos < len(reader.buf):
+                begin = reader.pos
+                try:
+                    kind = reader.byte()
+                    if kind == BINARY_ENTRY_STR:
+                        strs.append(_decode_str(reader.bytes()))
+                        continue
+                    if kind not in (BINARY_ENTRY_TEXT, BINARY_ENTRY_LAZY):
+                        raise ValueError(f"unknown entry kind {kind} at offset {begin}")
+
+                    time_delta = reader.svarint()
+                    level = reader.varint()
+                    logger = strs[reader.varint()]
+                    src_filename = strs[reader.varint()]
+                    funcname = strs[reader.varint()]
+                    lineno = reader.varint()
+                    thread = reader.varint()
+                    if kind == BINARY_ENTRY_TEXT:
+                        template = None
+                        args = None
+                        msg = _decode_str(reader.bytes())
+                    else:
+                        template = strs[reader.varint()]
+                        args = []
+                        for _ in range(reader.varint()):
+                            tag = reader.byte()
+                            if tag == ord("i"):
+                                args.append(reader.svarint())
+                            elif tag == ord("f"):
+                                args.append(reader.double())
+                            else:
+                                args.append(_decode_str(reader.bytes()))
+                        args = tuple(args)
+                        msg = render_lazy(template, args)
+                except _Truncated:
+                    reader.pos = begin
+                    break
+
+                time_ns += time_delta
+                yield {
+                    "created_ns": time_ns,
+                    "level": LEVEL_NAME[level] if level < len(LEVEL_NAME) else str(level),
+                    "logger": logger,
+                    "filename": src_filename,
+                    "funcname": funcname,
+                    "lineno": lineno,
+                    "thread": thread,
+                    "msg": msg,
+                    "template": template,
+                    "args": args,
+                }
+            rest = reader.buf[reader.pos :]
+            if not chunk:
+                break
+
+
+def format_record(record):
+    """text line as the default native file formatter renders it"""
+    created_ns = record["created_ns"]
+    created = datetime.datetime.fromtimestamp(created_ns // 1_000_000_000)
+    msec = created_ns // 1_000_000 % 1000
+    source = f"{os.path.basename(record['filename'])}:{record['lineno']}:{record['funcname']}"
+    return f"[{created:%Y-%m-%d %H:%M:%S}.{msec:03d}] [{record['logger']}] [{record['level']}] [{source}] {record['msg']}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filename")
+    parser.add_argument("--json", action="store_true", help="one json object per line")
+    arg = parser.parse_args()
+
+    out = sys.stdout
+    for record in iter_records(arg.filename):
+        if arg.json:
+            out.write(json.dumps(record))
+        else:
+            out.write(format_record(record))
+        out.write("\n")
+
+
+if __name__ == "__main__":
+    main()
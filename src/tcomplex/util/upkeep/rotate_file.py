@@ -1,28 +1,114 @@
+import json
 import os
-import math
+import re
 
+# generations kept by default, no longer an upper bound
 MAX_ROTATE = 99
-SUFFIX_LEN = int(math.log10(MAX_ROTATE)) + 1
 
+# generations are named file.<seq> with a monotonic seq, listed oldest first in file.manifest as [name, size]
+MANIFEST_SUFFIX = ".manifest"
+MANIFEST_VERSION = 1
 
-def rotate(filename, num_rotate=MAX_ROTATE):
-    if num_rotate > MAX_ROTATE:
-        raise RuntimeError(f"num_rotate too large! max {MAX_ROTATE}, got {num_rotate}")
 
+def manifest_filename(filename):
+    return filename + MANIFEST_SUFFIX
+
+
+def generation_filename(filename, seq):
+    return f"{filename}.{seq}"
+
+
+def _scan_generations(filename):
+    # rebuild from the directory, also picks up the fixed slot naming file.01 ... file.99 (newest first)
+    dirname, basename = os.path.split(filename)
+    pattern = re.compile(re.escape(basename) + r"\.(\d+)")
+    found = []
+    try:
+        with os.scandir(dirname or os.curdir) as it:
+            for entry in it:
+                matched = pattern.fullmatch(entry.name)
+                if matched is None:
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime_ns, int(matched[1]), entry.name, stat.st_size))
+    except FileNotFoundError:
+        pass
+    found.sort()
+    generations = [[name, size] for _, _, name, size in found]
+    next_seq = max((seq for _, seq, _, _ in found), default=0) + 1
+    return {"version": MANIFEST_VERSION, "next_seq": next_seq, "generations": generations}
+
+
+def load_manifest(filename):
+    try:
+        with open(manifest_filename(filename), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    # missing or damaged
+    return _scan_generations(filename)
+
+
+def _dump_manifest(filename, manifest):
+    # write aside then replace, a crash leaves either the old or the new manifest
+    manifest_path = manifest_filename(filename)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+
+def list_generations(filename):
+    """rotated files of filename, newest first"""
+    filename = os.path.normcase(os.path.normpath(filename))
+    manifest = load_manifest(filename)
+    dirname = os.path.dirname(filename)
+    return [os.path.join(dirname, name) for name, _ in reversed(manifest["generations"])]
+
+
+def rotate(filename, num_rotate=MAX_ROTATE, max_bytes=None):
+    """move filename to the next generation, keep at most num_rotate generations of at most max_bytes in total
+
+    the newest generation is kept regardless of max_bytes; returns the rotated filename, None if nothing to rotate
+    """
     filename = os.path.normcase(os.path.normpath(filename))
+    try:
+        size = os.stat(filename).st_size
+    except FileNotFoundError:
+        return None
+
+    manifest = load_manifest(filename)
+    generations = manifest["generations"]
+    seq = manifest["next_seq"]
+    manifest["next_seq"] = seq + 1
+    rotated_filename = generation_filename(filename, seq)
+    generations.append([os.path.basename(rotated_filename), size])
+
+    # prune
+    num_prune = max(len(generations) - num_rotate, 0)
+    if max_bytes is not None:
+        total = sum(size for _, size in generations[num_prune:])
+        while num_prune < len(generations) - 1 and total > max_bytes:
+            total -= generations[num_prune][1]
+            num_prune += 1
+    pruned = generations[:num_prune]
+    del generations[:num_prune]
 
-    # rotate
-    suffix = str(num_rotate).rjust(SUFFIX_LEN, "0")
-    rotated_filename = filename + "." + suffix
-    if os.path.exists(rotated_filename):
-        os.remove(rotated_filename)
-    for rotate_id in range(num_rotate - 1, 0, -1):
-        suffix = str(rotate_id).rjust(SUFFIX_LEN, "0")
-        rotated_filename = filename + "." + suffix
-        if os.path.exists(rotated_filename):
-            new_suffix = str(rotate_id + 1).rjust(SUFFIX_LEN, "0")
-            new_filename = filename + "." + new_suffix
-            os.rename(rotated_filename, new_filename)
-    if os.path.exists(filename):
-        suffix = str(1).rjust(SUFFIX_LEN, "0")
-        os.rename(filename, filename + "." + suffix)
+    # pruned files go first, then the manifest takes the new generation, then the rename:
+    # a crash at any step leaves at worst a listed generation that is missing, never an unlisted file
+    dirname = os.path.dirname(filename)
+    for name, _ in pruned:
+        try:
+            os.remove(os.path.join(dirname, name))
+        except FileNotFoundError:
+            pass
+    _dump_manifest(filename, manifest)
+    if num_rotate == 0:
+        os.remove(filename)
+        return None
+    os.replace(filename, rotated_filename)
+    return rotated_filename
@@ -1,6 +1,11 @@
 #include <nanobind/nanobind.h>
+#include <nanobind/stl/function.h>
 #include <nanobind/stl/optional.h>
 #include <nanobind/stl/string.h>
+#include <nanobind/stl/string_view.h>
+#include <nanobind/stl/tuple.h>
+#include <nanobind/stl/variant.h>
+#include <nanobind/stl/vector.h>
 
 #include <libtcomplex/interface/log_if.h>
 
@@ -14,20 +19,173 @@ NB_MODULE(_log, m) {
         .value("file_only", log_type_t::file_only)
         .value("console_file", log_type_t::console_file);
 
+    nb::enum_<async_overflow_t>(m, "async_overflow_t")
+        .value("block", async_overflow_t::block)
+        .value("overrun_oldest", async_overflow_t::overrun_oldest)
+        .value("discard_new", async_overflow_t::discard_new);
+
+    nb::enum_<file_sink_type_t>(m, "file_sink_type_t")
+        .value("basic", file_sink_type_t::basic)
+        .value("rotating", file_sink_type_t::rotating)
+        .value("binary", file_sink_type_t::binary)
+        .value("mmap", file_sink_type_t::mmap);
+    m.attr("FILE_MAX_ROTATE") = FILE_MAX_ROTATE;
+
+    nb::class_<limit_param_t>(m, "limit_param_t")
+        .def(nb::init<double, double, double, double, double>(), //
+             nb::arg("logger_rate") = 0.0, nb::arg("logger_burst") = 0.0, nb::arg("site_rate") = 0.0,
+             nb::arg("site_burst") = 0.0, nb::arg("repeat_window") = 0.0) //
+        .def_readwrite("logger_rate", &limit_param_t::logger_rate)        //
+        .def_readwrite("logger_burst", &limit_param_t::logger_burst)      //
+        .def_readwrite("site_rate", &limit_param_t::site_rate)            //
+        .def_readwrite("site_burst", &limit_param_t::site_burst)          //
+        .def_readwrite("repeat_window", &limit_param_t::repeat_window);
+
     nb::class_<log_param_t>(m, "log_param_t")
-        .def(nb::init<std::optional<log_type_t>, std::optional<std::string>>(), //
-             nb::arg("log_type") = nb::none(),
-             nb::arg("log_filename") = nb::none())         //
-        .def_readwrite("log_type", &log_param_t::log_type) //
-        .def_readwrite("log_filename", &log_param_t::log_filename);
+        .def(nb::init<std::optional<log_type_t>, std::optional<std::string>, std::optional<size_t>,
+                      std::optional<size_t>, std::optional<async_overflow_t>, std::optional<size_t>,
+                      std::optional<file_sink_type_t>, std::optional<size_t>, std::optional<double>,
+                      std::optional<size_t>, std::optional<int>, std::optional<size_t>, std::optional<std::string>,
+                      std::optional<int>, std::optional<limit_param_t>>(), //
+             nb::arg("log_type") = nb::none(), nb::arg("log_filename") = nb::none(),
+             nb::arg("async_queue_size") = nb::none(), nb::arg("async_thread_count") = nb::none(),
+             nb::arg("async_overflow") = nb::none(), nb::arg("async_queue_max_bytes") = nb::none(),
+             nb::arg("file_sink_type") = nb::none(), nb::arg("file_max_size") = nb::none(),
+             nb::arg("file_rotate_interval") = nb::none(), nb::arg("file_max_rotate") = nb::none(),
+             nb::arg("file_level") = nb::none(), nb::arg("ring_size") = nb::none(),
+             nb::arg("ring_filename") = nb::none(), nb::arg("ring_dump_level") = nb::none(),
+             nb::arg("limit") = nb::none())                                          //
+        .def_readwrite("log_type", &log_param_t::log_type)                           //
+        .def_readwrite("log_filename", &log_param_t::log_filename)                   //
+        .def_readwrite("async_queue_size", &log_param_t::async_queue_size)           //
+        .def_readwrite("async_thread_count", &log_param_t::async_thread_count)       //
+        .def_readwrite("async_overflow", &log_param_t::async_overflow)               //
+        .def_readwrite("async_queue_max_bytes", &log_param_t::async_queue_max_bytes) //
+        .def_readwrite("file_sink_type", &log_param_t::file_sink_type)               //
+        .def_readwrite("file_max_size", &log_param_t::file_max_size)                 //
+        .def_readwrite("file_rotate_interval", &log_param_t::file_rotate_interval)   //
+        .def_readwrite("file_max_rotate", &log_param_t::file_max_rotate)             //
+        .def_readwrite("file_level", &log_param_t::file_level)                       //
+        .def_readwrite("ring_size", &log_param_t::ring_size)                         //
+        .def_readwrite("ring_filename", &log_param_t::ring_filename)                 //
+        .def_readwrite("ring_dump_level", &log_param_t::ring_dump_level)             //
+        .def_readwrite("limit", &log_param_t::limit);
+    m.attr("RING_SLOT_SIZE") = RING_SLOT_SIZE;
+
+    nb::class_<flush_stat_t>(m, "flush_stat_t")
+        .def_readonly("drained", &flush_stat_t::drained)         //
+        .def_readonly("num_drained", &flush_stat_t::num_drained) //
+        .def_readonly("elapsed", &flush_stat_t::elapsed);
+
+    nb::class_<async_stat_t>(m, "async_stat_t")
+        .def_readonly("queue_size", &async_stat_t::queue_size)             //
+        .def_readonly("queue_capacity", &async_stat_t::queue_capacity)     //
+        .def_readonly("queue_bytes", &async_stat_t::queue_bytes)           //
+        .def_readonly("queue_max_bytes", &async_stat_t::queue_max_bytes)   //
+        .def_readonly("thread_count", &async_stat_t::thread_count)         //
+        .def_readonly("overflow", &async_stat_t::overflow)                 //
+        .def_readonly("num_enqueued", &async_stat_t::num_enqueued)         //
+        .def_readonly("num_dropped", &async_stat_t::num_dropped)           //
+        .def_readonly("num_overrun", &async_stat_t::num_overrun)           //
+        .def_readonly("queue_high_water", &async_stat_t::queue_high_water) //
+        .def_readonly("queue_bytes_high_water", &async_stat_t::queue_bytes_high_water);
+
+    m.def("reset_logging", reset_logging, nb::arg("log_param") = log_param_default,
+          nb::call_guard<nb::gil_scoped_release>());
+    m.def("flush_logging", flush_logging, nb::arg("timeout") = nb::none(), nb::call_guard<nb::gil_scoped_release>());
+    m.def("reset_logging_async", reset_logging_async, nb::arg("log_param"), nb::arg("done").none(),
+          nb::call_guard<nb::gil_scoped_release>());
+    m.def("flush_logging_async", flush_logging_async, nb::arg("timeout").none(), nb::arg("done").none(),
+          nb::call_guard<nb::gil_scoped_release>());
+    m.def("wait_logging_async", wait_logging_async, nb::call_guard<nb::gil_scoped_release>());
+
+    m.def("get_async_stat", get_async_stat);
+
+    m.attr("LATENCY_BUCKET_COUNT") = LATENCY_BUCKET_COUNT;
+
+    nb::class_<latency_stat_t>(m, "latency_stat_t")
+        .def_readonly("count", &latency_stat_t::count)   //
+        .def_readonly("sum_ns", &latency_stat_t::sum_ns) //
+        .def_readonly("max_ns", &latency_stat_t::max_ns) //
+        .def_readonly("bucket", &latency_stat_t::bucket);
 
-    m.def("reset_logging", reset_logging, nb::arg("log_param") = log_param_default);
-    m.def("flush_logging", flush_logging);
+    nb::class_<logger_metrics_t>(m, "logger_metrics_t")
+        .def_readonly("name", &logger_metrics_t::name)                         //
+        .def_readonly("level_count", &logger_metrics_t::level_count)           //
+        .def_readonly("num_rate_limited", &logger_metrics_t::num_rate_limited) //
+        .def_readonly("num_collapsed", &logger_metrics_t::num_collapsed);
+
+    nb::class_<sink_metrics_t>(m, "sink_metrics_t")
+        .def_readonly("key", &sink_metrics_t::key)     //
+        .def_readonly("write", &sink_metrics_t::write) //
+        .def_readonly("flush", &sink_metrics_t::flush);
+
+    nb::class_<log_metrics_t>(m, "log_metrics_t")
+        .def_readonly("async_stat", &log_metrics_t::async) //
+        .def_readonly("loggers", &log_metrics_t::loggers)  //
+        .def_readonly("sinks", &log_metrics_t::sinks);
+
+    m.def("get_log_metrics", get_log_metrics, nb::call_guard<nb::gil_scoped_release>());
+    m.def("dump_ring", dump_ring, nb::call_guard<nb::gil_scoped_release>());
+    m.def("set_logger_limit", set_logger_limit, nb::arg("name"), nb::arg("limit").none(),
+          nb::call_guard<nb::gil_scoped_release>());
+
+    nb::class_<mp_stat_t>(m, "mp_stat_t")
+        .def_readonly("slot_count", &mp_stat_t::slot_count)   //
+        .def_readonly("slot_size", &mp_stat_t::slot_size)     //
+        .def_readonly("num_pending", &mp_stat_t::num_pending) //
+        .def_readonly("num_pushed", &mp_stat_t::num_pushed)   //
+        .def_readonly("num_dropped", &mp_stat_t::num_dropped);
+
+    nb::class_<log_bench_stat_t>(m, "log_bench_stat_t")
+        .def_readonly("num_record", &log_bench_stat_t::num_record) //
+        .def_readonly("elapsed", &log_bench_stat_t::elapsed)       //
+        .def_readonly("latency_ns", &log_bench_stat_t::latency_ns);
+    m.def("bench_logging", bench_logging, nb::arg("key"), nb::arg("num_record"), nb::arg("msg_size"),
+          nb::arg("thread_count") = 1, nb::call_guard<nb::gil_scoped_release>());
+
+    m.def("set_logger_level", set_logger_level, nb::arg("name"), nb::arg("lvl"),
+          nb::call_guard<nb::gil_scoped_release>());
+    m.def("get_logger_level", get_logger_level, nb::arg("name"));
+    m.def("is_enabled_for", is_enabled_for, nb::arg("name"), nb::arg("lvl"));
+    m.def("get_level_table", get_level_table);
+    m.def("set_level_listener", set_level_listener, nb::arg("listener").none());
 
     m.def("check_init", check_init);
+    m.def("reg_call_site", reg_call_site, nb::arg("filename"), nb::arg("funcname"), nb::arg("lineno"));
 
     nb::class_<LogCtx>(m, "LogCtx")
         .def(nb::init<>())                  //
         .def(nb::init<const std::string>()) //
-        .def("log", &LogCtx::log);
-}
\ No newline at end of file
+        // the enqueue may wait for room under the block overflow policy, other python threads go on meanwhile; the
+        // try_ calls never wait and keep the gil
+        .def("log", &LogCtx::log, nb::call_guard<nb::gil_scoped_release>())                     //
+        .def("log_lazy", &LogCtx::log_lazy, nb::call_guard<nb::gil_scoped_release>())           //
+        .def("log_site", &LogCtx::log_site, nb::call_guard<nb::gil_scoped_release>())           //
+        .def("log_lazy_site", &LogCtx::log_lazy_site, nb::call_guard<nb::gil_scoped_release>()) //
+        .def("log_batch", &LogCtx::log_batch, nb::call_guard<nb::gil_scoped_release>())         //
+        .def("try_log_site", &LogCtx::try_log_site)                                             //
+        .def("try_log_lazy_site", &LogCtx::try_log_lazy_site)                                   //
+        .def("try_log_batch", &LogCtx::try_log_batch, nb::call_guard<nb::gil_scoped_release>());
+
+    nb::class_<LogMpHost>(m, "LogMpHost")
+        .def(nb::init<const std::string, const size_t, const size_t>(), //
+             nb::arg("name"), nb::arg("slot_count") = 8192,
+             nb::arg("slot_size") = 512) //
+        .def("name", &LogMpHost::name)   //
+        .def("drain", &LogMpHost::drain, nb::arg("timeout") = nb::none(),
+             nb::call_guard<nb::gil_scoped_release>())                             //
+        .def("close", &LogMpHost::close, nb::call_guard<nb::gil_scoped_release>()) //
+        .def("stat", &LogMpHost::stat);
+
+    nb::class_<LogMpCtx>(m, "LogMpCtx")
+        .def(nb::init<const std::string, const std::string, const bool>(), //
+             nb::arg("name"), nb::arg("key") = "python",
+             nb::arg("block") = true) //
+        // with block, a full ring is waited on
+        .def("log", &LogMpCtx::log, nb::call_guard<nb::gil_scoped_release>())                     //
+        .def("log_lazy", &LogMpCtx::log_lazy, nb::call_guard<nb::gil_scoped_release>())           //
+        .def("log_site", &LogMpCtx::log_site, nb::call_guard<nb::gil_scoped_release>())           //
+        .def("log_lazy_site", &LogMpCtx::log_lazy_site, nb::call_guard<nb::gil_scoped_release>()) //
+        .def("log_batch", &LogMpCtx::log_batch, nb::call_guard<nb::gil_scoped_release>());
+}
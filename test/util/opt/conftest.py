@@ -0,0 +1,33 @@
+import argparse
+
+import pytest
+
+from tcomplex.util.opt import OptRegistry
+
+
+@pytest.fixture
+def write_config(tmp_path):
+    """write_config(name, text): path of the config file name under tmp_path, (re)written with text"""
+
+    def _write_config(name, text):
+        path = tmp_path / name
+        path.write_text(text)
+        return str(path)
+
+    return _write_config
+
+
+@pytest.fixture
+def make_registry():
+    """make_registry(entry_list, **kwargs): OptRegistry(**kwargs) with entry_list of (key, register kwargs) registered,
+    and a parser hooked to it"""
+
+    def _make_registry(entry_list, **kwargs):
+        registry = OptRegistry("test", **kwargs)
+        for key, register_kwargs in entry_list:
+            registry.register(key, **register_kwargs)
+        parser = argparse.ArgumentParser()
+        registry.hook(parser)
+        return registry, parser
+
+    return _make_registry
@@ -0,0 +1,141 @@
+import random
+import threading
+
+import pytest
+
+from tcomplex.util.opt import OptEntrySource, OptEntryCallback, OptCallbackCycleError
+from tcomplex.util.opt.callback import resolve_callback_wave, resolve_callback_dependency
+
+
+class Dep(OptEntryCallback):
+    def __init__(self, *dependency):
+        self.dependency = list(dependency)
+
+
+def _resolve_by_min_indeg(callback_map):
+    # reference: the order before waves, the first ready key in registration order at each step, None on a cycle
+    dep_left = {k: [d for d in v.dependency if d in callback_map] for k, v in callback_map.items()}
+    res = []
+    while len(dep_left) > 0:
+        k_curr = next((k for k, dlist in dep_left.items() if len(dlist) == 0), None)
+        if k_curr is None:
+            return None
+        res.append(k_curr)
+        dep_left.pop(k_curr)
+        for dlist in dep_left.values():
+            while k_curr in dlist:
+                dlist.remove(k_curr)
+    return res
+
+
+def _random_dag(rng, num_key):
+    key_list = [f"k{i}" for i in range(num_key)]
+    order = list(key_list)
+    rng.shuffle(order)
+    rank = {k: i for i, k in enumerate(order)}
+    callback_map = {}
+    for k in key_list:
+        dep = [d for d in key_list if rank[d] < rank[k] and rng.random() < 0.15]
+        if rng.random() < 0.2:
+            dep.append("outside")
+        callback_map[k] = Dep(*dep)
+    return callback_map
+
+
+def _check_wave(callback_map, wave_list):
+    wave_of = {k: i for i, wave in enumerate(wave_list) for k in wave}
+    assert sorted(wave_of) == sorted(callback_map)
+    for k, v in callback_map.items():
+        dep_wave = [wave_of[d] for d in v.dependency if d in callback_map]
+        # as early as its dependencies allow
+        assert wave_of[k] == max(dep_wave, default=-1) + 1
+    # registration order within a wave
+    position = {k: i for i, k in enumerate(callback_map)}
+    for wave in wave_list:
+        assert wave == sorted(wave, key=position.get)
+
+
+def test_wave_chain_matches_old_order():
+    callback_map = {"c": Dep("b"), "b": Dep("a"), "a": Dep(), "d": Dep("c", "a")}
+    wave_list = resolve_callback_wave(callback_map)
+    assert wave_list == [["a"], ["b"], ["c"], ["d"]]
+    assert resolve_callback_dependency(callback_map) == _resolve_by_min_indeg(callback_map)
+
+
+def test_wave_random_dag_matches_old_order():
+    rng = random.Random(0)
+    for _ in range(200):
+        callback_map = _random_dag(rng, rng.randint(0, 30))
+        wave_list = resolve_callback_wave(callback_map)
+        _check_wave(callback_map, wave_list)
+        old_order = _resolve_by_min_indeg(callback_map)
+        new_order = resolve_callback_dependency(callback_map)
+        assert sorted(new_order) == sorted(old_order)
+        # same constraints: every key after its dependencies
+        position = {k: i for i, k in enumerate(new_order)}
+        for k, v in callback_map.items():
+            assert all(position[d] < position[k] for d in v.dependency if d in callback_map)
+
+
+def test_cycle_error_names_cycle():
+    callback_map = {"a": Dep(), "b": Dep("a", "d"), "c": Dep("b"), "d": Dep("c"), "e": Dep("d")}
+    with pytest.raises(OptCallbackCycleError) as exc_info:
+        resolve_callback_wave(callback_map)
+    assert exc_info.value.cycle == ["b", "d", "c"]
+    assert "b -> d -> c -> b" in str(exc_info.value)
+    assert isinstance(exc_info.value, RuntimeError)
+    assert resolve_callback_dependency(callback_map) is None
+    assert _resolve_by_min_indeg(callback_map) is None
+
+
+def test_self_cycle():
+    with pytest.raises(OptCallbackCycleError) as exc_info:
+        resolve_callback_wave({"a": Dep("a")})
+    assert exc_info.value.cycle == ["a"]
+
+
+class Add(OptEntryCallback):
+    always = True
+
+    def __init__(self, *dependency):
+        self.dependency = list(dependency)
+        self.thread = set()
+
+    def __call__(self, curr_key, curr_value, prog, dep):
+        self.thread.add(threading.get_ident())
+        return 1 + sum(dep.values())
+
+
+def _wave_entry_list():
+    # fresh callbacks, they record the threads running them
+    return [
+        ("base", dict(category=int, source=OptEntrySource.BUILTIN, default=1)),
+        *[(f"w1.k{i}", dict(category=int, source=OptEntrySource.BUILTIN, callback=Add("base"))) for i in range(8)],
+        ("w2", dict(category=int, source=OptEntrySource.BUILTIN, callback=Add(*[f"w1.k{i}" for i in range(8)]))),
+        ("w3", dict(category=int, source=OptEntrySource.BUILTIN, callback=Add("w2", "base"))),
+    ]
+
+
+def test_parse_by_waves_matches_serial(make_registry):
+    serial, _ = make_registry(_wave_entry_list(), callback_workers=1)
+    serial.parse()
+    concurrent, _ = make_registry(_wave_entry_list(), callback_workers=4)
+    concurrent.parse()
+    assert concurrent.config == serial.config
+    assert serial.config["w1"] == {f"k{i}": 2 for i in range(8)}
+    assert serial.config["w2"] == 17
+    assert serial.config["w3"] == 19
+    # a wave of several callbacks runs on the pool, a single one on the caller
+    assert all(threading.get_ident() not in concurrent.meta_info[f"w1.k{i}"].callback.thread for i in range(8))
+    assert concurrent.meta_info["w2"].callback.thread == {threading.get_ident()}
+
+
+def test_parse_cycle_error(make_registry):
+    r, _ = make_registry(
+        [
+            ("a", dict(category=int, source=OptEntrySource.BUILTIN, callback=Add("b"))),
+            ("b", dict(category=int, source=OptEntrySource.BUILTIN, callback=Add("a"))),
+        ]
+    )
+    with pytest.raises(OptCallbackCycleError, match="a -> b -> a"):
+        r.parse()
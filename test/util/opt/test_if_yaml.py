@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from tcomplex.util.opt import if_yaml
+from tcomplex.util.opt.if_yaml import load_yaml, load_yaml_list
+
+
+@pytest.fixture
+def yaml_load_count(monkeypatch):
+    # number of actual parses
+    count = [0]
+    yaml_load = if_yaml.yaml.load
+
+    def _load(*args, **kwargs):
+        count[0] += 1
+        return yaml_load(*args, **kwargs)
+
+    monkeypatch.setattr(if_yaml.yaml, "load", _load)
+    return count
+
+
+def test_cache_hit(tmp_path, write_config, yaml_load_count):
+    filename = write_config("1.yml", "a: {x: 1}\n")
+    cache_dir = str(tmp_path / "cache")
+    assert load_yaml(filename, cache_dir) == {"a": {"x": 1}}
+    assert yaml_load_count[0] == 1
+    assert load_yaml(filename, cache_dir) == {"a": {"x": 1}}
+    assert yaml_load_count[0] == 1
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_cache_invalidated_by_mtime(tmp_path, write_config, yaml_load_count):
+    filename = write_config("1.yml", "a: {x: 1}\n")
+    cache_dir = str(tmp_path / "cache")
+    load_yaml(filename, cache_dir)
+    # same size, new content, mtime moved on
+    stat = os.stat(filename)
+    write_config("1.yml", "a: {x: 2}\n")
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_yaml(filename, cache_dir) == {"a": {"x": 2}}
+    assert yaml_load_count[0] == 2
+    # touched only: parsed again, the entry is rewritten for the new mtime
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+    assert load_yaml(filename, cache_dir) == {"a": {"x": 2}}
+    assert yaml_load_count[0] == 3
+    assert load_yaml(filename, cache_dir) == {"a": {"x": 2}}
+    assert yaml_load_count[0] == 3
+
+
+def test_cache_invalidated_by_size(tmp_path, write_config, yaml_load_count):
+    filename = write_config("1.yml", "a: {x: 1}\n")
+    cache_dir = str(tmp_path / "cache")
+    load_yaml(filename, cache_dir)
+    # same mtime, longer content
+    stat = os.stat(filename)
+    write_config("1.yml", "a: {x: 100}\n")
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_yaml(filename, cache_dir) == {"a": {"x": 100}}
+    assert yaml_load_count[0] == 2
+
+
+def test_cache_corrupt_entry(tmp_path, write_config, yaml_load_count):
+    filename = write_config("1.yml", "a: 1\n")
+    cache_dir = tmp_path / "cache"
+    load_yaml(filename, str(cache_dir))
+    for cache_filename in os.listdir(cache_dir):
+        (cache_dir / cache_filename).write_bytes(b"not a pickle")
+    assert load_yaml(filename, str(cache_dir)) == {"a": 1}
+    assert yaml_load_count[0] == 2
+
+
+def test_load_list_in_order(tmp_path, write_config, monkeypatch):
+    filename_list = [write_config(f"{i}.yml", f"a{i}: {i}\n") for i in range(4)]
+    expected = [{f"a{i}": i} for i in range(4)]
+    # small set: serial, no pool
+    assert load_yaml_list(filename_list, None, 2) == expected
+    # over the threshold: by the pool, kept for the next call
+    monkeypatch.setattr(if_yaml, "YAML_POOL_MIN_BYTES", 1)
+    assert load_yaml_list(filename_list, str(tmp_path / "cache"), 2) == expected
+    pool = if_yaml._pool
+    assert pool is not None
+    assert load_yaml_list(filename_list, str(tmp_path / "cache"), 2) == expected
+    assert if_yaml._pool is pool
@@ -0,0 +1,89 @@
+from tcomplex.util.opt import OptEntrySource, OptEntryCommandlineSeqPattern
+from tcomplex.util.opt.reg import prepare_default_config, index_key, set_value
+from tcomplex.util.opt.type_def import cast_to_res
+from tcomplex.util.opt.if_yaml import load_yaml
+
+ENTRY_LIST = [
+    ("a.x", dict(category=int, source=OptEntrySource.COMMANDLINE_OVER_CONFIG, default=1)),
+    ("a.l", dict(category=list, source=OptEntrySource.CONFIG_ONLY, default=[1])),
+    ("a.b.c", dict(category=str, source=OptEntrySource.CONFIG_ONLY, default="c")),
+    ("m", dict(category=dict, source=OptEntrySource.CONFIG_ONLY, default={})),
+    (
+        "s",
+        dict(
+            category=list,
+            source=OptEntrySource.COMMANDLINE_ONLY,
+            default=[],
+            cmdpattern=OptEntryCommandlineSeqPattern.COMMA_SEP,
+        ),
+    ),
+    ("builtin", dict(category=int, source=OptEntrySource.BUILTIN, default=7)),
+    ("req", dict(category=int, source=OptEntrySource.CONFIG_ONLY)),
+]
+
+
+def _parse_by_key(r, file_list, cmdline):
+    # reference: every config key looked up in every file, in registration order, then the command line
+    config = prepare_default_config(r.meta_info_tree)
+    for filename in file_list:
+        config_blob = load_yaml(filename)
+        for entry_key, entry_meta in r.meta_info.items():
+            if entry_meta.source not in (OptEntrySource.CONFIG_ONLY, OptEntrySource.COMMANDLINE_OVER_CONFIG):
+                continue
+            index_status, raw_res = index_key(config_blob, entry_key)
+            if index_status:
+                set_value(config, entry_key, cast_to_res(raw_res, r.category_proclist_cache[entry_meta.category]))
+    for entry_key, value in cmdline.items():
+        set_value(config, entry_key, value)
+    return config
+
+
+def test_multi_file_matches_by_key(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 5, l: [2, 3], b: {c: one}}\nreq: 1\nunknown: {y: 1}\n")
+    f2 = write_config("2.yml", "a: {l: ['4'], b: {c: two}}\nm: {k: '9'}\nbuiltin: 100\n")
+    f3 = write_config("3.yml", "a: {x: 6}\nreq: 3\ns: [ignored]\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1, "-c", f2, "-c", f3, "--s", "p,q"])
+
+    expected = _parse_by_key(r, [f1, f2, f3], {"s": ["p", "q"]})
+    assert r.config == expected
+    assert r.config == {
+        "a": {"x": 6, "l": ["4"], "b": {"c": "two"}},
+        "m": {"k": "9"},
+        "s": ["p", "q"],
+        "builtin": 7,
+        "req": 3,
+    }
+
+
+def test_command_line_over_config(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 5}\nreq: 1\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1, "--a.x", "8"])
+    assert r.config["a"]["x"] == 8
+    assert r.config == _parse_by_key(r, [f1], {"a.x": 8})
+
+
+def test_mutable_default_not_shared(write_config, make_registry):
+    f1 = write_config("1.yml", "req: 1\n")
+    r, _ = make_registry(ENTRY_LIST)
+    r.bind_default_option([f1])
+    r.parse()
+    r.config["a"]["l"].append(9)
+    r.config["m"]["k"] = 1
+    r.parse()
+    assert r.config["a"]["l"] == [1]
+    assert r.config["m"] == {}
+    assert r.meta_info["a.l"].default == [1]
+
+
+def test_plan_rebuilt_on_register(write_config, make_registry):
+    f1 = write_config("1.yml", "req: 1\nz: 2\n")
+    r, _ = make_registry(ENTRY_LIST)
+    plan = r.parse_plan()
+    assert r.parse_plan() is plan
+    r.register("z", category=int, source=OptEntrySource.CONFIG_ONLY, default=0)
+    assert r.parse_plan() is not plan
+    r.bind_default_option([f1])
+    r.parse()
+    assert r.config["z"] == 2
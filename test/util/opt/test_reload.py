@@ -0,0 +1,199 @@
+import threading
+import time
+
+import pytest
+
+from tcomplex.util.opt import OptEntrySource, OptEntryCallback, OptConfigWatcher
+from tcomplex.util.opt import reg
+from tcomplex.util.opt.if_yaml import load_yaml_list
+
+
+class Sum(OptEntryCallback):
+    dependency = ["a.x", "a.y"]
+    always = True
+
+    def __call__(self, curr_key, curr_value, prog, dep):
+        return dep["a.x"] + dep["a.y"]
+
+
+class Twice(OptEntryCallback):
+    dependency = ["a.s"]
+    always = True
+
+    def __call__(self, curr_key, curr_value, prog, dep):
+        return dep["a.s"] * 2
+
+
+ENTRY_LIST = [
+    ("a.x", dict(category=int, source=OptEntrySource.CONFIG_ONLY, default=0)),
+    ("a.y", dict(category=int, source=OptEntrySource.COMMANDLINE_OVER_CONFIG, default=0)),
+    ("b.z", dict(category=int, source=OptEntrySource.CONFIG_ONLY, default=0)),
+    ("a.s", dict(category=int, source=OptEntrySource.BUILTIN, callback=Sum())),
+    ("c.t", dict(category=int, source=OptEntrySource.BUILTIN, callback=Twice())),
+]
+
+
+def test_reload_re_resolves(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 1, y: 2}\nb: {z: 1}\n")
+    f2 = write_config("2.yml", "a: {y: 5}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1, "-c", f2])
+    assert r.config == {"a": {"x": 1, "y": 5, "s": 6}, "b": {"z": 1}, "c": {"t": 12}}
+
+    # a.y still set by the later file
+    write_config("1.yml", "a: {x: 10, y: 3}\nb: {z: 1}\n")
+    assert r.reload([f1]) == {"a.x": 10, "a.s": 15, "c.t": 30}
+    # the later file no longer sets a.y, the earlier one does
+    write_config("2.yml", "{}\n")
+    assert r.reload([f2]) == {"a.y": 3, "a.s": 13, "c.t": 26}
+    assert r.config == {"a": {"x": 10, "y": 3, "s": 13}, "b": {"z": 1}, "c": {"t": 26}}
+    assert r.reload() == {}
+
+
+def test_reload_keeps_command_line(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 1, y: 2}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1, "--a.y", "100"])
+    write_config("1.yml", "a: {x: 2, y: 50}\n")
+    assert r.reload() == {"a.x": 2, "a.s": 102, "c.t": 204}
+    assert r.config["a"]["y"] == 100
+
+
+def test_reload_error_keeps_config(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 1}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1])
+    config = r.config
+    write_config("1.yml", "a: {x: [1\n")
+    with pytest.raises(Exception):
+        r.reload()
+    assert r.config is config
+    assert r.config == {"a": {"x": 1, "y": 0, "s": 1}, "b": {"z": 0}, "c": {"t": 2}}
+
+
+def test_subscribe_changed_paths(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 1}\nb: {z: 1}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1])
+    got_a, got_b, got_all, got_key = [], [], [], []
+    r.subscribe("a", got_a.append)
+    handle_b = r.subscribe("b", got_b.append)
+    r.subscribe(None, got_all.append)
+    r.subscribe("a.x", got_key.append)
+
+    write_config("1.yml", "a: {x: 2}\nb: {z: 1}\n")
+    r.reload()
+    assert got_a == [{"a.x": 2, "a.s": 2}]
+    assert got_b == []
+    assert got_all == [{"a.x": 2, "a.s": 2, "c.t": 4}]
+    assert got_key == [{"a.x": 2}]
+
+    r.unsubscribe(handle_b)
+    write_config("1.yml", "a: {x: 2}\nb: {z: 5}\n")
+    r.reload()
+    assert got_b == []
+    assert got_all[-1] == {"b.z": 5}
+    assert len(got_a) == 1
+
+    # nothing changed, nobody notified
+    r.reload()
+    assert len(got_all) == 2
+
+
+def test_reload_keeps_earlier_select(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 1}\nb: {z: 1}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1])
+    view = r.select("a", frozen=True)
+    b_node = r.config["b"]
+    write_config("1.yml", "a: {x: 2}\nb: {z: 1}\n")
+    r.reload()
+    assert view["x"] == 1
+    assert r.select("a") == {"x": 2, "y": 0, "s": 2}
+    # nodes off the changed paths are shared
+    assert r.config["b"] is b_node
+
+
+def test_watcher_polling(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 1}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1])
+    got = []
+    r.subscribe("a.x", got.append)
+    with OptConfigWatcher(r, interval=0.05, debounce=0.01, use_inotify=False):
+        time.sleep(0.1)
+        # the size changes, a coarse mtime alone could miss the write
+        write_config("1.yml", "a: {x: 22}\n")
+        deadline = time.monotonic() + 5
+        while len(got) == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    assert got == [{"a.x": 22}]
+    assert r.config["a"]["x"] == 22
+
+
+def test_select_during_reload(write_config, make_registry, monkeypatch):
+    f1 = write_config("1.yml", "a: {x: 1}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1])
+    loading, resume = threading.Event(), threading.Event()
+
+    def _load_yaml_list(*args):
+        loading.set()
+        resume.wait(5)
+        return load_yaml_list(*args)
+
+    monkeypatch.setattr(reg, "load_yaml_list", _load_yaml_list)
+    write_config("1.yml", "a: {x: 2}\n")
+    got = []
+    reload_thread = threading.Thread(target=lambda: got.append(r.reload()))
+    reload_thread.start()
+    try:
+        assert loading.wait(5)
+        # not held up by the reload in flight, which has not published yet
+        select_thread = threading.Thread(target=lambda: got.append(r.select("a.x")))
+        select_thread.start()
+        select_thread.join(5)
+        assert not select_thread.is_alive()
+        assert got == [1]
+    finally:
+        resume.set()
+        reload_thread.join(5)
+    assert got == [1, {"a.x": 2, "a.s": 2, "c.t": 4}]
+
+
+def test_subscriber_selects_on_another_thread(write_config, make_registry):
+    f1 = write_config("1.yml", "a: {x: 1}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1])
+    got = []
+
+    def _on_change(changed):
+        select_thread = threading.Thread(target=lambda: got.append(r.select("a")))
+        select_thread.start()
+        select_thread.join(5)
+
+    r.subscribe("a", _on_change)
+    write_config("1.yml", "a: {x: 2}\n")
+    r.reload()
+    assert got == [{"x": 2, "y": 0, "s": 2}]
+
+
+def test_reload_on_top_of_parse(write_config, make_registry, monkeypatch):
+    f1 = write_config("1.yml", "a: {x: 1}\n")
+    r, parser = make_registry(ENTRY_LIST)
+    r.parse(parser, ["-c", f1])
+    parsed = []
+
+    def _load_yaml_list(*args):
+        # a parse publishing while the first reload round resolves
+        if len(parsed) == 0:
+            parsed.append(True)
+            r.parse(parser, ["--a.y", "5"])
+        return load_yaml_list(*args)
+
+    monkeypatch.setattr(reg, "load_yaml_list", _load_yaml_list)
+    write_config("1.yml", "a: {x: 2}\n")
+    # the parse has read the file already: nothing left to change, its command line kept
+    assert r.reload() == {}
+    assert len(parsed) == 1
+    assert r.config == {"a": {"x": 2, "y": 5, "s": 7}, "b": {"z": 0}, "c": {"t": 14}}
@@ -0,0 +1,189 @@
+from copy import deepcopy
+
+import pytest
+
+from tcomplex.util.opt import OptEntrySource
+from tcomplex.util.opt import FrozenMapping, FrozenSequence, CowMapping, CowSequence
+from tcomplex.util.opt.view import freeze_value
+
+
+def _make_tree():
+    return {
+        "a": {"x": 1, "l": [1, {"k": 2}]},
+        "b": {"z": {"w": 1}},
+        "t": ([1], {2}),
+        "s": {3, 4},
+        "buf": bytearray(b"x"),
+    }
+
+
+def test_frozen_rejects_mutation():
+    tree = _make_tree()
+    view = freeze_value(tree)
+    assert isinstance(view, FrozenMapping)
+    assert isinstance(view["a"]["l"], FrozenSequence)
+    with pytest.raises(TypeError):
+        view["a"]["x"] = 2
+    with pytest.raises(TypeError):
+        del view["b"]
+    with pytest.raises(AttributeError):
+        view["a"]["l"].append(3)
+    with pytest.raises(TypeError):
+        view["a"]["l"][1]["k"] = 3
+    with pytest.raises(AttributeError):
+        view["t"][0].append(9)
+    with pytest.raises(AttributeError):
+        view["s"].add(5)
+    view["buf"].extend(b"y")
+    view["a"]["l"][:1].append(9)
+    assert tree == _make_tree()
+
+
+def test_frozen_reads():
+    tree = _make_tree()
+    view = freeze_value(tree)
+    assert view == tree
+    assert view["a"]["l"] == [1, {"k": 2}]
+    assert view["t"] == ([1], frozenset({2}))
+    assert view["s"] == frozenset({3, 4})
+    assert list(view) == list(tree)
+    assert "a" in view and "q" not in view
+    assert view["a"]["l"][-1]["k"] == 2
+
+
+def test_frozen_thaw_is_a_copy():
+    tree = _make_tree()
+    view = freeze_value(tree)
+    plain = view.thaw()
+    assert plain == tree and plain is not tree
+    plain["a"]["l"].append(3)
+    copied = deepcopy(view["a"])
+    copied["x"] = 5
+    assert isinstance(copied, dict)
+    assert tree == _make_tree()
+
+
+def test_cow_isolates_live_tree():
+    tree = _make_tree()
+    snapshot = CowMapping(tree)
+    snapshot["a"]["x"] = 5
+    snapshot["a"]["l"].append(3)
+    snapshot["a"]["l"][1]["k"] = 4
+    snapshot["b"]["z"]["w"] = 7
+    del snapshot["s"]
+    snapshot["new"] = {"n": 1}
+    with pytest.raises(AttributeError):
+        snapshot["t"][0].append(9)
+    snapshot["buf"].extend(b"y")
+    assert tree == _make_tree()
+    assert snapshot == {
+        "a": {"x": 5, "l": [1, {"k": 4}, 3]},
+        "b": {"z": {"w": 7}},
+        "t": ([1], {2}),
+        "buf": bytearray(b"x"),
+        "new": {"n": 1},
+    }
+
+
+def test_cow_copies_written_path_only():
+    tree = _make_tree()
+    snapshot = CowMapping(tree)
+    snapshot["a"]["x"] = 5
+    data = snapshot._data
+    assert data is not tree
+    assert data["a"] is not tree["a"]
+    assert data["a"]["l"] is tree["a"]["l"]
+    assert data["b"] is tree["b"]
+
+
+def test_cow_views_see_later_writes():
+    tree = _make_tree()
+    snapshot = CowMapping(tree)
+    node_a = snapshot["a"]
+    node_l = node_a["l"]
+    node_l.append(3)
+    assert snapshot["a"]["l"] == [1, {"k": 2}, 3]
+    node_a["x"] = 2
+    assert snapshot["a"]["l"] is node_l
+    assert snapshot["a"] == {"x": 2, "l": [1, {"k": 2}, 3]}
+    assert tree == _make_tree()
+
+
+def test_cow_sequence():
+    tree = [1, [2, 3], {"k": 4}]
+    snapshot = CowSequence(tree)
+    snapshot[1].append(5)
+    snapshot.insert(0, 0)
+    snapshot[-1]["k"] = 6
+    snapshot[:2][0] = 9
+    assert tree == [1, [2, 3], {"k": 4}]
+    assert snapshot == [0, 1, [2, 3, 5], {"k": 6}]
+
+
+def test_cow_write_takes_a_copy():
+    tree = {"a": {"x": 1}}
+    snapshot = CowMapping(tree)
+    value = {"y": [1]}
+    snapshot["b"] = value
+    value["y"].append(2)
+    snapshot["c"] = freeze_value(tree["a"])
+    snapshot["c"]["x"] = 3
+    assert snapshot["b"] == {"y": [1]}
+    assert tree == {"a": {"x": 1}}
+
+
+def test_registry_select_and_snapshot(make_registry):
+    r, _ = make_registry(
+        [
+            ("a.x", dict(category=int, source=OptEntrySource.BUILTIN, default=1)),
+            ("a.l", dict(category=list, source=OptEntrySource.BUILTIN, default=[1])),
+        ]
+    )
+    r.parse()
+    frozen = r.select("a", frozen=True)
+    with pytest.raises(TypeError):
+        frozen["x"] = 2
+    snapshot = r.snapshot()
+    snapshot["a"]["l"].append(2)
+    plain = r.select("a")
+    plain["l"].append(3)
+    assert r.config == {"a": {"x": 1, "l": [1]}}
+    assert snapshot["a"]["l"] == [1, 2]
+    assert r.snapshot("a.x") == 1
+
+
+def test_cow_deleted_slot_stays_deleted():
+    tree = {"x": {"y": 1}, "z": 1}
+    snapshot = CowMapping(tree)
+    node_x = snapshot["x"]
+    del snapshot["x"]
+    node_x["y"] = 2
+    assert snapshot == {"z": 1}
+    assert node_x == {"y": 2}
+    assert tree == {"x": {"y": 1}, "z": 1}
+
+
+def test_cow_replaced_slot_keeps_new_value():
+    tree = {"x": {"y": 1}}
+    snapshot = CowMapping(tree)
+    node_x = snapshot["x"]
+    snapshot["x"] = {"new": 1}
+    node_x["y"] = 3
+    assert snapshot == {"x": {"new": 1}}
+    assert node_x == {"y": 3}
+    assert tree == {"x": {"y": 1}}
+
+
+def test_cow_shifted_slot_keeps_inserted_value():
+    tree = [{"k": 1}, {"k": 2}]
+    snapshot = CowSequence(tree)
+    node_0 = snapshot[0]
+    node_last = snapshot[-1]
+    snapshot.insert(0, {"k": 0})
+    node_0["k"] = 10
+    node_last["k"] = 20
+    assert snapshot == [{"k": 0}, {"k": 1}, {"k": 2}]
+    snapshot[1]["k"] = 11
+    del snapshot[0]
+    assert snapshot == [{"k": 11}, {"k": 2}]
+    assert tree == [{"k": 1}, {"k": 2}]
@@ -0,0 +1,52 @@
+import logging
+
+import pytest
+
+from tcomplex import _if
+from tcomplex.util.upkeep import log, _log
+
+
+@pytest.fixture(scope="session")
+def native_log():
+    _if.init()
+    yield
+    _if.deinit()
+
+
+@pytest.fixture
+def read_log(native_log, tmp_path):
+    """read_log(): messages of the python records in the native log file, after a flush; the native log device writes
+    to that file only while the test runs"""
+    filename = str(tmp_path / "native.log")
+    _log.reset_logging(_log.log_param_t(log_type=_log.log_type_t.file_only, log_filename=filename))
+
+    def _read_log():
+        _log.flush_logging()
+        with open(filename, encoding="utf-8") as f:
+            # [time] [logger] [level] [source] message
+            field_list = [line.split("] ", 4) for line in f.read().splitlines()]
+        return [field[4] for field in field_list if field[1] == "[python"]
+
+    yield _read_log
+    _log.reset_logging(_log.log_param_t(log_type=_log.log_type_t.disabled))
+
+
+@pytest.fixture
+def ext_logger(native_log, request):
+    """ext_logger(**kwargs): a python logger of its own, at any level, forwarding to the native log device through
+    ExtHandler(**kwargs) only"""
+    handler_list = []
+
+    def _ext_logger(**kwargs):
+        logger = logging.getLogger(f"test.{request.node.name}.{len(handler_list)}")
+        logger.propagate = False
+        logger.setLevel(1)
+        handler = log.ExtHandler(**kwargs)
+        logger.addHandler(handler)
+        handler_list.append((logger, handler))
+        return logger
+
+    yield _ext_logger
+    for logger, handler in handler_list:
+        logger.removeHandler(handler)
+        handler.close()
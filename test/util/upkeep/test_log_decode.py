@@ -0,0 +1,85 @@
+import logging
+import os
+
+import pytest
+
+from tcomplex.util.upkeep import log_decode, _log
+
+# 2024-05-06 07:08:09.123456789 utc
+CREATED_NS = 1714979289_123456789
+
+RECORD_CASE_LIST = [
+    (logging.INFO, "plain", ()),
+    (logging.WARNING, "int %d %5d %x", (7, -42, 255)),
+    (logging.ERROR, "float %.3f %s %e", (3.14159, 0.1, 12345.678)),
+    (logging.DEBUG, "str %s %r %a", ("héllo", "it's", "é")),
+    (logging.CRITICAL, "big %d", (2**70,)),
+    (logging.INFO, "mixed %s %d %s", ("a", 1, 2.5)),
+    (logging.INFO, "utf-8 ünïcode €", ()),
+]
+
+
+def _write_log(ext_logger, filename, file_sink_type, lazy_format):
+    _log.reset_logging(
+        _log.log_param_t(log_type=_log.log_type_t.file_only, log_filename=filename, file_sink_type=file_sink_type)
+    )
+    logger = ext_logger(lazy_format=lazy_format)
+    for i, (level, msg, args) in enumerate(RECORD_CASE_LIST):
+        record = logger.makeRecord(logger.name, level, f"/src/mod{i % 2}.py", 100 + i, msg, args, None, func="fn")
+        record.created = (CREATED_NS + i * 1_000_001) / 1e9
+        record.created_ns = CREATED_NS + i * 1_000_001
+        logger.handle(record)
+    logger.handlers[0].flush()
+    _log.flush_logging()
+
+
+def _reset_logging():
+    # the file sink type is kept across resets otherwise
+    _log.reset_logging(_log.log_param_t(log_type=_log.log_type_t.disabled, file_sink_type=_log.file_sink_type_t.basic))
+
+
+@pytest.mark.parametrize("lazy_format", [True, False])
+def test_matches_basic_sink(native_log, ext_logger, tmp_path, lazy_format):
+    text_filename = str(tmp_path / "native.log")
+    binary_filename = str(tmp_path / "native.bin")
+    try:
+        _write_log(ext_logger, text_filename, _log.file_sink_type_t.basic, lazy_format)
+        _write_log(ext_logger, binary_filename, _log.file_sink_type_t.binary, lazy_format)
+    finally:
+        _reset_logging()
+
+    with open(text_filename, encoding="utf-8") as f:
+        text_line_list = [line for line in f.read().splitlines() if "] [python] [" in line]
+    record_list = [record for record in log_decode.iter_records(binary_filename) if record["logger"] == "python"]
+    assert [log_decode.format_record(record) for record in record_list] == text_line_list
+    assert len(record_list) == len(RECORD_CASE_LIST)
+
+    for i, (record, (level, msg, args)) in enumerate(zip(record_list, RECORD_CASE_LIST)):
+        assert record["lineno"] == 100 + i
+        assert os.path.basename(record["filename"]) == f"mod{i % 2}.py"
+        assert record["funcname"] == "fn"
+        assert record["level"] == logging.getLevelName(level).lower()
+        assert record["msg"] == msg % args
+        # the time goes through as native time points, at their precision
+        assert abs(record["created_ns"] - (CREATED_NS + i * 1_000_001)) < 1000
+
+
+def test_truncated_record_skipped(native_log, ext_logger, tmp_path):
+    filename = str(tmp_path / "native.bin")
+    try:
+        _write_log(ext_logger, filename, _log.file_sink_type_t.binary, True)
+    finally:
+        _reset_logging()
+    record_list = list(log_decode.iter_records(filename))
+    with open(filename, "rb") as f:
+        data = f.read()
+    cut_filename = tmp_path / "cut.bin"
+    cut_filename.write_bytes(data[:-1])
+    assert list(log_decode.iter_records(str(cut_filename))) == record_list[:-1]
+
+
+def test_not_binary(tmp_path):
+    filename = tmp_path / "native.log"
+    filename.write_text("[2024-05-06 07:08:09.123] [python] [info] plain\n")
+    with pytest.raises(ValueError):
+        list(log_decode.iter_records(str(filename)))
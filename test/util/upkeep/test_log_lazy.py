@@ -0,0 +1,76 @@
+import logging
+import math
+
+import pytest
+
+FORMAT_CASE_LIST = [
+    ("%d", (5,)),
+    ("%5d|%-5d|%05d", (42, -42, -42)),
+    ("%+d % d", (3, 3)),
+    ("%x %X %#x %#o %o", (255, 255, 255, 8, 8)),
+    ("%#06o %.3d", (8, 5)),
+    ("%i %u", (-7, 7)),
+    ("%d %d", (2**62, -(2**63))),
+    ("%d", (2**70,)),
+    ("%d %d", (3.9, -3.9)),
+    ("%d", (1e20,)),
+    ("%d", (-1e19,)),
+    ("%s %s %s", (1, 1.0, "a")),
+    ("%s %s %s", (1e16, 1e-5, 0.1)),
+    ("%s %s", (123456789012345678.0, -0.0)),
+    ("%s %s %s", (float("inf"), float("-inf"), float("nan"))),
+    ("%f %e %g %E %G", (math.pi,) * 5),
+    ("%.2f %10.3e %-10.1f|", (2.5, 12345.678, -1.25)),
+    ("%05.1f %+.0f %010.3f", (-2.34, 2.5, -math.pi)),
+    ("%#g %g", (1.0, 100000000.0)),
+    ("%*d|%-*d|%.*f", (5, 1, 4, 2, 2, math.e)),
+    ("%r %r %r", ("it's", 'a"b', "x'y\"z")),
+    ("%r", ("tab\there\\",)),
+    ("%a", ("é",)),
+    ("%a %a %a", ("€", "\U0001f600", "plain")),
+    ("%-8a|%8a|", ("é", "x")),
+    ("%c%c%c", (65, "é", 0x20AC)),
+    ("%.2s|%5s|%-5s|", ("héllo", "ab", "ab")),
+    ("%s", ("x\0y",)),
+    ("100%% %s", ("x",)),
+]
+
+
+@pytest.mark.parametrize("batch_size", [None, 64])
+@pytest.mark.parametrize("lazy_format", [True, False])
+def test_matches_percent_format(read_log, ext_logger, lazy_format, batch_size):
+    logger = ext_logger(lazy_format=lazy_format, batch_size=batch_size)
+    for fmt, args in FORMAT_CASE_LIST:
+        logger.info(fmt, *args)
+    logger.handlers[0].flush()
+    assert read_log() == [fmt % args for fmt, args in FORMAT_CASE_LIST]
+
+
+@pytest.mark.usefixtures("read_log")
+def test_lazy_args(ext_logger):
+    handler = ext_logger(lazy_format=True).handlers[0]
+
+    def _lazy_args(msg, *args):
+        return handler._lazy_args(logging.makeLogRecord({"msg": msg, "args": args}))
+
+    assert _lazy_args("%d %s %f", 1, "a", 1.5) == (1, "a", 1.5)
+    # formatted here: out of int64 range, other types, no args
+    assert _lazy_args("%d", 2**63) is None
+    assert _lazy_args("%d", 1e20) is None
+    assert _lazy_args("%s", float("nan")) is None
+    assert _lazy_args("%s", True) is None
+    assert _lazy_args("%s", [1]) is None
+    assert _lazy_args("plain") is None
+
+
+def test_format_error_keeps_template(read_log, ext_logger):
+    logger = ext_logger(lazy_format=True)
+    logger.info("bad %d", "x")
+    logger.info("few %s %s", 1)
+    logger.info("after")
+    logger.handlers[0].flush()
+    msg_list = read_log()
+    assert msg_list[0].startswith("bad %d <format error:")
+    assert msg_list[1].startswith("few %s %s <format error:")
+    assert msg_list[2] == "after"
+
@@ -0,0 +1,63 @@
+import logging
+
+import pytest
+
+from tcomplex.util.upkeep import log
+from tcomplex.util.upkeep.log import _log
+
+NAME_LIST = ["root", "python", "tcomplex.test_level", "tcomplex.test_level.native", "other.test_level"]
+
+
+@pytest.fixture
+def level_sync(native_log):
+    # log_init with its level state undone after the test, native and python
+    root_level = logging.getLogger().level
+    log.log_init()
+    yield
+    _log.set_level_listener(None)
+    for name in NAME_LIST:
+        _log.set_logger_level(name, logging.NOTSET)
+        logger = logging.getLogger() if name == "root" else logging.getLogger(name)
+        logging.Logger.setLevel(logger, root_level if name == "root" else logging.NOTSET)
+
+
+def test_custom_level_reaches_sink(level_sync, read_log, ext_logger):
+    logger = ext_logger()
+    log.set_level("python", logging.INFO)
+    for level in (5, 15, 19, 20, 25, 35, 45, 55):
+        logger.log(level, "level %d", level)
+    # rounded down to the native level: at or above INFO passes
+    assert read_log() == [f"level {level}" for level in (20, 25, 35, 45, 55)]
+
+    log.set_level("python", 15)
+    for level in (5, 9, 10, 15):
+        logger.log(level, "level %d", level)
+    assert read_log()[5:] == ["level 10", "level 15"]
+
+
+def test_custom_level_enabled_for(level_sync):
+    log.set_level("tcomplex.test_level", 25)
+    # the native threshold rounds down, the python logger keeps the exact level
+    assert _log.get_logger_level("tcomplex.test_level") == logging.INFO
+    assert logging.getLogger("tcomplex.test_level").level == 25
+    assert log.is_enabled_for("tcomplex.test_level", 25)
+    assert log.is_enabled_for("tcomplex.test_level", 29)
+    assert not log.is_enabled_for("tcomplex.test_level", 15)
+
+
+def test_native_level_to_python(level_sync):
+    _log.set_logger_level("tcomplex.test_level.native", logging.ERROR)
+    log.sync_levels()
+    assert logging.getLogger("tcomplex.test_level.native").level == logging.ERROR
+    # python side wins once set, and goes native
+    log.get_logger("tcomplex.test_level.native").setLevel(logging.DEBUG)
+    assert _log.get_logger_level("tcomplex.test_level.native") == logging.DEBUG
+
+
+def test_other_loggers_not_patched(level_sync):
+    logger = logging.getLogger("other.test_level")
+    log.sync_levels()
+    assert type(logger) is logging.Logger
+    assert type(logging.getLogger("tcomplex.test_level")) is log.ExtLogger
+    logger.setLevel(logging.ERROR)
+    assert _log.get_logger_level("other.test_level") != logging.ERROR
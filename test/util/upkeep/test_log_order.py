@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+NUM_RECORD = 20000
+
+
+@pytest.mark.parametrize("batch_size", [None, 256])
+def test_in_order_none_lost(read_log, ext_logger, batch_size):
+    logger = ext_logger(batch_size=batch_size, lazy_format=True)
+    for i in range(NUM_RECORD):
+        logger.info("record %d", i)
+    logger.handlers[0].flush()
+    # nothing left in the queue once flushed: every record written, in order
+    assert read_log() == [f"record {i}" for i in range(NUM_RECORD)]
+
+
+def test_threads_in_order_none_lost(read_log, ext_logger):
+    logger = ext_logger(batch_size=64, lazy_format=True)
+    num_thread = 4
+
+    def _log(thread_id):
+        for i in range(NUM_RECORD // num_thread):
+            logger.info("thread %d record %d", thread_id, i)
+
+    thread_list = [threading.Thread(target=_log, args=(thread_id,)) for thread_id in range(num_thread)]
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join()
+    logger.handlers[0].flush()
+
+    seen = {thread_id: [] for thread_id in range(num_thread)}
+    for msg in read_log():
+        _, thread_id, _, i = msg.split(" ")
+        seen[int(thread_id)].append(int(i))
+    assert seen == {thread_id: list(range(NUM_RECORD // num_thread)) for thread_id in range(num_thread)}
+
+
+def test_flush_repeated(read_log, ext_logger):
+    logger = ext_logger()
+    expected = []
+    for round_id in range(20):
+        for i in range(100):
+            logger.info("round %d record %d", round_id, i)
+            expected.append(f"round {round_id} record {i}")
+        assert read_log() == expected